@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Shared DynamoDB batch writes ; used by loadTable.py, loadEncodingsTable.py, backupTable.py, and loadBundle.py
+
+@note :
+    Description: Writes batches of put requests (low-level AttributeValue items, eg. {'year': {'N': '2010'}}) with the low-level client's batch_write_item:
+        - a batch is at most BATCH_WRITE_SIZE (25) put requests, DynamoDB's limit per call
+        - unprocessed items (eg. throttled by provisioned capacity) are retried with exponential backoff, up to BATCH_MAX_ATTEMPTS calls
+        - write_stored_batch() sends a batch already stored as JSON text (see loadBundle.py) as the request body itself, so it is not parsed or serialized again
+        --> safe to call from several threads at once (one batch per call), with a client from awsClients.py pooled for them
+
+        NOTE: raises RuntimeError if items are still unprocessed after the last attempt (nothing is silently dropped)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import json
+import threading
+import time
+
+############################################ CONSTANTS ############################################
+
+BATCH_WRITE_SIZE = 25 #DynamoDB's limit of items per batch_write_item call
+BATCH_MAX_ATTEMPTS = 10
+BATCH_RETRY_DELAY = 0.05 #seconds, doubled after every attempt that leaves unprocessed items
+
+# Stored batches are sent with a placeholder put request (so botocore only builds a tiny request), whose place in the body is then taken by the stored JSON text
+PLACEHOLDER_BATCH = [{'PutRequest': {'Item': {}}}]
+STORED_BATCH_MARKER = "@stored-batch@" #never part of a table name (only letters, digits, '_', '-' and '.')
+STORED_BATCH_EVENT = "before-sign.dynamodb.BatchWriteItem" #before signing, so the signature covers the stored body
+
+############################################## STATE ##############################################
+
+# The stored batch (JSON text) being sent by each thread, if any
+stored_batches = threading.local()
+
+############################################ FUNCTIONS ############################################
+
+# Writes a batch of put requests, retrying the unprocessed ones (with exponential backoff) until all are written
+def write_batch(dynamodb_client, table_name, batch):
+    response = dynamodb_client.batch_write_item(RequestItems={table_name: batch})
+    retry_unprocessed(dynamodb_client, table_name, response)
+
+# Writes a batch of put requests stored as JSON text (the list of put requests, eg. '[{"PutRequest":{"Item":{...}}}]'), sending the text as the request body as it is
+# Note: the text is not parsed, validated, or serialized again - DynamoDB rejects the call if it is not a valid batch; only retries of unprocessed items are built by botocore
+def write_stored_batch(dynamodb_client, table_name, stored_batch):
+    dynamodb_client.meta.events.register(STORED_BATCH_EVENT, insert_stored_batch, unique_id=STORED_BATCH_EVENT)
+    # Kept for the whole call, since botocore builds (and signs) the request again for each of its own retries
+    stored_batches.text = stored_batch
+    try:
+        response = dynamodb_client.batch_write_item(RequestItems={table_name: PLACEHOLDER_BATCH})
+    finally:
+        stored_batches.text = None
+    retry_unprocessed(dynamodb_client, table_name, response)
+
+# Replaces the placeholder batch in the request body with the thread's stored batch (if it is sending one)
+# Note: the rest of the body is kept (eg. ReturnConsumedCapacity, added by awsStats.py)
+def insert_stored_batch(request, **kwargs):
+    stored_batch = getattr(stored_batches, 'text', None)
+    if stored_batch is None:
+        return
+    body = json.loads(request.data)
+    body['RequestItems'] = {table_name: STORED_BATCH_MARKER for table_name in body['RequestItems']}
+    request.data = json.dumps(body, separators=(',', ':')).replace(f'"{STORED_BATCH_MARKER}"', stored_batch.strip()).encode("utf-8")
+
+# Retries the unprocessed items of a batch_write_item response (with exponential backoff) until all are written
+def retry_unprocessed(dynamodb_client, table_name, response):
+    requests = response.get('UnprocessedItems', {})
+    delay = BATCH_RETRY_DELAY
+    for _ in range(BATCH_MAX_ATTEMPTS - 1):
+        if len(requests) == 0:
+            return
+        time.sleep(delay)
+        delay *= 2
+        response = dynamodb_client.batch_write_item(RequestItems=requests)
+        requests = response.get('UnprocessedItems', {})
+    if len(requests) > 0:
+        raise RuntimeError(f"{len(requests.get(table_name, []))} items still unprocessed after {BATCH_MAX_ATTEMPTS} attempts")
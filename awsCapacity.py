@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Capacity-aware DynamoDB table provisioning ; used by loadTable.py, loadEncodingsTable.py, backupTable.py, and loadBundle.py
+
+@note :
+    Description: Chooses how a table the loaders create is billed, so a bulk load finishes in a predictable time without permanently overpaying:
+        - '--capacity-mode on-demand' creates the table with PAY_PER_REQUEST billing (no capacity to plan, pay per write)
+        - '--capacity-mode provisioned' (default) creates it with a temporary write boost, sized so the load takes about '--target-seconds' (default 60),
+            then dials the write capacity back down to the steady 5 RCU/5 WCU once the load is done (even if it failed)
+        --> the boost is computed from the CSV: #of items estimated from the file size and the average size of the first rows,
+            times the write units each item needs (1 WCU per 1 KB, item size = row size + attribute names)
+        --> for layouts that pack several rows into one item (eg. loadTable.py '--layout packed'), #of items and item size are scaled by the rows per item
+        --> when the items are known (backupTable.py and loadBundle.py), the boost is sized from their exact write units instead:
+            item_write_units() sizes an item the way DynamoDB does (attribute names plus value bytes, see item_bytes()), not by its DynamoDB JSON text
+        --> the boost is capped at what the load's writers can use (WRITER_WRITE_CAPACITY each), so a single serial writer (eg. loadTable.py)
+            is not given capacity it could never consume, and the load is then planned to take longer than the target
+
+        NOTE: the boost is capped at MAX_BOOST_WRITE_CAPACITY, and never below the steady capacity
+        NOTE: DynamoDB only allows a few capacity decreases per table per day, so if dialing down fails the table is left boosted (with a warning to fix it by hand)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import math
+import os
+
+############################################ CONSTANTS ############################################
+
+CAPACITY_MODE_FLAG = "--capacity-mode"
+TARGET_SECONDS_FLAG = "--target-seconds"
+CAPACITY_USAGE = f"[{CAPACITY_MODE_FLAG} <on-demand|provisioned>] [{TARGET_SECONDS_FLAG} <n>]"
+
+ON_DEMAND = "on-demand"
+PROVISIONED = "provisioned"
+CAPACITY_MODES = {ON_DEMAND: 'PAY_PER_REQUEST', PROVISIONED: 'PROVISIONED'}
+DEFAULT_CAPACITY_MODE = PROVISIONED
+DEFAULT_TARGET_SECONDS = 60
+
+STEADY_READ_CAPACITY = 5
+STEADY_WRITE_CAPACITY = 5
+MAX_BOOST_WRITE_CAPACITY = 1000
+WRITE_UNIT_BYTES = 1024 #1 WCU writes an item of up to 1 KB
+WRITER_WRITE_CAPACITY = 250 #WCU one writer can use: a batch_write_item call of 25 items waits for the last, so about 10 calls/sec of 1 KB items
+SAMPLE_ROWS = 1000 #rows read to estimate the average row size
+COLLECTION_BYTES = 3 #overhead of a map or list value
+ELEMENT_BYTES = 1 #overhead of each map or list element
+
+############################################ FUNCTIONS ############################################
+
+# Removes the capacity flags from the args (eg. sys.argv, before the script checks its args)
+# Returns (remaining args, {mode, target_seconds}), or None (after displaying why) if a flag is invalid
+def setup(argv):
+    argv = list(argv)
+    options = {'mode': DEFAULT_CAPACITY_MODE, 'target_seconds': DEFAULT_TARGET_SECONDS}
+    for flag in [CAPACITY_MODE_FLAG, TARGET_SECONDS_FLAG]:
+        if flag not in argv:
+            continue
+        i = argv.index(flag)
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{flag}'.")
+            return None
+        value = argv[i + 1]
+        del argv[i:i + 2]
+
+        if flag == CAPACITY_MODE_FLAG:
+            if value not in CAPACITY_MODES:
+                print(f"Error: Invalid capacity mode '{value}' - must be one of: {', '.join(CAPACITY_MODES.keys())}.")
+                return None
+            options['mode'] = value
+        elif not value.isdigit() or int(value) < 1:
+            print(f"Error: Invalid value '{value}' for '{flag}' - must be a whole number of seconds greater than 0.")
+            return None
+        else:
+            options['target_seconds'] = int(value)
+    return argv, options
+
+# Plans the table's capacity for loading the CSV, returns a dict of:
+#   create_args (BillingMode/ProvisionedThroughput args for create_table()), boosted (true if it must be dialed down after), and a description
+# Note: attribute_names are the item's attribute names (they count towards the item size), and rows_per_item is #of CSV rows packed into each item
+# Note: writers is #of writers loading at once (the boost is capped at what they can use)
+def plan_capacity(options, csv_filename, attribute_names, rows_per_item=1, writers=1):
+    item_count, units_per_item = estimate_items(csv_filename, sum(len(name) for name in attribute_names), rows_per_item)
+    return plan_item_capacity(options, item_count, item_count * units_per_item, writers)
+
+# Plans the table's capacity for loading a known #of items needing a known total of write units (eg. from a backup, see backupTable.py),
+# with #of writers loading at once, returns the same dict as plan_capacity()
+def plan_item_capacity(options, item_count, write_units, writers):
+    if options['mode'] == ON_DEMAND:
+        return {
+            'create_args': {'BillingMode': CAPACITY_MODES[ON_DEMAND]},
+            'boosted': False,
+            'description': "on-demand (pay per request)"
+        }
+
+    # Size the boost for the target, but no more than the writers can use
+    write_capacity = math.ceil(write_units / options['target_seconds'])
+    write_capacity = min(write_capacity, max(writers, 1) * WRITER_WRITE_CAPACITY, MAX_BOOST_WRITE_CAPACITY)
+    write_capacity = max(write_capacity, STEADY_WRITE_CAPACITY)
+    load_seconds = math.ceil(write_units / write_capacity)
+    return {
+        'create_args': {
+            'BillingMode': CAPACITY_MODES[PROVISIONED],
+            'ProvisionedThroughput': {
+                'ReadCapacityUnits': STEADY_READ_CAPACITY,
+                'WriteCapacityUnits': write_capacity
+            }
+        },
+        'boosted': write_capacity > STEADY_WRITE_CAPACITY,
+        'description': f"provisioned {STEADY_READ_CAPACITY} RCU/{write_capacity} WCU while loading ~{item_count} items "
+            f"({write_units} WCU, {writers} writers) in ~{load_seconds}s, then {STEADY_WRITE_CAPACITY} WCU"
+    }
+
+# Estimates #of items in the CSV (from its size and the average size of the first rows), and the write units each item needs
+def estimate_items(csv_filename, attribute_name_bytes, rows_per_item=1):
+    row_count = 0
+    sample_bytes = 0
+    with open(csv_filename, "rb") as csv_file:
+        for line in csv_file:
+            row_count += 1
+            sample_bytes += len(line)
+            if row_count >= SAMPLE_ROWS:
+                break
+    if row_count == 0:
+        return 0, 1
+
+    average_row_bytes = sample_bytes / row_count
+    item_count = math.ceil(os.path.getsize(csv_filename) / average_row_bytes / rows_per_item)
+    units_per_item = math.ceil((average_row_bytes * rows_per_item + attribute_name_bytes) / WRITE_UNIT_BYTES)
+    return item_count, units_per_item
+
+# Returns the write units an item of AttributeValues needs (1 WCU per 1 KB of its size, see item_bytes())
+def item_write_units(item):
+    return max(1, math.ceil(item_bytes(item) / WRITE_UNIT_BYTES))
+
+# Returns the size of an item of AttributeValues (eg. {'year': {'N': '2010'}}) as DynamoDB counts it: its attribute names plus their value bytes
+def item_bytes(item):
+    return sum(len(name.encode('utf-8')) + value_bytes(value) for name, value in item.items())
+
+# Returns the size of one AttributeValue as DynamoDB counts it, recursing into maps, lists, and sets
+# Note: strings count their UTF-8 bytes, binary values their bytes, and numbers 1 byte per 2 significant digits plus 1
+def value_bytes(value):
+    (value_type, data), = value.items()
+    if value_type == 'S':
+        return len(data.encode('utf-8'))
+    if value_type == 'N':
+        return number_bytes(data)
+    if value_type == 'B':
+        return len(data)
+    if value_type == 'SS':
+        return sum(len(element.encode('utf-8')) for element in data)
+    if value_type == 'NS':
+        return sum(number_bytes(element) for element in data)
+    if value_type == 'BS':
+        return sum(len(element) for element in data)
+    if value_type == 'M':
+        return COLLECTION_BYTES + sum(ELEMENT_BYTES + len(name.encode('utf-8')) + value_bytes(member) for name, member in data.items())
+    if value_type == 'L':
+        return COLLECTION_BYTES + sum(ELEMENT_BYTES + value_bytes(element) for element in data)
+    return 1 #BOOL and NULL
+
+# Returns the size of a number string (eg. '345.639') as DynamoDB counts it (leading and trailing zeroes are not stored)
+def number_bytes(text):
+    digits = text.lstrip('-').lower().partition('e')[0].replace('.', '').strip('0')
+    return math.ceil(len(digits) / 2) + 1
+
+# Dials a boosted table's write capacity back down to the steady capacity, waiting until the table is active again
+# Returns true if it did (or there was no boost), otherwise displays a warning and returns false
+def dial_down(dynamodb_client, table_name, plan):
+    if not plan['boosted']:
+        return True
+    try:
+        dynamodb_client.update_table(
+            TableName=table_name,
+            ProvisionedThroughput={
+                'ReadCapacityUnits': STEADY_READ_CAPACITY,
+                'WriteCapacityUnits': STEADY_WRITE_CAPACITY
+            }
+        )
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+    except Exception as e:
+        print(f"Error: Unable to dial table '{table_name}' back down to {STEADY_WRITE_CAPACITY} WCU, it is still boosted - please lower it by hand. [{e}]")
+        return False
+    return True
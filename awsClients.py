@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Shared AWS client factory ; used by awsS3Shell.py, loadTable.py, loadEncodingsTable.py, and queryOECD.py
+
+@note :
+    Description: Creates the boto3 sessions, clients, and resources for every script in one place, so they all use the same connection settings:
+        - connection pool sized to the caller's concurrency ('max_pool_connections', boto3 default is only 10, so more threads than that wait on a connection)
+        - adaptive retry mode (retries throttling and transient errors with backoff, and rate limits the client when it keeps getting throttled)
+        - TCP keep-alive and connect/read timeouts
+
+        NOTE: a client and resource pair share one connection pool (the client is the resource's own 'meta.client')
+        NOTE: sessions, clients, and resources are cached, so logging in again with the same credentials reuses the existing connections
+        NOTE: boto3/botocore are only imported when the first session is created, and callers ask for only the client or resource they use
+        --> importing boto3 and loading its service models dominates short runs (eg. usage errors never need it), see benchmarkStartup.py
+        NOTE: the endpoint can be overridden with AWS_ENDPOINT_URL_<SERVICE> (eg. AWS_ENDPOINT_URL_DYNAMODB) or AWS_ENDPOINT_URL, eg. to use local stand-ins (moto server, DynamoDB Local, MinIO)
+        NOTE: every client is instrumented with awsStats.py when stats are enabled (calls, latency, retries, payload sizes, DynamoDB consumed capacity per operation)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import awsStats
+import functools
+import os
+
+############################################ CONSTANTS ############################################
+
+DEFAULT_POOL_CONNECTIONS = 10
+RETRY_MODE = "adaptive"
+MAX_RETRY_ATTEMPTS = 10
+CONNECT_TIMEOUT = 10 #seconds
+READ_TIMEOUT = 60 #seconds
+ENDPOINT_URL_ENV = "AWS_ENDPOINT_URL"
+
+############################################ FUNCTIONS ############################################
+
+# Builds the botocore config shared by every client, with a connection pool of the given size
+def build_client_config(max_pool_connections=DEFAULT_POOL_CONNECTIONS):
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=max_pool_connections,
+        retries={
+            'mode': RETRY_MODE,
+            'max_attempts': MAX_RETRY_ATTEMPTS
+        },
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT
+    )
+
+# Returns a (cached) session for the given credentials, or for the default credential chain (aws configure, env vars) if none are given
+@functools.lru_cache(maxsize=None)
+def get_session(access_key=None, secret_key=None, session_token=None, region=None):
+    import boto3
+    return boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        aws_session_token=session_token,
+        region_name=region
+    )
+
+# Returns a (cached) low-level client for the given service, with a connection pool of the given size
+# Note: uses the default session if none is given
+@functools.lru_cache(maxsize=None)
+def get_client(service, session=None, max_pool_connections=DEFAULT_POOL_CONNECTIONS):
+    if session is None:
+        session = get_session()
+    client = session.client(service, endpoint_url=get_endpoint_url(service), config=build_client_config(max_pool_connections))
+    awsStats.instrument(client)
+    return client
+
+# Returns a (cached) resource for the given service, with a connection pool of the given size
+# Note: uses the default session if none is given
+@functools.lru_cache(maxsize=None)
+def get_resource(service, session=None, max_pool_connections=DEFAULT_POOL_CONNECTIONS):
+    if session is None:
+        session = get_session()
+    resource = session.resource(service, endpoint_url=get_endpoint_url(service), config=build_client_config(max_pool_connections))
+    awsStats.instrument(resource.meta.client)
+    return resource
+
+# Returns a client and resource pair for the given service, sharing one connection pool of the given size
+# Note: the client is the resource's own, so only one client is created (use get_client() if the resource is not needed)
+# Note: boto3 makes the resource's client convert DynamoDB AttributeValues to/from Python types on every call,
+#       so code that sends or reads AttributeValues (eg. {'N': '2010'}) directly must use get_client() instead
+def get_clients(service, session=None, max_pool_connections=DEFAULT_POOL_CONNECTIONS):
+    resource = get_resource(service, session, max_pool_connections)
+    return resource.meta.client, resource
+
+# Returns the endpoint override for the given service from the environment, or None to use the AWS endpoint
+def get_endpoint_url(service):
+    return os.environ.get(f"{ENDPOINT_URL_ENV}_{service.upper()}", os.environ.get(ENDPOINT_URL_ENV))
+
@@ -13,6 +13,8 @@
         See the following required functions:
         a) login <username>
         --> logging in first logs out, then tries to login with new user ==> so if new user fails to login, nobody will be logged in (just need to successfully login to fix this)
+        --> the S3 client comes from the shared awsClients.py factory (connection pool sized for parallel transfers, adaptive retries), reused when logging in again with the same credentials
+        --> boto3 is only imported at the first login (and only a client is created, no resource), so the shell starts instantly
         b) logout/quit/exit
         c) mkbucket <S3 bucket name>
         d) ls <-l>
@@ -24,8 +26,34 @@
             --> folders inside folders have their name/key displayed in relevance to the bucket they are both from
             --> ls -l can let you see the current folder (where you just called the command), but name/key is just '.'
         f) types of copy - upload <local filename> <S3 obj name>, download <S3 obj name> <local filename>, cp <S3 obj name> <S3 obj name>
+        --> upload/download accept optional '--part-size <MB>', '--concurrency <threads>' and '--max-bandwidth <MB/s>' flags, and display live progress and throughput
+        --> download fetches objects bigger than the part size as parallel byte ranges into a preallocated file (throttled to '--max-bandwidth' too), verified against the ETag unless '--no-verify'
+        --> upload/download/cp accept '-r' to transfer whole directories (object folders), running '--workers <n>' transfers at once and retrying failures
+        --> cp/mv copy objects bigger than '--part-size <MB>' (default 64) with '--concurrency <threads>' parallel upload_part_copy() calls, and mv only deletes the source after a verified copy
+        --> rm/rmdir accept '-r' to remove a folder and everything inside it (deleted in batches of 1000 keys, several batches at once)
+        i) sync <local dir> <S3 dir> (or <S3 dir> <local dir>)
+        --> only transfers new or changed files (compares size, modified time, then the ETag computed locally, including multipart ETags)
         g) mv <S3 obj name> <S3 obj name>
         h) rm <obj name>
+        j) debug <on|off>
+        k) background jobs - <command> &, jobs, wait <job id>, kill <job id>
+        --> commands ending with '&' run in a shared pool of background workers (keeping the PWD they were started in), and report their output when they finish
+        l) cat <S3 obj name>, head/tail <-n lines> <S3 obj name>
+        --> stream objects instead of downloading them (head/tail only fetch the bytes they need with ranged GETs), decompressing gzip objects on the fly
+        m) du <-s> <dir>, find <dir> <-name glob> <-size [+|-]size[k|M|G]>
+        --> traverse folders with delimited list_objects_v2() pages, listing sub-folders concurrently ('--workers <n>')
+        n) tab completion of commands and S3 paths (needs readline), using a short-lived cache of folder listings that also prefetches sub-folders
+        o) stats [reset] [--json <file>]
+        --> AWS request stats per operation (calls, failures, retries, latency percentiles, bytes sent/received), recorded by the shared awsStats.py
+        --> '--stats' (display at exit) and '--stats-json <file>' (save at exit) flags also work for the shell itself
+
+    Script Mode: 'py awsS3Shell.py [-f <script-file> | -c <commands> | -] [-u <username>] [-j <parallel-commands>] [-e] [--json] [--stats] [--stats-json <file>]'
+        - commands are read from a file (one per line), '-c' (separated by ';'), or STDIN ('-', or whenever input is piped in)
+        - logs in once (as '-u <username>' or DEFAULT) unless the script starts with 'login', and skips re-validating the session per command
+        - '-j <n>' runs up to n consecutive commands concurrently (login, cd, debug, logout/quit/exit always run alone)
+        - '-e' stops at the first failed command; exit code is 0 if every command succeeded, 1 otherwise (2 if the script could not be read)
+        - '--json' prints one JSON line per command (command, ok, seconds, output, errors)
+        --> reports the number of S3 requests each command made, counted separately for commands running concurrently (existence checks use cached head_bucket()/head_object() calls)
 
     Error Actions & Messages: For the following error conditions, the shell should print out an appropriate error message, not attempt the command, and continue to wait for another command:
         - Trying to execute a command without logging in first
@@ -58,10 +86,31 @@
 ############################################# IMPORTS #############################################
 
 # IMPORTS - 'pip install <import-package>'
-import boto3
+import awsClients
+import awsStats
+import codecs
+import collections
+import concurrent.futures
 import configparser
+import fnmatch
+import functools
+import hashlib
+import io
+import json
 import os
 import re
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import OrderedDict
+
+# Optional - tab completion is disabled without it (eg. Windows, unless 'pip install pyreadline3')
+try:
+    import readline
+except ImportError:
+    readline = None
 
 ############################################ CONSTANTS ############################################
 
@@ -90,6 +139,92 @@ DOWNLOAD_CMD = "download"
 CP_CMD = "cp"
 MV_CMD = "mv"
 RM_CMD = "rm"
+SYNC_CMD = "sync"
+JOBS_CMD = "jobs"
+WAIT_CMD = "wait"
+KILL_CMD = "kill"
+CAT_CMD = "cat"
+HEAD_CMD = "head"
+TAIL_CMD = "tail"
+DU_CMD = "du"
+FIND_CMD = "find"
+DEBUG_CMD = "debug"
+STATS_CMD = "stats"
+
+# EXISTENCE CHECK CONSTANTS
+EXISTS_CACHE_SIZE = 256
+EXISTS_CACHE_TTL = 30 #seconds
+NOT_FOUND_ERROR_CODES = ["404", "NoSuchKey", "NoSuchBucket", "NotFound"]
+
+# TRANSFER CONSTANTS
+MB = 1024 * 1024
+DEFAULT_PART_SIZE_MB = 8
+DEFAULT_TRANSFER_CONCURRENCY = 10
+DEFAULT_TRANSFER_WORKERS = 8
+MAX_TRANSFER_RETRIES = 3
+TRANSFER_RETRY_BACKOFF = 0.5 #seconds
+RECURSIVE_FLAG = "-r"
+NO_VERIFY_FLAG = "--no-verify"
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+MD5_ETAG_PATTERN = re.compile(r'"?[0-9a-f]{32}(-[0-9]+)?"?')
+# Object attributes (from head_object()) a multipart copy passes on to create_multipart_upload(), besides its content type and metadata
+COPY_HEAD_ATTRIBUTES = [
+    'CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage', 'Expires', 'WebsiteRedirectLocation',
+    'StorageClass', 'ServerSideEncryption', 'SSEKMSKeyId', 'BucketKeyEnabled'
+]
+
+# DELETE CONSTANTS
+DELETE_BATCH_SIZE = 1000 #max keys per delete_objects() call
+DELETE_BATCH_WORKERS = 4
+MAX_ERRORS_DISPLAYED = 10
+PROGRESS_INTERVAL = 0.2 #seconds
+TRANSFER_OPTION_FLAGS = {
+    "--part-size": 'part_size',
+    "--concurrency": 'concurrency',
+    "--max-bandwidth": 'max_bandwidth',
+    "--workers": 'workers'
+}
+TRANSFER_OPTIONS_USAGE = "[--part-size <MB>] [--concurrency <threads>] [--max-bandwidth <MB/s>] [--workers <n>]"
+
+# COPY CONSTANTS
+DEFAULT_COPY_PART_SIZE_MB = 64
+MIN_PART_SIZE = 5 * MB
+MAX_PART_COUNT = 10000
+COPY_OPTIONS_USAGE = "[--part-size <MB>] [--concurrency <threads>] [--workers <n>]"
+
+# STREAMING CONSTANTS
+STREAM_CHUNK_SIZE = 64 * 1024 #bytes per ranged GET for head/tail (doubles while more is needed)
+DEFAULT_LINE_COUNT = 10
+LINE_COUNT_FLAG = "-n"
+GZIP_WBITS = 16 + zlib.MAX_WBITS #zlib window bits for decoding the gzip format
+
+# TRAVERSAL CONSTANTS
+DEFAULT_LIST_WORKERS = 16
+SIZE_UNITS = {'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# CONNECTION CONSTANTS
+S3_POOL_CONNECTIONS = DEFAULT_TRANSFER_WORKERS * DEFAULT_TRANSFER_CONCURRENCY #enough for the default recursive transfer (workers x threads each)
+COUNT_REQUEST_HANDLER_ID = "s3-shell-count-request" #registered once per (reused) client
+
+# COMPLETION CONSTANTS
+COMPLETION_CACHE_TTL = 10 #seconds
+COMPLETION_PREFETCH_LIMIT = 20 #max sub-folders prefetched per listing
+COMPLETION_PREFETCH_WORKERS = 2
+
+# STATE CHANGING COMMANDS (must run on their own, never concurrently or in the background)
+STATE_CMD_GROUP = [LOGIN_CMD, CD_CMD, DEBUG_CMD, JOBS_CMD, WAIT_CMD, KILL_CMD] + TERMINATE_CMD_GROUP
+
+# BACKGROUND JOB CONSTANTS
+BACKGROUND_SUFFIX = "&"
+BACKGROUND_JOB_WORKERS = 4
+
+# SCRIPT MODE CONSTANTS
+SCRIPT_USAGE_STATEMENT = "Usage: py awsS3Shell.py [-f <script-file> | -c <commands> | -] [-u <username>] [-j <parallel-commands>] [-e] [--json] [--stats] [--stats-json <file>]"
+SCRIPT_FILE_FLAG = "-f"
+SCRIPT_COMMANDS_FLAG = "-c"
+SCRIPT_STDIN = "-"
+SCRIPT_COMMAND_SEPARATOR = ";"
+SCRIPT_COMMENT = "#"
 
 ############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
 
@@ -98,15 +233,35 @@ def main():
     global terminate_flag
     global session
     global s3_client
-    global s3_resource
     global curr_wd
     global commands
+    global exists_cache
+    global exists_lock
+    global debug_flag
+    global command_state
+    global background_jobs
+    global job_executor
+    global next_job_id
+    global listing_cache
+    global listing_lock
+    global prefetch_executor
+    global completion_matches
 
     terminate_flag = False
     session = None
     s3_client = None
-    s3_resource = None
     curr_wd = ROOT_DIR.copy()
+    exists_cache = OrderedDict()
+    exists_lock = threading.Lock()
+    debug_flag = False
+    command_state = threading.local()
+    background_jobs = {}
+    job_executor = None
+    next_job_id = 1
+    listing_cache = {}
+    listing_lock = threading.Lock()
+    prefetch_executor = None
+    completion_matches = []
     commands = {
         LOGIN_CMD: login,
         TERMINATE_CMD_GROUP[0]: set_terminate,
@@ -122,41 +277,99 @@ def main():
         DOWNLOAD_CMD: download,
         CP_CMD: cp,
         MV_CMD: mv,
-        RM_CMD: rm
+        RM_CMD: rm,
+        SYNC_CMD: sync,
+        JOBS_CMD: jobs_cmd,
+        WAIT_CMD: wait_cmd,
+        KILL_CMD: kill_cmd,
+        CAT_CMD: cat,
+        HEAD_CMD: head,
+        TAIL_CMD: tail,
+        DU_CMD: du,
+        FIND_CMD: find,
+        DEBUG_CMD: debug,
+        STATS_CMD: stats
     }
 
+    # Remove the optional '--stats'/'--stats-json <file>' flags (shown/saved at exit, see awsStats.py), then
+    # run in script mode if commands were given as command line args, or are piped in through STDIN
+    # Note: stats are always recorded in the shell, for its 'stats' command (it only makes S3 calls, which stats leave unchanged)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(SCRIPT_USAGE_STATEMENT)
+    awsStats.enable()
+    script_options = parse_script_args(argv[1:])
+    if script_options is None:
+        sys.exit(SCRIPT_USAGE_STATEMENT)
+    if script_options['source'] is None and not sys.stdin.isatty():
+        script_options['source'] = SCRIPT_STDIN
+    if script_options['source'] is not None:
+        sys.exit(run_script(script_options))
+
+    # Enable tab completion of commands and S3 paths (only if readline is available, eg. not on Windows)
+    setup_completion()
+
     print("\n=== S3 Shell Started ===\n")
 
     # Continue to run S3 shell program until user exits/quits/logs out
     while not terminate_flag:
-        # Display command line prompt, collect user command input (strip it, split on spaces) separately, removing empty items from arguments
-        user_input = input(f"{get_pwd_string()}> ").strip().split(" ")
-        cmd = user_input[0]
-        args = filter_empty_strings(user_input)
-
-        # Must login before using any commands other than to terminate S3 shell program
-        # Display err msg if not logged in first, or command is invalid - execute valid commands
-        # Check session is still valid before executing the command
-        if cmd in commands.keys():
-            if cmd != LOGIN_CMD and cmd not in TERMINATE_CMD_GROUP:
-                if session is None:
-                    print_error(cmd, "Must login first.")
-                    continue
-                else:
-                    if not validate_session():
-                        print_error(args[0], "Session Failure - AWS access credentials expired, please login again to continue.")
-                        continue
-            try:
-                commands[cmd](args=args)
-            except Exception as e:
-                print_error(args[0], e)
-                continue
+        # Report background jobs that finished since the last prompt
+        report_finished_jobs()
+
+        # Display command line prompt, collect user command input, then execute it (in the background if it ends with '&')
+        user_input = input(f"{get_pwd_string()}> ").strip()
+        if user_input.endswith(BACKGROUND_SUFFIX):
+            start_background_job(user_input[:-len(BACKGROUND_SUFFIX)].strip())
         else:
-            print_error(cmd, "Invalid command.")
-            continue
+            run_command(user_input)
+
+    # Let any background jobs finish before stopping
+    if job_executor is not None:
+        running_count = len([job for job in background_jobs.values() if not job['future'].done()])
+        if running_count > 0:
+            print(f"Waiting for {running_count} background job(s) to finish (use 'kill' before exiting to stop them)...")
+        job_executor.shutdown(wait=True)
+        report_finished_jobs()
 
     print("\n=== S3 Shell Stopped ===")
 
+# Runs a single command line (strip it, split on spaces), returns true if it ran without any errors
+# Note: validate_flag checks the session is still valid before the command (script mode validates once after login instead)
+def run_command(user_input, validate_flag=True):
+    # Collect user command input (split on spaces) separately, removing empty items from arguments
+    user_input = user_input.strip().split(" ")
+    cmd = user_input[0]
+    args = filter_empty_strings(user_input)
+
+    # Track errors printed while running this command (per thread, since script mode can run commands concurrently)
+    command_state.errors = []
+
+    # Must login before using any commands other than to terminate S3 shell program
+    # Display err msg if not logged in first, or command is invalid - execute valid commands
+    # Check session is still valid before executing the command
+    if cmd in commands.keys():
+        # Start a new S3 request counter for this command (per thread, and carried into the command's own worker threads, see carry_command_state())
+        command_state.request_counter = {'count': 0, 'lock': threading.Lock()}
+
+        if cmd not in [LOGIN_CMD, DEBUG_CMD, STATS_CMD] + TERMINATE_CMD_GROUP:
+            if session is None:
+                print_error(cmd, "Must login first.")
+                return False
+            elif validate_flag and not validate_session():
+                print_error(args[0], "Session Failure - AWS access credentials expired, please login again to continue.")
+                return False
+        try:
+            commands[cmd](args=args)
+        except Exception as e:
+            print_error(args[0], e)
+        finally:
+            # Report how many S3 requests the command needed (only in debug mode)
+            if debug_flag:
+                print(f"[DEBUG] {cmd}: {command_state.request_counter['count']} S3 request(s)")
+    else:
+        print_error(cmd, "Invalid command.")
+    return len(command_state.errors) == 0
+
 ######################################## COMMAND FUNCTIONS ########################################
 
 # a) Logs out signed-in user, if there is one, then attempts to login as specified user from config, DEFAULT otherwise
@@ -165,12 +378,14 @@ def login(args):
     # Bring in global vars (to be changed)
     global session
     global s3_client
-    global s3_resource
 
-    # Reset state
+    # Reset state (including cached existence checks, which may not apply to the new user)
     session = None
     s3_client = None
-    s3_resource = None
+    with exists_lock:
+        exists_cache.clear()
+    with listing_lock:
+        listing_cache.clear()
 
     # Parse config for auth credentials
     config = configparser.ConfigParser()
@@ -205,29 +420,23 @@ def login(args):
     except:
         session_token = None
 
-    # Create session using config credentials for DEFAULT or given username, using it to create a client and resource
-    # When attempting to provision S3 session, client, and resource, display err msg and reset if err occurs
+    # Create session using config credentials for DEFAULT or given username, using it to create a client (the shell never needs a resource)
+    # Note: the shared factory reuses the session and connection pool when logging in again with the same credentials
+    # When attempting to provision S3 session and client, display err msg and reset if err occurs
     try:
-        session = boto3.Session(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            aws_session_token=session_token,
-            region_name=region
-        )
-        s3_client = session.client("s3")
-        s3_resource = session.resource("s3")
+        session = awsClients.get_session(access_key, secret_key, session_token, region)
+        s3_client = awsClients.get_client("s3", session, S3_POOL_CONNECTIONS)
+        s3_client.meta.events.register("request-created.s3", count_request, unique_id=COUNT_REQUEST_HANDLER_ID)
     except:
         print_error(args[0], f"Login Failed - AWS access credentials for profile username '{username}' are invalid.")
         session = None
         s3_client = None
-        s3_resource = None
         return
 
     # Validate Credentials, display message for success and failure
     if not validate_session():
         session = None
         s3_client = None
-        s3_resource = None
         print_error(args[0], "Session Failure - AWS access credentials invalid, expired, or insufficient permissions to call 'list_buckets()'.")
     else:
         print(f"{args[0]}: Successful session login using profile username '{username}'.")
@@ -278,9 +487,13 @@ def mkbucket(args):
     if re.search("(\\-\\.)+", bucket_name) != None or re.search("(\\.\\-)+", bucket_name) != None:
         print_error(args[0], "Invalid bucket name - Bucket names cannot use dots/periods (.) adjacent to dashes/hyphens (-).")
         bad_bucket_name_flag = True
-    # Check if user already has bucket with the given name
-    if bucket_exists(bucket_name):
-        print_error(args[0], f"Invalid bucket name - Bucket names must be unique, you already have a bucket with the name '{bucket_name}'.")
+    # Check if user already has bucket with the given name (a permission error means another account owns it)
+    try:
+        if bucket_exists(bucket_name):
+            print_error(args[0], f"Invalid bucket name - Bucket names must be unique, you already have a bucket with the name '{bucket_name}'.")
+            bad_bucket_name_flag = True
+    except s3_client.exceptions.ClientError:
+        print_error(args[0], f"Invalid bucket name - Bucket names must be globally unique, '{bucket_name}' is owned by another account.")
         bad_bucket_name_flag = True
 
     # Skip bucket creation attempt if name issue is already found
@@ -294,6 +507,8 @@ def mkbucket(args):
         print_error(args[0], f"Bucket creation failure - cannot create bucket '{bucket_name}', most likely not globally unique.")
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(bucket_name)
 
 # Displays S3 buckets (if root) or objects in a bucket, long form if '-l' optional flag is added (object name, size, file type, and creation date)
 # Note: Displays paths using Unix-style '/' notation
@@ -406,12 +621,16 @@ def mkdir(args):
     except Exception as e:
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(bucket, obj_key)
 
 # Remove (delete) an object folder (directory), as long as not in root level directory (ie. must be in a bucket, does not remove/delete a bucket)
+# Note: '-r' flag removes a non-empty directory along with everything inside it (see delete_prefix())
 def rmdir(args):
-    # Check #of args, and copy dir arg to var
+    # Check #of args (after removing optional '-r' flag), and copy dir arg to var
+    args, recursive_flag = pop_flag(args, RECURSIVE_FLAG)
     if len(args) != 2:
-        print_error(args[0], "Usage: rmdir <dir>")
+        print_error(args[0], "Usage: rmdir [-r] <dir>")
         return
     dir_arg = args[1]
 
@@ -440,6 +659,11 @@ def rmdir(args):
             print_error(args[0], f"Remove failed for '{dir_arg}' - No such file or directory.")
         return
 
+    # Remove the dir and all of its contents in batches for '-r' flag
+    if recursive_flag:
+        delete_prefix(args[0], bucket, obj_key)
+        return
+
     # Ensure dir is empty before removing, display err msg if not empty
     response = s3_client.list_objects_v2(
         Bucket=bucket,
@@ -458,18 +682,37 @@ def rmdir(args):
     except Exception as e:
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(bucket, obj_key)
 
 # Uploads (copies) a file from local file system to S3 object store, using either the total "path" or assume it is in the object "directory" (folder) of PWD (for S3 object)
+# Note: optional transfer flags tune the multipart part size, #of concurrent threads, and max bandwidth (see TransferConfig)
+# Note: '-r' flag uploads a whole local directory tree (as object folders) using a pool of '--workers' concurrent file transfers
 def upload(args):
+    # Separate optional transfer flags from the other args
+    try:
+        args, transfer_options = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    args, recursive_flag = pop_flag(args, RECURSIVE_FLAG)
+
     # Check #of args, and copy dir arg to var
     if len(args) != 3:
-        print_error(args[0], "Usage: upload <local-filename-source> <s3-object-name-destination>")
+        print_error(args[0], f"Usage: upload [-r] {TRANSFER_OPTIONS_USAGE} <local-filename-source> <s3-object-name-destination>")
         return
     local_src = args[1]
     dest_arg = args[2]
 
-    # Check if file does not exist, display error message
-    if not os.path.isfile(local_src):
+    # Check if file (or dir for '-r') does not exist, display error message
+    if recursive_flag:
+        if not os.path.isdir(local_src):
+            print_error(args[0], f"Upload failed for '{local_src}' - No such directory.")
+            return
+    elif os.path.isdir(local_src):
+        print_error(args[0], f"Upload failed for '{local_src}' - Is a directory (use '-r' to upload directories).")
+        return
+    elif not os.path.isfile(local_src):
         print_error(args[0], f"Upload failed for '{local_src}' - No such file.")
         return
 
@@ -489,28 +732,46 @@ def upload(args):
     dest_bucket = get_bucket_name(dest_list_path)
     dest_key = get_obj_key(dest_list_path)
 
-    # Attempt to upload the local filename source to S3 object (bucket or dir)
+    # Upload every file in the local directory tree concurrently for '-r' flag
+    if recursive_flag:
+        upload_tree(args[0], local_src, dest_bucket, dest_key, transfer_options)
+        return
+
+    # Attempt to upload the local filename source to S3 object (bucket or dir), displaying progress and throughput
+    progress = create_transfer_progress(args[0], os.path.getsize(local_src))
     try:
-        s3_client.upload_file(
-            Filename = local_src,
-            Bucket = dest_bucket,
-            Key = dest_key
-        )
+        managed_upload(local_src, dest_bucket, dest_key, build_transfer_config(transfer_options), progress)
     except Exception as e:
+        end_progress_line(progress)
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(dest_bucket, dest_key)
+    print_transfer_summary(args[0], progress)
 
 # Downloads (copies) a file from S3 object store to local file system, using either the total "path" or assume it is in the object "directory" (folder) of PWD (for S3 object)
+# Note: optional transfer flags tune the multipart part size, #of concurrent threads, and max bandwidth (see TransferConfig)
+# Note: '-r' flag downloads a whole object folder into a new local directory using a pool of '--workers' concurrent file transfers
+# Note: '--no-verify' flag skips checking large (ranged) downloads against the object's ETag
 def download(args):
+    # Separate optional flags (before the transfer options, which reject any other flag) from the other args
+    args, recursive_flag = pop_flag(args, RECURSIVE_FLAG)
+    args, no_verify_flag = pop_flag(args, NO_VERIFY_FLAG)
+    try:
+        args, transfer_options = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+
     # Check #of args, and copy dir arg to var
     if len(args) != 3:
-        print_error(args[0], "Usage: download <s3-object-name-source> <local-filename-destination>")
+        print_error(args[0], f"Usage: download [-r] [{NO_VERIFY_FLAG}] {TRANSFER_OPTIONS_USAGE} <s3-object-name-source> <local-filename-destination>")
         return
     src_arg = args[1]
     local_dest = args[2]
 
-    # Check if file does not exist, display error message
-    if os.path.isfile(local_dest):
+    # Check if file (or anything for '-r') does not exist, display error message
+    if os.path.isfile(local_dest) or (recursive_flag and os.path.exists(local_dest)):
         print_error(args[0], f"Download failed - Local filename '{local_dest}' already exists.")
         return
 
@@ -530,23 +791,48 @@ def download(args):
     src_bucket = get_bucket_name(src_list_path)
     src_key = get_obj_key(src_list_path)
 
-    # Attempt to download the S3 object (not bucket or dir) to local filename source location
+    # Download every object in the object folder concurrently for '-r' flag (as long as it is a folder)
+    if recursive_flag:
+        if not key_exists(src_bucket, src_key + '/'):
+            print_error(args[0], f"Download failed for '{src_arg}' - No such directory.")
+            return
+        download_tree(args[0], src_bucket, src_key + '/', local_dest, transfer_options)
+        return
+
+    # Attempt to download the S3 object (not bucket or dir) to local filename source location, displaying progress and throughput
+    # Note: objects bigger than the part size are fetched as parallel byte ranges into a preallocated file, each hashed as it arrives to verify the ETag (see ranged_download())
+    progress = None
     try:
-        s3_client.download_file(
-            Filename = local_dest,
-            Bucket = src_bucket,
-            Key = src_key
-        )
+        info = s3_client.head_object(Bucket=src_bucket, Key=src_key)
+        total_size = info['ContentLength']
+        progress = create_transfer_progress(args[0], total_size)
+        if total_size > build_transfer_config(transfer_options).multipart_chunksize:
+            ranged_download(src_bucket, src_key, local_dest, info, transfer_options, progress, not no_verify_flag)
+        else:
+            managed_download(src_bucket, src_key, local_dest, build_transfer_config(transfer_options), progress)
     except Exception as e:
+        end_progress_line(progress)
         print_error(args[0], e)
         return
+    print_transfer_summary(args[0], progress)
 
 # Moves/Copies an object from s3 location to another (does not delete source object), using either the total "path" or assume it is in the object "directory" (folder) of PWD (for both params)
 # Note: this removes/deletes objects other than buckets and folders (eg. files)
+# Note: '-r' flag copies a whole object folder using a pool of '--workers' concurrent copies
+# Note: objects bigger than '--part-size' are copied with '--concurrency' parallel upload_part_copy() calls (see copy_s3_object())
+# Note: returns true if the copy succeeded (used by mv)
 def cp(args):
+    # Separate optional flags from the other args
+    try:
+        args, transfer_options = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    args, recursive_flag = pop_flag(args, RECURSIVE_FLAG)
+
     # Check #of args, and copy dir arg to var
     if len(args) != 3:
-        print_error(args[0], "Usage: cp <s3-object-name-source> <s3-object-name-destination>")
+        print_error(args[0], f"Usage: cp [-r] {COPY_OPTIONS_USAGE} <s3-object-name-source> <s3-object-name-destination>")
         return
     src_arg = args[1]
     dest_arg = args[2]
@@ -580,6 +866,14 @@ def cp(args):
     dest_bucket = get_bucket_name(dest_list_path)
     dest_key = get_obj_key(dest_list_path)
 
+    # Copy every object in the object folder concurrently for '-r' flag (as long as it is a folder)
+    if recursive_flag:
+        if not key_exists(src_bucket, src_key + '/'):
+            print_error(args[0], f"Copy failed for source '{src_arg}' - No such directory.")
+            return
+        copy_tree(args[0], src_bucket, src_key + '/', dest_bucket, dest_key, transfer_options)
+        return
+
     # Check if object does not exist (or is a dir), display err msg if true
     if not key_exists(src_bucket, src_key):
         print_error(args[0], f"Copy failed for source '{src_arg}' - No such file or directory.")
@@ -588,44 +882,59 @@ def cp(args):
         print_error(args[0], f"Copy command does not support moving directories.")
         return
 
-    # Attempt to Copy from source to destination
+    # Attempt to Copy from source to destination (server-side, in parallel parts for large objects), returning true if it succeeded
     try:
-        s3_client.copy_object(
-            CopySource={
-                'Bucket': src_bucket,
-                'Key': src_key
-            },
-            Bucket=dest_bucket,
-            Key=dest_key
-        )
+        copy_s3_object(src_bucket, src_key, dest_bucket, dest_key, transfer_options)
     except Exception as e:
         print_error(args[0], e)
-        return
+        return False
+    finally:
+        invalidate_exists(dest_bucket, dest_key)
+    return True
 
 # Moves/Copies an object from s3 location to another (deletes source object), using either the total "path" or assume it is in the object "directory" (folder) of PWD (for both params)
 # Note: this removes/deletes objects other than buckets and folders (eg. files)
+# Note: the source is only deleted after the copy succeeded and the destination is verified to match it
 def mv(args):
-    # Check #of args
-    if len(args) != 3:
-        print_error(args[0], "Usage: mv <s3-object-name-source> <s3-object-name-destination>")
+    # Check #of args (ignoring the optional copy flags, which are passed on to cp)
+    try:
+        path_args, _ = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
         return
+    if len(path_args) != 3 or RECURSIVE_FLAG in path_args:
+        print_error(args[0], f"Usage: mv {COPY_OPTIONS_USAGE} <s3-object-name-source> <s3-object-name-destination>")
+        return
+    src_arg = path_args[1]
+    dest_arg = path_args[2]
 
-    # Copy source to destination
-    cp(args)
-
-    # Then, delete source after copying
-    # Note: already validated this stuff in cp
-    src_arg = args[1]
-
-    # Attempt to convert the given path string to a list version for the source
+    # Attempt to convert the given path strings to list versions
     try:
         src_list_path = convert_path_list(src_arg)
+        dest_list_path = convert_path_list(dest_arg)
     except Exception as e:
         print_error(args[0], e)
         return
-    # Get the bucket name, and object key for given path
+    # Get the bucket name, and object key for given paths
     src_bucket = get_bucket_name(src_list_path)
     src_key = get_obj_key(src_list_path)
+    dest_bucket = get_bucket_name(dest_list_path)
+    dest_key = get_obj_key(dest_list_path)
+
+    # Moving an object onto itself would delete it
+    if src_bucket == dest_bucket and src_key == dest_key:
+        print_error(args[0], f"Move failed - source '{src_arg}' and destination '{dest_arg}' are the same object.")
+        return
+
+    # Copy source to destination (cp validates the paths), stopping if the copy failed
+    if not cp(args):
+        print_error(args[0], f"Move failed - source '{src_arg}' was not deleted because the copy failed.")
+        return
+
+    # Then, delete source after verifying the copy
+    if not verify_copy(src_bucket, src_key, dest_bucket, dest_key):
+        print_error(args[0], f"Move failed - source '{src_arg}' was not deleted because the copy at '{dest_arg}' does not match it.")
+        return
 
     # Attempt to Delete the non-dir/folder object
     try:
@@ -636,13 +945,17 @@ def mv(args):
     except Exception as e:
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(src_bucket, src_key)
 
 # Removes/Deletes a named S3 object, using either the total "path" or assume it is in the object "directory" (folder) of PWD
 # Note: this removes/deletes objects other than buckets and folders (eg. files)
+# Note: '-r' flag also removes folders along with everything inside them (see delete_prefix())
 def rm(args):
-    # Check #of args, and copy dir arg to var
+    # Check #of args (after removing optional '-r' flag), and copy dir arg to var
+    args, recursive_flag = pop_flag(args, RECURSIVE_FLAG)
     if len(args) != 2:
-        print_error(args[0], "Usage: rm <s3-object-name>")
+        print_error(args[0], "Usage: rm [-r] <s3-object-name>")
         return
     obj_arg = args[1]
     
@@ -665,6 +978,10 @@ def rm(args):
     # Check if object does not exist (or is a dir), display err msg if true
     if not key_exists(bucket, obj_key):
         if key_exists(bucket, obj_key + '/'):
+            # Remove the dir and all of its contents in batches for '-r' flag
+            if recursive_flag:
+                delete_prefix(args[0], bucket, obj_key + '/')
+                return
             print_error(args[0], f"Remove failed for '{obj_arg}' - Is a directory.")
         else:
             print_error(args[0], f"Remove failed for '{obj_arg}' - No such file or directory.")
@@ -679,6 +996,539 @@ def rm(args):
     except Exception as e:
         print_error(args[0], e)
         return
+    finally:
+        invalidate_exists(bucket, obj_key)
+
+# Prints the contents of an S3 object, streaming it (and decompressing gzip objects on the fly) instead of downloading it to a file
+def cat(args):
+    # Check #of args, and get the object for the path
+    if len(args) != 2:
+        print_error(args[0], "Usage: cat <s3-object-name>")
+        return
+    obj = get_stream_object(args[0], args[1])
+    if obj is None:
+        return
+    bucket, key, info = obj
+
+    # Stream the body in chunks, decoding (and decompressing) as it arrives
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        for data in decompress_chunks(body.iter_chunks(STREAM_CHUNK_SIZE), is_gzip_object(key, info)):
+            sys.stdout.write(decoder.decode(data))
+        sys.stdout.write(decoder.decode(b"", final=True))
+    finally:
+        body.close()
+    sys.stdout.flush()
+
+# Prints the first lines of an S3 object (default 10), fetching only the bytes needed with ranged GETs
+def head(args):
+    # Check #of args (after the optional '-n <lines>' flag), and get the object for the path
+    try:
+        args, line_count = parse_line_count(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    if len(args) != 2:
+        print_error(args[0], f"Usage: head [{LINE_COUNT_FLAG} <lines>] <s3-object-name>")
+        return
+    obj = get_stream_object(args[0], args[1])
+    if obj is None:
+        return
+    bucket, key, info = obj
+
+    # Stop fetching ranges as soon as enough lines were found
+    if line_count == 0:
+        return
+    for i, line in enumerate(iter_object_lines(bucket, key, info)):
+        print(decode_line(line))
+        if i + 1 >= line_count:
+            break
+
+# Prints the last lines of an S3 object (default 10), fetching only the bytes needed with ranged GETs from the end of the object
+# Note: gzip objects cannot be decompressed from the middle, so they are streamed from the start (only keeping the last lines)
+def tail(args):
+    # Check #of args (after the optional '-n <lines>' flag), and get the object for the path
+    try:
+        args, line_count = parse_line_count(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    if len(args) != 2:
+        print_error(args[0], f"Usage: tail [{LINE_COUNT_FLAG} <lines>] <s3-object-name>")
+        return
+    obj = get_stream_object(args[0], args[1])
+    if obj is None:
+        return
+    bucket, key, info = obj
+
+    if line_count == 0:
+        return
+    if is_gzip_object(key, info):
+        lines = list(collections.deque(iter_object_lines(bucket, key, info), maxlen=line_count))
+    else:
+        lines = get_last_lines(bucket, key, info['ContentLength'], line_count)
+    for line in lines:
+        print(decode_line(line))
+
+# Displays the disk usage (total size and #of objects) of a folder and each of its sub-folders, or only the total for '-s' flag
+# Note: defaults to the PWD if no path is given, and traverses sub-folders with '--workers <n>' concurrent listings
+def du(args):
+    # Separate optional flags from the other args, then check #of args
+    try:
+        args, options = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    args, summary_flag = pop_flag(args, "-s")
+    if len(args) > 2:
+        print_error(args[0], "Usage: du [-s] [--workers <n>] <optional-dir>")
+        return
+
+    # Get the bucket and folder prefix to traverse
+    location = get_traversal_location(args[0], args[1] if len(args) == 2 else None)
+    if location is None:
+        return
+    bucket, prefix = location
+
+    # Accumulate each object's size into its folder and every parent folder (up to the traversed folder)
+    totals = {prefix: [0, 0]}
+    # Note: a folder object counts towards the folder itself
+    for obj in traverse_prefix(bucket, prefix, options):
+        folder = obj['Key'] if obj['Key'].endswith('/') else obj['Key'][:obj['Key'].rfind('/') + 1]
+        while True:
+            total = totals.setdefault(folder, [0, 0])
+            total[0] += obj['Size']
+            total[1] += 1
+            if folder == prefix:
+                break
+            folder = folder[:folder.rstrip('/').rfind('/') + 1]
+
+    # Display sub-folders (unless '-s'), then the total last
+    folders = [prefix] if summary_flag else sorted(totals.keys(), key=lambda folder: (folder == prefix, folder))
+    for folder in folders:
+        print(f"{totals[folder][0]}\t{totals[folder][1]}\ts3:/{bucket}/{folder}")
+
+# Finds objects (and folders) in a folder and all of its sub-folders matching a name glob pattern and/or size
+# Note: '-size' is in bytes unless it ends with k, M, or G, and matches more than (+), less than (-), or exactly that size
+def find(args):
+    # Separate optional flags from the other args, then check #of args
+    usage = "Usage: find <dir> [-name <glob>] [-size <[+|-]size[k|M|G]>] [--workers <n>]"
+    try:
+        args, options = parse_transfer_options(args)
+        args, name_pattern = pop_flag_value(args, "-name")
+        args, size_arg = pop_flag_value(args, "-size")
+        size_test = None if size_arg is None else parse_size_test(size_arg)
+    except ValueError as e:
+        print_error(args[0], e)
+        print_error(args[0], usage)
+        return
+    if len(args) != 2:
+        print_error(args[0], usage)
+        return
+
+    # Get the bucket and folder prefix to traverse
+    location = get_traversal_location(args[0], args[1])
+    if location is None:
+        return
+    bucket, prefix = location
+
+    # Display every match (in the order they were found)
+    for obj in traverse_prefix(bucket, prefix, options):
+        name = obj['Key'].rstrip('/').split('/')[-1]
+        if name_pattern is not None and not fnmatch.fnmatchcase(name, name_pattern):
+            continue
+        if size_test is not None and not size_test(obj['Size']):
+            continue
+        print(f"s3:/{bucket}/{obj['Key']}")
+
+# Synchronizes a local directory and an S3 object folder, only transferring files that are new or changed (in either direction)
+# Note: the direction is S3 to local if the source is an absolute S3 path (starts with 's3:' or '~') or is not a local directory, otherwise local to S3
+# Note: files are unchanged when their size matches and they are not newer than their copy, or their ETag (MD5, including multipart ETags) matches
+def sync(args):
+    # Separate optional transfer flags from the other args
+    try:
+        args, transfer_options = parse_transfer_options(args)
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+
+    # Check #of args, and copy args to vars
+    if len(args) != 3:
+        print_error(args[0], f"Usage: sync {TRANSFER_OPTIONS_USAGE} (<local-dir> <s3-dir>|<s3-dir> <local-dir>)")
+        return
+    src_arg = args[1]
+    dest_arg = args[2]
+
+    # Determine sync direction, and which arg is the S3 path
+    upload_flag = not is_abs_path(src_arg) and os.path.isdir(src_arg)
+    local_dir, s3_arg = (src_arg, dest_arg) if upload_flag else (dest_arg, src_arg)
+    if not upload_flag and os.path.exists(local_dir) and not os.path.isdir(local_dir):
+        print_error(args[0], f"Sync failed - Local path '{local_dir}' is not a directory.")
+        return
+
+    # Attempt to convert the given path string to a list version for the S3 path
+    try:
+        list_path = convert_path_list(s3_arg)
+    except Exception as e:
+        print_error(args[0], e)
+        return
+    # Validate path as list (after root and bucket)
+    if len(list_path) < 3:
+        print_error(args[0], "Invalid location - cannot sync buckets/objects at root.")
+        return
+    bucket = get_bucket_name(list_path)
+    prefix = get_obj_key(list_path)
+
+    # The source S3 folder must exist when syncing down
+    if not upload_flag and not key_exists(bucket, prefix + '/'):
+        print_error(args[0], f"Sync failed for '{s3_arg}' - No such directory.")
+        return
+
+    if upload_flag:
+        sync_up(args[0], local_dir, bucket, prefix, transfer_options)
+    else:
+        sync_down(args[0], bucket, prefix, local_dir, transfer_options)
+
+# Toggles debug mode, which reports the number of S3 requests each command made after it runs
+def debug(args):
+    # Check #of args and for optional on/off arg (toggles if not given)
+    global debug_flag
+    if len(args) > 2:
+        print_error(args[0], "Usage: debug <on|off>")
+        return
+    elif len(args) == 2:
+        if args[1] == "on":
+            debug_flag = True
+        elif args[1] == "off":
+            debug_flag = False
+        else:
+            print_error(args[0], "Invalid argument.")
+            return
+    else:
+        debug_flag = not debug_flag
+    print(f"{args[0]}: Debug mode {'on' if debug_flag else 'off'}.")
+
+# Displays the AWS request stats of this shell session per operation (calls, failures, retries, latency, bytes), or clears them with 'reset'
+# Note: optional '--json <file>' also saves them as JSON (see awsStats.py)
+def stats(args):
+    # Check args for optional 'reset' and '--json <file>'
+    try:
+        args, json_filename = pop_flag_value(args, "--json")
+    except ValueError as e:
+        print_error(args[0], e)
+        return
+    if len(args) > 2 or (len(args) == 2 and args[1] != "reset"):
+        print_error(args[0], "Usage: stats [reset] [--json <file>]")
+        return
+
+    awsStats.print_stats()
+    if json_filename is not None:
+        awsStats.dump_stats(json_filename)
+        print(f"{args[0]}: Saved stats to '{json_filename}'.")
+    if len(args) == 2:
+        awsStats.reset_stats()
+        print(f"{args[0]}: Stats reset.")
+
+##################################### BACKGROUND JOB FUNCTIONS #####################################
+
+# Lists background jobs (id, status, seconds running, command)
+def jobs_cmd(args):
+    # Check #of args
+    if len(args) != 1:
+        print_error(args[0], "Usage: jobs")
+        return
+
+    for job in background_jobs.values():
+        print(f"[{job['id']}] {get_job_status(job):<8}\t{get_job_seconds(job):.1f}s\t{job['command']}")
+
+# Waits for a background job (or all of them if no id is given) to finish, then reports it
+def wait_cmd(args):
+    # Check #of args, and get the jobs to wait for
+    if len(args) > 2:
+        print_error(args[0], "Usage: wait <optional-job-id>")
+        return
+    waiting_jobs = get_jobs_from_args(args)
+    if waiting_jobs is None:
+        return
+
+    concurrent.futures.wait([job['future'] for job in waiting_jobs])
+    report_finished_jobs()
+
+# Stops a background job: a queued job never starts, and a running job stops at its next transfer/part/batch (or progress update)
+def kill_cmd(args):
+    # Check #of args, and get the job to kill
+    if len(args) != 2:
+        print_error(args[0], "Usage: kill <job-id>")
+        return
+    killed_jobs = get_jobs_from_args(args)
+    if killed_jobs is None:
+        return
+
+    job = killed_jobs[0]
+    if job['future'].done():
+        print_error(args[0], f"Job [{job['id']}] has already finished.")
+        return
+    job['cancel_event'].set()
+    job['future'].cancel()
+    print(f"[{job['id']}] Killing\t{job['command']}")
+
+# Starts a command as a background job in the shared job worker pool, keeping the PWD from when it was started
+def start_background_job(user_input):
+    global job_executor
+    global next_job_id
+
+    # State changing commands (and empty ones) cannot run in the background
+    cmd = user_input.split(" ")[0]
+    if cmd == "" or cmd in STATE_CMD_GROUP:
+        print_error(cmd, "Command cannot run in the background.")
+        return
+
+    # Create the shared worker pool the first time, and start capturing per-job output
+    if job_executor is None:
+        job_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BACKGROUND_JOB_WORKERS)
+    install_thread_output()
+
+    job = {
+        'id': next_job_id,
+        'command': user_input,
+        'wd': get_wd().copy(),
+        'cancel_event': threading.Event(),
+        'output': io.StringIO(),
+        'errors': [],
+        'start': None,
+        'end': None,
+        'reported': False
+    }
+    next_job_id += 1
+    job['future'] = job_executor.submit(run_background_job, job)
+    background_jobs[job['id']] = job
+    print(f"[{job['id']}] {user_input}")
+
+# Runs a background job's command in a worker thread (with its own output buffer, PWD, and kill event), returns true if it ran without errors
+def run_background_job(job):
+    job['start'] = time.monotonic()
+    command_state.output = job['output']
+    command_state.wd = job['wd']
+    command_state.cancel_event = job['cancel_event']
+    try:
+        return run_command(job['command'])
+    finally:
+        job['errors'] = list(command_state.errors)
+        job['end'] = time.monotonic()
+        del command_state.output
+        del command_state.wd
+        del command_state.cancel_event
+
+# Prints the status and output of every background job that finished but was not reported yet
+def report_finished_jobs():
+    for job in background_jobs.values():
+        if job['future'].done() and not job['reported']:
+            job['reported'] = True
+            print(f"[{job['id']}] {get_job_status(job):<8}\t{job['command']}")
+            output = job['output'].getvalue().strip("\n")
+            if output != "":
+                print(output)
+
+# Returns the status of a background job (Queued, Running, Done, Failed, or Killed)
+# Note: a killed job that still finished everything successfully is Done
+def get_job_status(job):
+    future = job['future']
+    if future.cancelled():
+        return "Killed"
+    elif future.done():
+        if future.exception() is None and future.result():
+            return "Done"
+        return "Killed" if job['cancel_event'].is_set() else "Failed"
+    elif job['start'] is None:
+        return "Queued"
+    return "Running"
+
+# Returns how many seconds a background job has been running (or ran for)
+def get_job_seconds(job):
+    if job['start'] is None:
+        return 0.0
+    end = job['end'] if job['end'] is not None else time.monotonic()
+    return end - job['start']
+
+# Retrieves the background jobs for the optional job id arg (all jobs if no id), returns None (after printing why) if the id is invalid
+def get_jobs_from_args(args):
+    if len(args) == 1:
+        return list(background_jobs.values())
+    if not args[1].isdigit() or int(args[1]) not in background_jobs:
+        print_error(args[0], f"No such job '{args[1]}'.")
+        return None
+    return [background_jobs[int(args[1])]]
+
+# Returns the kill event of the background job running in the current thread (None if not a background job)
+def get_cancel_event():
+    return getattr(command_state, 'cancel_event', None)
+
+# Raises JobCancelledError if the given kill event was set (ie. the background job was killed)
+def check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelledError("Job was killed.")
+
+# Raised inside a background job's transfers once the job was killed, to stop them
+class JobCancelledError(Exception):
+    pass
+
+###################################### SCRIPT MODE FUNCTIONS ######################################
+
+# Parses the script mode command line args, returns a dict of script options (source is None for the interactive shell)
+# Note: returns None (after printing why) if the args are invalid
+def parse_script_args(argv):
+    options = {
+        'source': None,
+        'value': None,
+        'username': None,
+        'parallel': 1,
+        'stop_on_error': False,
+        'json': False
+    }
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        # Flags without values
+        if arg == SCRIPT_STDIN:
+            options['source'] = SCRIPT_STDIN
+        elif arg == "-e":
+            options['stop_on_error'] = True
+        elif arg == "--json":
+            options['json'] = True
+        # Flags with values
+        elif arg in [SCRIPT_FILE_FLAG, SCRIPT_COMMANDS_FLAG, "-u", "-j"]:
+            if i + 1 >= len(argv):
+                print(f"Error: Missing value for '{arg}'.")
+                return None
+            value = argv[i + 1]
+            i += 1
+            if arg in [SCRIPT_FILE_FLAG, SCRIPT_COMMANDS_FLAG]:
+                options['source'] = arg
+                options['value'] = value
+            elif arg == "-u":
+                options['username'] = value
+            elif not value.isdigit() or int(value) < 1:
+                print(f"Error: Invalid value '{value}' for '{arg}' - must be a whole number greater than 0.")
+                return None
+            else:
+                options['parallel'] = int(value)
+        else:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        i += 1
+    return options
+
+# Reads the script commands from the script file, '-c' commands (separated by ';'), or STDIN, skipping blank and '#' comment lines
+def read_script_lines(options):
+    if options['source'] == SCRIPT_FILE_FLAG:
+        with open(options['value'], "r") as script_file:
+            lines = script_file.read().splitlines()
+    elif options['source'] == SCRIPT_COMMANDS_FLAG:
+        lines = options['value'].split(SCRIPT_COMMAND_SEPARATOR)
+    else:
+        lines = sys.stdin.read().splitlines()
+    return [line.strip() for line in lines if line.strip() != "" and not line.strip().startswith(SCRIPT_COMMENT)]
+
+# Runs all script commands (logging in only once), returns the exit code (0 if every command succeeded, 1 if any failed, 2 if the script could not be read)
+# Note: with '-j <n>', up to n consecutive commands run concurrently; commands that change shell state (login, cd, debug, logout/quit/exit) always run alone
+def run_script(options):
+    # Read every command first
+    try:
+        lines = read_script_lines(options)
+    except Exception as e:
+        print(f"Error: Unable to read script - {e}")
+        return 2
+
+    # Send each command's output to its own buffer, so concurrent commands do not interleave
+    real_stdout = sys.stdout
+    install_thread_output()
+
+    # Login once for the whole script, unless the script starts by logging in itself
+    if len(lines) == 0 or lines[0].split(" ")[0] != LOGIN_CMD:
+        login_line = LOGIN_CMD if options['username'] is None else f"{LOGIN_CMD} {options['username']}"
+        lines.insert(0, login_line)
+
+    failed_count = 0
+    pending = []
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=options['parallel']) as executor:
+            for line in lines + [None]:
+                # Keep collecting independent commands, until a state changing command (or the end) is reached
+                cmd = None if line is None else line.split(" ")[0]
+                if line is not None and cmd not in STATE_CMD_GROUP and len(pending) < options['parallel']:
+                    pending.append(line)
+                    continue
+
+                # Run the collected commands concurrently, then the state changing command on its own
+                results = list(executor.map(run_script_command, pending))
+                pending = [] if line is None or cmd in STATE_CMD_GROUP else [line]
+                if line is not None and cmd in STATE_CMD_GROUP:
+                    results.append(run_script_command(line))
+
+                for result in results:
+                    print_script_result(real_stdout, result, options['json'])
+                    if not result['ok']:
+                        failed_count += 1
+                if (failed_count > 0 and options['stop_on_error']) or terminate_flag:
+                    break
+    finally:
+        sys.stdout = real_stdout
+
+    return 0 if failed_count == 0 else 1
+
+# Runs a single script command (without re-validating the session), capturing its output, returns a dict of the results
+def run_script_command(line):
+    prompt = f"{get_pwd_string()}> {line}"
+    command_state.output = io.StringIO()
+    start_time = time.monotonic()
+    try:
+        ok = run_command(line, validate_flag=False)
+    finally:
+        output = command_state.output.getvalue()
+        del command_state.output
+    return {
+        'command': line,
+        'prompt': prompt,
+        'ok': ok,
+        'seconds': round(time.monotonic() - start_time, 3),
+        'output': output.splitlines(),
+        'errors': list(command_state.errors)
+    }
+
+# Prints the results of a script command, either like the interactive shell would (prompt, then output) or as a single JSON line
+def print_script_result(stream, result, json_flag):
+    if json_flag:
+        stream.write(json.dumps({key: value for key, value in result.items() if key != 'prompt'}) + "\n")
+    else:
+        stream.write(result['prompt'] + "\n")
+        for line in result['output']:
+            stream.write(line + "\n")
+    stream.flush()
+
+# Replacement for sys.stdout in script mode, which sends output to the buffer of the command running in the current thread (if any)
+class ThreadOutput:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        output = getattr(command_state, 'output', None)
+        return (output if output is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    # Lets input() keep using the real terminal (eg. for readline)
+    def fileno(self):
+        return self.stream.fileno()
+
+    def isatty(self):
+        return self.stream.isatty()
+
+# Replaces sys.stdout with a ThreadOutput (if not already done), so commands can capture their own output
+def install_thread_output():
+    if not isinstance(sys.stdout, ThreadOutput):
+        sys.stdout = ThreadOutput(sys.stdout)
 
 ######################################## HELPER FUNCTIONS ########################################
 
@@ -687,8 +1537,11 @@ def filter_empty_strings(str_list):
     return list(filter(lambda item: item, str_list))
 
 # Template used to print an error message using given command and message info
+# Note: also records the error for the command currently running in this thread (see run_command())
 def print_error(cmd, msg):
     print(f"[ERROR] {cmd}: {msg}")
+    if hasattr(command_state, 'errors'):
+        command_state.errors.append(f"{cmd}: {msg}")
 
 # ========== LOGIN ==========
 # Validates session by checking if session-based client can call list_buckets()
@@ -709,7 +1562,7 @@ def get_pwd_string():
         return pwd + "/"
     
     # Not root dir, so create path using folder chain for CWD
-    for folder in curr_wd[1:]:
+    for folder in get_wd()[1:]:
         pwd += f"/{folder}"
     return pwd
 
@@ -717,24 +1570,982 @@ def get_pwd_string():
 # Note: defaults to PWD if no path is given
 def is_root_dir(path=None):
     if path is None:
-        path = curr_wd
+        path = get_wd()
     return path == ROOT_DIR
 
-# ========== MKBUCKET ==========
-# Returns true if the given bucket name exists (owned by the logged in user), otherwise false
+# Retrieves the PWD as a list (a background job keeps the PWD from when it was started, even if the shell changes directory)
+def get_wd():
+    return getattr(command_state, 'wd', None) or curr_wd
+
+# ========== EXISTENCE CHECKS ==========
+# Returns true if the given bucket name exists (and the logged in user can access it), otherwise false
+# Note: uses a single head_bucket() call (cached) instead of listing every bucket
+# Note: raises the ClientError for anything other than "not found" (eg. 403 Forbidden or throttling)
 def bucket_exists(bucket_name):
     # Immediately return if bucket name is empty
     if bucket_name is None or bucket_name == "":
         return False
 
-    # Get the list of buckets and check if any of their names match
-    response = s3_client.list_buckets()
-    if 'Buckets' in response:
-        for bucket in response['Buckets']:
-            if bucket['Name'] == bucket_name:
-                return True
+    return cached_exists((bucket_name, None), lambda: s3_client.head_bucket(Bucket=bucket_name))
+
+# Returns true if the given key exists as an object in the given bucket
+# Note: determine if key exists for bucket by successful call for head_object() (cached), so the object body is never fetched
+# Note: raises the ClientError for anything other than "not found" (eg. 403 Forbidden or throttling)
+def key_exists(bucket, key):
+    # Immediately return if there is no bucket or key to check
+    if bucket is None or key is None or key == "":
+        return False
+
+    return cached_exists((bucket, key), lambda: s3_client.head_object(Bucket=bucket, Key=key))
+
+# Looks up an existence check in the LRU cache, otherwise calls the given head request and caches the result (both positive and negative)
+# Note: the cache is shared by background jobs and script workers, so every use of it holds exists_lock (but never during the head request)
+def cached_exists(cache_key, head_request):
+    # Use the cached answer if it has not expired yet (moving it to the most recently used end)
+    now = time.monotonic()
+    with exists_lock:
+        cached = exists_cache.get(cache_key)
+        if cached is not None:
+            exists, cached_time = cached
+            if now - cached_time < EXISTS_CACHE_TTL:
+                exists_cache.move_to_end(cache_key)
+                return exists
+            exists_cache.pop(cache_key, None)
+
+    # Ask S3, treating only "not found" errors as a missing bucket/key (everything else is a real error that should be shown)
+    try:
+        head_request()
+        exists = True
+    except s3_client.exceptions.ClientError as e:
+        if not is_not_found_error(e):
+            raise
+        exists = False
+
+    # Store the answer, evicting the least recently used entries when the cache is full
+    with exists_lock:
+        exists_cache[cache_key] = (exists, now)
+        exists_cache.move_to_end(cache_key)
+        while len(exists_cache) > EXISTS_CACHE_SIZE:
+            exists_cache.popitem(last=False)
+    return exists
+
+# Returns true if the given ClientError means the bucket or key does not exist
+def is_not_found_error(error):
+    code = str(error.response.get('Error', {}).get('Code', ''))
+    return code in NOT_FOUND_ERROR_CODES
+
+# Removes any cached existence checks for the given bucket (and key), so the next check asks S3 again
+# Note: by default (no key), removes everything cached for the bucket
+# Note: also removes the bucket's cached completion listings
+def invalidate_exists(bucket, key=None):
+    with listing_lock:
+        for cache_key in [k for k in listing_cache.keys() if k[0] == bucket]:
+            del listing_cache[cache_key]
+
+    with exists_lock:
+        if key is None:
+            for cache_key in [k for k in exists_cache.keys() if k[0] == bucket]:
+                del exists_cache[cache_key]
+        else:
+            exists_cache.pop((bucket, key), None)
+
+# Counts every S3 HTTP request (including retried attempts) towards the command running in this thread (registered as a botocore 'request-created' event handler)
+# Note: requests made outside a command (eg. completion prefetching) are not counted
+def count_request(**kwargs):
+    request_counter = getattr(command_state, 'request_counter', None)
+    if request_counter is not None:
+        with request_counter['lock']:
+            request_counter['count'] += 1
+
+# Wraps a function so it runs with the current command's request counter (see count_request()), for the command's own worker threads
+# Note: used by CommandThreadPoolExecutor, so every task a command submits (including boto3's managed transfer tasks) counts towards it
+def carry_command_state(func):
+    request_counter = getattr(command_state, 'request_counter', None)
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        command_state.request_counter = request_counter
+        try:
+            return func(*args, **kwargs)
+        finally:
+            del command_state.request_counter
+    return run
+
+# Thread pool for a command's own worker threads, which runs each task with the submitting command's request counter (see carry_command_state())
+# Note: tasks submitted from inside a task keep the same command's counter (eg. boto3's transfer manager submits its part tasks from its own submission task)
+class CommandThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(carry_command_state(fn), *args, **kwargs)
+
+# ========== COMPLETION ==========
+# Sets up readline tab completion for commands and S3 paths (does nothing if readline is not installed)
+def setup_completion():
+    if readline is None:
+        return
+    readline.set_completer(complete)
+    readline.set_completer_delims(" ")
+    readline.parse_and_bind("tab: complete")
+
+# Readline completer - returns the completion match for given state (index), computing all matches when state is 0
+# Note: the first word completes command names, every other word completes S3 paths (relative or absolute)
+def complete(text, state):
+    global completion_matches
+    if state == 0:
+        try:
+            if readline.get_begidx() == 0:
+                completion_matches = sorted(cmd for cmd in commands.keys() if cmd.startswith(text))
+            else:
+                completion_matches = complete_s3_path(text)
+        except Exception:
+            completion_matches = []
+    return completion_matches[state] if state < len(completion_matches) else None
+
+# Returns the S3 paths (buckets, folders ending in '/', objects) that complete the given partial path
+def complete_s3_path(text):
+    if s3_client is None:
+        return []
+
+    # Split into the folder typed so far and the partial name after it
+    dir_part = text[:text.rfind('/') + 1]
+    name_part = text[len(dir_part):]
+    list_path = convert_path_list(dir_part) if dir_part != "" else get_wd().copy()
+    if len(list_path) < 1 or list_path[0] != ROOT_DIR[0]:
+        return []
+
+    # Buckets at root, otherwise the contents of the folder
+    if is_root_dir(list_path):
+        names = get_cached_listing(None, None)
+    else:
+        prefix = "" if len(list_path) == 2 else get_obj_key(list_path) + '/'
+        names = get_cached_listing(get_bucket_name(list_path), prefix)
+    return [dir_part + name for name in names if name.startswith(name_part)]
+
+# Retrieves the names in a folder level (sub-folders end in '/'), or bucket names if bucket is None, from the TTL cache or by listing them
+# Note: after listing a folder, its sub-folders are listed in the background so completing the next level is instant
+def get_cached_listing(bucket, prefix):
+    cache_key = (bucket, prefix)
+    with listing_lock:
+        cached = listing_cache.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] < COMPLETION_CACHE_TTL:
+        return cached[1]
+
+    names, sub_prefixes = list_completion_names(bucket, prefix)
+    if bucket is not None:
+        prefetch_listings(bucket, sub_prefixes[:COMPLETION_PREFETCH_LIMIT])
+    return names
+
+# Lists the names in a folder level (or all bucket names), caches them, and returns (names, sub-folder prefixes)
+def list_completion_names(bucket, prefix):
+    if bucket is None:
+        names = [f"{b['Name']}/" for b in s3_client.list_buckets().get('Buckets', [])]
+        sub_prefixes = []
+    else:
+        objects, sub_prefixes = list_prefix_level(bucket, prefix)
+        names = [p[len(prefix):] for p in sub_prefixes]
+        names += [obj['Key'][len(prefix):] for obj in objects if obj['Key'] != prefix]
+
+    with listing_lock:
+        listing_cache[(bucket, prefix)] = (time.monotonic(), names)
+    return names, sub_prefixes
+
+# Lists the given sub-folder prefixes in the background (skipping ones that are already cached), to warm the completion cache
+def prefetch_listings(bucket, prefixes):
+    global prefetch_executor
+    if prefetch_executor is None:
+        prefetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=COMPLETION_PREFETCH_WORKERS)
+
+    now = time.monotonic()
+    for prefix in prefixes:
+        with listing_lock:
+            cached = listing_cache.get((bucket, prefix))
+        if cached is None or now - cached[0] >= COMPLETION_CACHE_TTL:
+            prefetch_executor.submit(list_completion_names, bucket, prefix)
+
+# ========== TRAVERSAL ==========
+# Retrieves (bucket, folder prefix) for a path to a bucket or folder, returns None (after printing why) if it is not an existing bucket/folder
+# Note: the prefix is '' for a bucket, otherwise it ends with '/'
+# Note: uses the PWD if the path is None
+def get_traversal_location(cmd, dir_arg):
+    # Attempt to convert the given path string to a list version
+    try:
+        list_path = get_wd().copy() if dir_arg is None else convert_path_list(dir_arg)
+    except Exception as e:
+        print_error(cmd, e)
+        return None
+    # Validate path as list (must at least be a bucket)
+    if len(list_path) < 2:
+        print_error(cmd, "Invalid location - must be a bucket or directory (not root).")
+        return None
+
+    bucket = get_bucket_name(list_path)
+    if len(list_path) == 2:
+        if not bucket_exists(bucket):
+            print_error(cmd, f"No such bucket '{bucket}'.")
+            return None
+        return bucket, ""
+    prefix = get_obj_key(list_path) + '/'
+    if not key_exists(bucket, prefix):
+        print_error(cmd, f"{get_pwd_string() if dir_arg is None else dir_arg}: No such directory.")
+        return None
+    return bucket, prefix
+
+# Yields every object under the given prefix, listing each folder level with its own delimited list_objects_v2() pages
+# Note: each sub-folder (common prefix) found is listed concurrently using a pool of '--workers' threads, so wide trees are traversed in parallel
+def traverse_prefix(bucket, prefix, options):
+    workers = int(options.get('workers', DEFAULT_LIST_WORKERS))
+    with CommandThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(list_prefix_level, bucket, prefix)}
+        while pending:
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                objects, sub_prefixes = future.result()
+                for sub_prefix in sub_prefixes:
+                    pending.add(executor.submit(list_prefix_level, bucket, sub_prefix))
+                yield from objects
+
+# Lists one folder level (all pages), returns (objects directly in the folder, sub-folder prefixes)
+def list_prefix_level(bucket, prefix):
+    objects = []
+    sub_prefixes = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        objects.extend(page.get('Contents', []))
+        sub_prefixes.extend(common_prefix['Prefix'] for common_prefix in page.get('CommonPrefixes', []))
+    return objects, sub_prefixes
+
+# Removes the given flag and its value from the args, returning both (args list, value or None if the flag is not present)
+# Note: raises ValueError if the flag has no value
+def pop_flag_value(args, flag):
+    if flag not in args:
+        return args, None
+    i = args.index(flag)
+    if i + 1 >= len(args):
+        raise ValueError(f"Missing value for '{flag}'.")
+    return args[:i] + args[i + 2:], args[i + 1]
+
+# Converts a find '-size' arg (eg. '+10M', '-512k', '100') into a function that tests an object size
+# Note: raises ValueError if the size is invalid
+def parse_size_test(size_arg):
+    compare = size_arg[0] if size_arg[:1] in ['+', '-'] else None
+    number = size_arg[1:] if compare is not None else size_arg
+    multiplier = 1
+    if number[-1:] in SIZE_UNITS:
+        multiplier = SIZE_UNITS[number[-1]]
+        number = number[:-1]
+    if not number.isdigit():
+        raise ValueError(f"Invalid value '{size_arg}' for '-size'.")
+
+    size = int(number) * multiplier
+    if compare == '+':
+        return lambda obj_size: obj_size > size
+    elif compare == '-':
+        return lambda obj_size: obj_size < size
+    return lambda obj_size: obj_size == size
+
+# ========== STREAMING ==========
+# Retrieves (bucket, key, head_object() response) for the S3 object at given path, returns None (after printing why) if it is not an existing object
+def get_stream_object(cmd, obj_arg):
+    # Attempt to convert the given path string to a list version
+    try:
+        list_path = convert_path_list(obj_arg)
+    except Exception as e:
+        print_error(cmd, e)
+        return None
+    # Validate path as list (after root and bucket)
+    if len(list_path) < 3:
+        print_error(cmd, f"Read failed for '{obj_arg}' - Cannot read a bucket.")
+        return None
+
+    # Get the object's info with a single request, and if it does not exist check if it is a dir instead, displaying err msg
+    bucket = get_bucket_name(list_path)
+    key = get_obj_key(list_path)
+    try:
+        info = s3_client.head_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if not is_not_found_error(e):
+            raise
+        if key_exists(bucket, key + '/'):
+            print_error(cmd, f"Read failed for '{obj_arg}' - Is a directory.")
+        else:
+            print_error(cmd, f"Read failed for '{obj_arg}' - No such file or directory.")
+        return None
+    return bucket, key, info
+
+# Separates the optional '-n <lines>' flag from the rest of the args, returning both (args list, #of lines)
+# Note: raises ValueError if the #of lines is missing or not a whole number
+def parse_line_count(args):
+    if LINE_COUNT_FLAG not in args:
+        return args, DEFAULT_LINE_COUNT
+    i = args.index(LINE_COUNT_FLAG)
+    if i + 1 >= len(args) or not args[i + 1].isdigit():
+        raise ValueError(f"Invalid value for '{LINE_COUNT_FLAG}' - must be a whole number.")
+    return args[:i] + args[i + 2:], int(args[i + 1])
+
+# Returns true if the object is gzip compressed (by its Content-Encoding or '.gz' extension)
+def is_gzip_object(key, info):
+    return info.get('ContentEncoding', '') == 'gzip' or key.endswith('.gz')
+
+# Yields decompressed data for given chunks of a gzip object (or the chunks as is if not gzip), including objects with multiple gzip members
+def decompress_chunks(chunks, gzip_flag):
+    if not gzip_flag:
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            # Start a new decompressor when another gzip member starts in the same chunk
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+    yield decompressor.flush()
+
+# Yields the chunks of an object from the start using ranged GETs, so a reader that stops early never fetches the rest
+# Note: the range size doubles after every chunk (from STREAM_CHUNK_SIZE), keeping short reads cheap and long reads fast
+def iter_ranged_chunks(bucket, key, size):
+    start = 0
+    chunk_size = STREAM_CHUNK_SIZE
+    while start < size:
+        end = min(start + chunk_size, size) - 1
+        yield s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")['Body'].read()
+        start = end + 1
+        chunk_size *= 2
+
+# Yields each line (bytes, without the '\n') of an object from the start, decompressing gzip objects on the fly
+def iter_object_lines(bucket, key, info):
+    buffer = b""
+    for data in decompress_chunks(iter_ranged_chunks(bucket, key, info['ContentLength']), is_gzip_object(key, info)):
+        buffer += data
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        yield from lines
+    if buffer:
+        yield buffer
+
+# Returns the last lines (bytes, without the '\n') of an uncompressed object, reading ranges backwards from the end until enough lines were found
+def get_last_lines(bucket, key, size, line_count):
+    data = b""
+    start = size
+    chunk_size = STREAM_CHUNK_SIZE
+    # Need one more line break than lines, so the first line is known to be complete (unless the start of the object was reached)
+    while start > 0 and data.rstrip(b"\n").count(b"\n") < line_count:
+        end = start - 1
+        start = max(0, start - chunk_size)
+        data = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")['Body'].read() + data
+        chunk_size *= 2
+
+    lines = data.split(b"\n")
+    if data.endswith(b"\n"):
+        lines.pop()
+    return lines[-line_count:]
+
+# Decodes a line of an object for printing (UTF-8, replacing bad bytes and dropping a Windows-style '\r')
+def decode_line(line):
+    return line.decode("utf-8", errors="replace").rstrip("\r")
+
+# ========== TRANSFERS ==========
+# Separates the optional transfer flags (and their values) from the rest of the args, returning both (args list, options dict)
+# Note: raises ValueError for unknown flags, missing values, or values that are not positive numbers
+def parse_transfer_options(args):
+    other_args = []
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in TRANSFER_OPTION_FLAGS:
+            # Every transfer flag needs a positive number after it
+            if i + 1 >= len(args):
+                raise ValueError(f"Missing value for '{arg}'.")
+            try:
+                value = float(args[i + 1])
+            except ValueError:
+                raise ValueError(f"Invalid value '{args[i + 1]}' for '{arg}' - must be a number.")
+            if value <= 0:
+                raise ValueError(f"Invalid value '{args[i + 1]}' for '{arg}' - must be greater than 0.")
+            options[TRANSFER_OPTION_FLAGS[arg]] = value
+            i += 2
+        elif arg.startswith("--"):
+            raise ValueError(f"Invalid flag '{arg}'.")
+        else:
+            other_args.append(arg)
+            i += 1
+    return other_args, options
+
+# Builds the boto3 TransferConfig for given parsed transfer options (part size and bandwidth in MB, concurrency as #of threads)
+def build_transfer_config(options):
+    part_size = int(options.get('part_size', DEFAULT_PART_SIZE_MB) * MB)
+    config = {
+        'multipart_threshold': part_size,
+        'multipart_chunksize': part_size,
+        'max_concurrency': int(options.get('concurrency', DEFAULT_TRANSFER_CONCURRENCY))
+    }
+    if 'max_bandwidth' in options:
+        config['max_bandwidth'] = int(options['max_bandwidth'] * MB)
+    # Deferred import - boto3 is only loaded once a transfer needs it (keeps shell startup fast)
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(**config)
+
+# Creates a (thread-safe) progress callback for a transfer of total_size bytes, which displays a live progress line with MB/s
+# Note: the callback also keeps track of the bytes transferred and start time, used by print_transfer_summary()
+# Note: the live line is only drawn when output goes straight to the terminal (not in script mode or background jobs), and the callback stops the transfer if its job was killed
+def create_transfer_progress(cmd, total_size):
+    lock = threading.Lock()
+    state = {'bytes': 0, 'start': time.monotonic(), 'last_print': 0.0}
+    show_flag = getattr(command_state, 'output', None) is None
+    cancel_event = get_cancel_event()
+
+    def progress(bytes_amount):
+        check_cancelled(cancel_event)
+        with lock:
+            state['bytes'] += bytes_amount
+            # Limit how often the line is redrawn (but always draw the final update)
+            now = time.monotonic()
+            if not show_flag or (now - state['last_print'] < PROGRESS_INTERVAL and state['bytes'] < total_size):
+                return
+            state['last_print'] = now
+            elapsed = max(now - state['start'], 1e-6)
+            percent = 100.0 if total_size == 0 else 100.0 * state['bytes'] / total_size
+            print(f"\r{cmd}: {state['bytes'] / MB:.1f}/{total_size / MB:.1f} MB ({percent:.1f}%) at {state['bytes'] / MB / elapsed:.2f} MB/s", end="", flush=True)
+
+    progress.state = state
+    return progress
+
+# Ends the live progress line of a transfer (if it was ever drawn), so following output starts on a new line
+def end_progress_line(progress):
+    if progress is not None and progress.state['last_print'] > 0:
+        print()
+
+# Prints the final throughput summary of a finished transfer (using the state tracked by its progress callback)
+def print_transfer_summary(cmd, progress):
+    state = progress.state
+    elapsed = max(time.monotonic() - state['start'], 1e-6)
+    end_progress_line(progress)
+    print(f"{cmd}: Transferred {state['bytes'] / MB:.2f} MB in {elapsed:.2f} seconds ({state['bytes'] / MB / elapsed:.2f} MB/s).")
+
+# Removes the given flag from the args (wherever it is), returning both (args list, true if the flag was present)
+def pop_flag(args, flag):
+    other_args = [arg for arg in args if arg != flag]
+    return other_args, len(other_args) != len(args)
+
+# Yields every object (dict from 'Contents') in the given bucket whose key starts with given prefix, following all result pages
+def list_prefix_objects(bucket, prefix):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj
+
+# Deletes every object under the given key prefix (folder, ending in '/'), including the folder itself
+# Note: pages through the prefix and deletes each page (up to 1000 keys) with one delete_objects() call, keeping several batches in flight at once
+def delete_prefix(cmd, bucket, prefix):
+    start_time = time.monotonic()
+    deleted_count = 0
+    errors = []
+    in_flight = set()
+    batch_keys = {}
+    cancel_event = get_cancel_event()
+
+    # Collect the result of a finished batch (#of keys deleted, and the errors for keys that were not)
+    # Note: if the whole delete_objects() call failed, every key in the batch is an error
+    def collect(future):
+        nonlocal deleted_count
+        keys = batch_keys.pop(future)
+        try:
+            response = future.result()
+        except Exception as e:
+            errors.extend({'Key': key, 'Code': type(e).__name__, 'Message': str(e)} for key in keys)
+            return
+        batch_errors = response.get('Errors', [])
+        deleted_count += len(keys) - len(batch_errors)
+        errors.extend(batch_errors)
+
+    try:
+        with CommandThreadPoolExecutor(max_workers=DELETE_BATCH_WORKERS) as executor:
+            paginator = s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig={'PageSize': DELETE_BATCH_SIZE}):
+                check_cancelled(cancel_event)
+                keys = [obj['Key'] for obj in page.get('Contents', [])]
+                if len(keys) == 0:
+                    continue
+
+                # Wait for a batch to finish if too many are already in flight
+                if len(in_flight) >= DELETE_BATCH_WORKERS:
+                    finished, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future)
+                future = executor.submit(delete_batch, bucket, keys)
+                batch_keys[future] = keys
+                in_flight.add(future)
+
+            for future in concurrent.futures.as_completed(in_flight):
+                collect(future)
+    finally:
+        invalidate_exists(bucket)
+
+    # Display errors for keys that could not be deleted (only the first few), then the summary
+    for error in errors[:MAX_ERRORS_DISPLAYED]:
+        print_error(cmd, f"s3:/{bucket}/{error.get('Key')}: {error.get('Code')} - {error.get('Message')}")
+    if len(errors) > MAX_ERRORS_DISPLAYED:
+        print_error(cmd, f"...and {len(errors) - MAX_ERRORS_DISPLAYED} more error(s).")
+    elapsed = time.monotonic() - start_time
+    print(f"{cmd}: Deleted {deleted_count} object(s) in {elapsed:.2f} seconds, {len(errors)} error(s).")
+
+# Deletes a batch of (up to 1000) keys with a single delete_objects() call, returns the response
+# Note: uses quiet mode, so the response only lists the keys that failed
+def delete_batch(bucket, keys):
+    return s3_client.delete_objects(
+        Bucket=bucket,
+        Delete={
+            'Objects': [{'Key': key} for key in keys],
+            'Quiet': True
+        }
+    )
+
+# Uploads every file (and folder) in a local directory tree to the given key prefix (folder), using a pool of concurrent transfers
+# Note: folder objects are created for the prefix itself and every sub-directory, so the uploaded tree can be navigated with 'cd'
+def upload_tree(cmd, local_dir, bucket, prefix, options):
+    config = build_transfer_config(options)
+    jobs = [(f"s3:/{bucket}/{prefix}/", 0, functools.partial(s3_client.put_object, Bucket=bucket, Key=prefix + '/'))]
+
+    for root, dirs, files in os.walk(local_dir):
+        # Convert the local path (relative to the top dir) to the matching key prefix
+        rel_root = os.path.relpath(root, local_dir)
+        key_root = prefix if rel_root == os.curdir else prefix + '/' + rel_root.replace(os.sep, '/')
+
+        for dir_name in dirs:
+            key = f"{key_root}/{dir_name}/"
+            jobs.append((f"s3:/{bucket}/{key}", 0, functools.partial(s3_client.put_object, Bucket=bucket, Key=key)))
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            key = f"{key_root}/{file_name}"
+            jobs.append((f"{path} -> s3:/{bucket}/{key}", os.path.getsize(path),
+                functools.partial(managed_upload, path, bucket, key, config)))
+
+    try:
+        run_transfer_jobs(cmd, jobs, options)
+    finally:
+        invalidate_exists(bucket)
+
+# Downloads every object under the given key prefix (folder, ending in '/') into a new local directory, using a pool of concurrent transfers
+def download_tree(cmd, bucket, prefix, local_dir, options):
+    config = build_transfer_config(options)
+    local_root = os.path.abspath(local_dir)
+    os.makedirs(local_root)
+
+    jobs = []
+    for obj in list_prefix_objects(bucket, prefix):
+        key = obj['Key']
+        # Never write outside of the destination directory (eg. keys containing '..')
+        path = os.path.abspath(os.path.join(local_root, *key[len(prefix):].split('/')))
+        if path != local_root and not path.startswith(local_root + os.sep):
+            print_error(cmd, f"Skipping 's3:/{bucket}/{key}' - resolves outside of '{local_dir}'.")
+            continue
+
+        # Folder objects only need a local directory, everything else is downloaded
+        if key.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+        else:
+            jobs.append((f"s3:/{bucket}/{key} -> {path}", obj['Size'],
+                functools.partial(download_file_to, bucket, key, path, config)))
+
+    run_transfer_jobs(cmd, jobs, options)
+
+# Downloads a large object as parallel byte ranges (concurrency from the transfer options), each worker writing its range into a preallocated local file through its own file handle
+# Note: every range is pinned to the object's ETag (so a changing object cannot mix versions), and all ranges together are throttled to '--max-bandwidth' (if given)
+# Note: the ranges are '--part-size' apart, except for a multipart ETag when verifying, where they are the object's upload parts (each hashed as it streams in and combined into the ETag at the end)
+#       - a single part ETag is an MD5 of the whole object, so it is checked with one ordered pass over the finished file instead
+#       - objects whose ETag is not an MD5 (SSE-KMS, SSE-C) or whose upload parts are uneven cannot be checked, so they are downloaded unverified (with a message saying which)
+# Note: downloads to '<local path>.part' first, which is only renamed to the local path once complete and verified
+def ranged_download(bucket, key, local_path, info, options, progress, verify_flag=True):
+    size = info['ContentLength']
+    etag = info['ETag']
+    config = build_transfer_config(options)
+    part_size = config.multipart_chunksize
+    hash_parts_flag = False
+    if verify_flag and not is_md5_etag(info):
+        print(f"download: Not verifying 's3:/{bucket}/{key}' - its ETag is not an MD5 (eg. SSE-KMS or SSE-C).")
+        verify_flag = False
+    elif verify_flag and '-' in etag:
+        upload_part_size = get_upload_part_size(bucket, key, info)
+        if upload_part_size is None:
+            print(f"download: Not verifying 's3:/{bucket}/{key}' - it was uploaded in parts of uneven size, so its ETag cannot be checked by part.")
+            verify_flag = False
+        else:
+            part_size = upload_part_size
+            hash_parts_flag = True
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    part_digests = [None] * len(ranges)
+    partial_path = local_path + PARTIAL_DOWNLOAD_SUFFIX
+    cancel_event = get_cancel_event()
+    throttle = None if config.max_bandwidth is None else create_bandwidth_throttle(config.max_bandwidth)
+
+    # Fetch a byte range, writing it into its place in the file (and hashing it, for a multipart ETag) as it streams in
+    def fetch_range(index):
+        check_cancelled(cancel_event)
+        start, end = ranges[index]
+        body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)['Body']
+        md5 = hashlib.md5()
+        offset = start
+        try:
+            with open(partial_path, "r+b") as local_file:
+                local_file.seek(start)
+                for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+                    local_file.write(chunk)
+                    if hash_parts_flag:
+                        md5.update(chunk)
+                    offset += len(chunk)
+                    progress(len(chunk))
+                    if throttle is not None:
+                        throttle(len(chunk))
+        finally:
+            body.close()
+        if offset != end + 1:
+            raise IOError(f"Incomplete range bytes={start}-{end} (received {offset - start} bytes).")
+        part_digests[index] = md5.digest()
+
+    try:
+        # Preallocate the whole file, then fetch every range in parallel
+        with open(partial_path, "wb") as local_file:
+            local_file.truncate(size)
+        with CommandThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
+            list(executor.map(fetch_range, range(len(ranges))))
+
+        # Verify integrity against the ETag (multipart MD5 of the part MD5s, or MD5 of the whole file)
+        if verify_flag:
+            if hash_parts_flag:
+                computed_etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+            else:
+                computed_etag = compute_etag(partial_path, None)
+            if computed_etag != etag.strip('"'):
+                raise IOError(f"Integrity check failed - downloaded file does not match ETag {etag}.")
+        os.replace(partial_path, local_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+# Creates a (thread-safe) throttle shared by the workers of a transfer, which sleeps just long enough to keep their total throughput under max_bandwidth (bytes/sec)
+# Note: call it with the #of bytes each time a chunk is transferred
+def create_bandwidth_throttle(max_bandwidth):
+    lock = threading.Lock()
+    state = {'bytes': 0, 'start': time.monotonic()}
+
+    def throttle(bytes_amount):
+        with lock:
+            state['bytes'] += bytes_amount
+            delay = state['bytes'] / max_bandwidth - (time.monotonic() - state['start'])
+        if delay > 0:
+            time.sleep(delay)
+    return throttle
+
+# Returns true if the object's ETag (from its head_object() info) is an MD5 of its content (or of its parts' MD5s, for multipart), ie. not SSE-KMS/SSE-C
+def is_md5_etag(info):
+    return 'SSECustomerAlgorithm' not in info and not info.get('ServerSideEncryption', '').startswith('aws:kms') and MD5_ETAG_PATTERN.fullmatch(info['ETag']) is not None
+
+# Returns the part size a multipart uploaded object (with a multipart MD5 ETag) was uploaded with, or None if its parts are uneven
+# Note: a multipart upload can only be checked by range if all parts but the last are the same size
+def get_upload_part_size(bucket, key, info):
+    # The first part's size is the upload's part size, as long as the #of parts agrees with it
+    part_count = int(info['ETag'].strip('"').split('-')[1])
+    part_size = s3_client.head_object(Bucket=bucket, Key=key, PartNumber=1)['ContentLength']
+    if part_size <= 0 or -(-info['ContentLength'] // part_size) != part_count:
+        return None
+    return part_size
+
+# Downloads a single object to the given local path, creating any missing parent directories first
+def download_file_to(bucket, key, path, config):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    managed_download(bucket, key, path, config)
+
+# Uploads a local file with boto3's managed (multipart) transfer, its worker threads counting their requests towards the current command (see CommandThreadPoolExecutor)
+def managed_upload(path, bucket, key, config, callback=None):
+    with create_managed_transfer(config) as transfer:
+        transfer.upload_file(path, bucket, key, callback=callback)
+
+# Downloads an object to a local file with boto3's managed (multipart) transfer, its worker threads counting their requests towards the current command
+def managed_download(bucket, key, path, config, callback=None):
+    with create_managed_transfer(config) as transfer:
+        transfer.download_file(bucket, key, path, callback=callback)
+
+# Creates a boto3 S3Transfer (what client.upload_file()/download_file() use) whose transfer manager runs its tasks in a CommandThreadPoolExecutor
+def create_managed_transfer(config):
+    # Deferred import - boto3 is only loaded once a transfer needs it (keeps shell startup fast)
+    from boto3.s3.transfer import S3Transfer
+    from s3transfer.manager import TransferManager
+    return S3Transfer(manager=TransferManager(s3_client, config, executor_cls=CommandThreadPoolExecutor))
+
+# Copies every object (including folders) under the given source key prefix (folder, ending in '/') to the destination key prefix (folder), using a pool of concurrent copies
+def copy_tree(cmd, src_bucket, src_prefix, dest_bucket, dest_prefix, options):
+    jobs = []
+    for obj in list_prefix_objects(src_bucket, src_prefix):
+        src_key = obj['Key']
+        dest_key = dest_prefix + '/' + src_key[len(src_prefix):]
+        jobs.append((f"s3:/{src_bucket}/{src_key} -> s3:/{dest_bucket}/{dest_key}", obj['Size'],
+            functools.partial(copy_s3_object, src_bucket, src_key, dest_bucket, dest_key, options, obj['Size'])))
+
+    try:
+        run_transfer_jobs(cmd, jobs, options)
+    finally:
+        invalidate_exists(dest_bucket)
+
+# Uploads the files in a local directory tree that are missing or changed in the given key prefix (folder), using a pool of concurrent transfers
+def sync_up(cmd, local_dir, bucket, prefix, options):
+    config = build_transfer_config(options)
+    part_size = config.multipart_chunksize
+    remote_objects = {obj['Key']: obj for obj in list_prefix_objects(bucket, prefix + '/')}
+
+    # Create any missing folder objects (for the prefix itself, and every sub-directory)
+    jobs = []
+    candidates = []
+    if prefix + '/' not in remote_objects:
+        jobs.append((f"s3:/{bucket}/{prefix}/", 0, functools.partial(s3_client.put_object, Bucket=bucket, Key=prefix + '/')))
+
+    for root, dirs, files in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir)
+        key_root = prefix if rel_root == os.curdir else prefix + '/' + rel_root.replace(os.sep, '/')
+
+        for dir_name in dirs:
+            key = f"{key_root}/{dir_name}/"
+            if key not in remote_objects:
+                jobs.append((f"s3:/{bucket}/{key}", 0, functools.partial(s3_client.put_object, Bucket=bucket, Key=key)))
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            key = f"{key_root}/{file_name}"
+            candidates.append((path, key, remote_objects.get(key)))
+
+    # Compare every file with its object, then upload the ones that changed
+    changed = find_changed_files(candidates, part_size, options, True)
+    for path, key, _ in changed:
+        jobs.append((f"{path} -> s3:/{bucket}/{key}", os.path.getsize(path),
+            functools.partial(managed_upload, path, bucket, key, config)))
+
+    print(f"{cmd}: {len(changed)} of {len(candidates)} file(s) new or changed, {len(candidates) - len(changed)} unchanged.")
+    try:
+        run_transfer_jobs(cmd, jobs, options)
+    finally:
+        invalidate_exists(bucket)
+
+# Downloads the objects under the given key prefix (folder) that are missing or changed in a local directory, using a pool of concurrent transfers
+# Note: downloaded files get the object's last modified time, so later syncs can skip them without hashing
+def sync_down(cmd, bucket, prefix, local_dir, options):
+    config = build_transfer_config(options)
+    part_size = config.multipart_chunksize
+    local_root = os.path.abspath(local_dir)
+    os.makedirs(local_root, exist_ok=True)
+
+    candidates = []
+    for obj in list_prefix_objects(bucket, prefix + '/'):
+        key = obj['Key']
+        # Never write outside of the destination directory (eg. keys containing '..')
+        path = os.path.abspath(os.path.join(local_root, *key[len(prefix) + 1:].split('/')))
+        if path != local_root and not path.startswith(local_root + os.sep):
+            print_error(cmd, f"Skipping 's3:/{bucket}/{key}' - resolves outside of '{local_dir}'.")
+            continue
+
+        # Folder objects only need a local directory, everything else is compared with its local file
+        if key.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+        else:
+            candidates.append((path, key, obj))
+
+    # Compare every object with its local file, then download the ones that changed
+    changed = find_changed_files(candidates, part_size, options, False)
+    jobs = []
+    for path, key, obj in changed:
+        jobs.append((f"s3:/{bucket}/{key} -> {path}", obj['Size'],
+            functools.partial(sync_download_file, bucket, key, path, obj['LastModified'].timestamp(), config)))
+
+    print(f"{cmd}: {len(changed)} of {len(candidates)} object(s) new or changed, {len(candidates) - len(changed)} unchanged.")
+    run_transfer_jobs(cmd, jobs, options)
+
+# Downloads a single object for sync, then sets the local file's modified time to the object's last modified time
+def sync_download_file(bucket, key, path, last_modified, config):
+    download_file_to(bucket, key, path, config)
+    os.utime(path, (last_modified, last_modified))
+
+# Returns the (local path, key, object) candidates whose local file and object differ, hashing files concurrently when needed
+# Note: object is None when it does not exist in S3 yet
+# Note: when uploading, a file that was not modified after its object is unchanged; when downloading, the file must have the object's exact modified time (set by sync_download_file())
+def find_changed_files(candidates, part_size, options, upload_flag):
+    changed = []
+    needs_hash = []
+    for candidate in candidates:
+        path, _, obj = candidate
+        # Missing on either side, or different sizes, always means changed (no hashing needed)
+        if obj is None or not os.path.isfile(path) or os.path.getsize(path) != obj['Size']:
+            changed.append(candidate)
+        # Same size and the modified times show the destination is up to date, so assume unchanged
+        elif upload_flag and os.path.getmtime(path) <= obj['LastModified'].timestamp():
+            continue
+        elif not upload_flag and int(os.path.getmtime(path)) == int(obj['LastModified'].timestamp()):
+            continue
+        else:
+            needs_hash.append(candidate)
+
+    # Hash the remaining files concurrently, comparing with the ETags
+    workers = int(options.get('workers', DEFAULT_TRANSFER_WORKERS))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        matches = executor.map(lambda candidate: etag_matches(candidate[0], candidate[2]['ETag'], part_size), needs_hash)
+        for candidate, match in zip(needs_hash, matches):
+            if not match:
+                changed.append(candidate)
+    return changed
+
+# Returns true if the local file's content matches the given S3 ETag (single part MD5, or multipart MD5 of part MD5s with '-<#of parts>')
+# Note: the multipart part size is unknown, so it tries given part size and the part size implied by the #of parts (rounded up to a MB)
+def etag_matches(path, etag, part_size):
+    etag = etag.strip('"')
+    if '-' not in etag:
+        return compute_etag(path, None) == etag
+
+    part_count = int(etag.split('-')[1])
+    size = os.path.getsize(path)
+    implied_part_size = -(-size // part_count)
+    part_sizes = [part_size, -(-implied_part_size // MB) * MB, implied_part_size]
+    for candidate_size in dict.fromkeys(part_sizes):
+        if candidate_size > 0 and -(-size // candidate_size) == part_count and compute_etag(path, candidate_size) == etag:
+            return True
     return False
 
+# Computes the S3 ETag of a local file, either as a single part (part_size is None) or a multipart upload with given part size
+def compute_etag(path, part_size):
+    with open(path, "rb") as local_file:
+        if part_size is None:
+            md5 = hashlib.md5()
+            for chunk in iter(lambda: local_file.read(MB), b""):
+                md5.update(chunk)
+            return md5.hexdigest()
+
+        part_digests = []
+        for part in iter(lambda: local_file.read(part_size), b""):
+            part_digests.append(hashlib.md5(part).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+# Copies an object server-side, using a single copy_object() call for small objects
+# Note: objects bigger than the part size are copied with parallel upload_part_copy() calls of byte ranges (required above 5 GB), aborting the multipart upload if any part fails
+# Note: size is looked up with head_object() if not given
+def copy_s3_object(src_bucket, src_key, dest_bucket, dest_key, options, size=None):
+    copy_source = {'Bucket': src_bucket, 'Key': src_key}
+    part_size = int(options.get('part_size', DEFAULT_COPY_PART_SIZE_MB) * MB)
+    head = None
+    if size is None:
+        head = s3_client.head_object(Bucket=src_bucket, Key=src_key)
+        size = head['ContentLength']
+
+    # Small objects only need a single request
+    if size <= part_size:
+        s3_client.copy_object(CopySource=copy_source, Bucket=dest_bucket, Key=dest_key)
+        return
+
+    # Keep parts within S3 limits (at least 5 MB, and at most 10000 parts)
+    if head is None:
+        head = s3_client.head_object(Bucket=src_bucket, Key=src_key)
+    part_size = max(part_size, MIN_PART_SIZE, -(-size // MAX_PART_COUNT))
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+    # Start the multipart upload, keeping the source's attributes and tags (like copy_object() does)
+    upload_kwargs = {name: head[name] for name in COPY_HEAD_ATTRIBUTES if head.get(name) is not None}
+    tag_set = s3_client.get_object_tagging(Bucket=src_bucket, Key=src_key).get('TagSet', [])
+    if len(tag_set) > 0:
+        upload_kwargs['Tagging'] = urllib.parse.urlencode([(tag['Key'], tag['Value']) for tag in tag_set])
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=dest_bucket,
+        Key=dest_key,
+        ContentType=head.get('ContentType', 'binary/octet-stream'),
+        Metadata=head.get('Metadata', {}),
+        **upload_kwargs
+    )['UploadId']
+
+    # Copy every byte range as a part, in parallel (pinned to the source ETag so a changing source cannot mix versions)
+    cancel_event = get_cancel_event()
+    def copy_part(part_number, byte_range):
+        check_cancelled(cancel_event)
+        response = s3_client.upload_part_copy(
+            Bucket=dest_bucket,
+            Key=dest_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=copy_source,
+            CopySourceRange=f"bytes={byte_range[0]}-{byte_range[1]}",
+            CopySourceIfMatch=head['ETag']
+        )
+        return {'ETag': response['CopyPartResult']['ETag'], 'PartNumber': part_number}
+
+    try:
+        concurrency = int(options.get('concurrency', DEFAULT_TRANSFER_CONCURRENCY))
+        with CommandThreadPoolExecutor(max_workers=concurrency) as executor:
+            parts = list(executor.map(copy_part, range(1, len(ranges) + 1), ranges))
+        s3_client.complete_multipart_upload(
+            Bucket=dest_bucket,
+            Key=dest_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id)
+        raise
+
+# Returns true if the destination object of a copy exists and matches the source object: the same size, and the same ETag if both are single part MD5s
+# Note: a multipart ETag depends on the part sizes (and SSE-KMS/SSE-C ETags are not MD5s), so those copies can only be compared by size
+def verify_copy(src_bucket, src_key, dest_bucket, dest_key):
+    try:
+        src_head = s3_client.head_object(Bucket=src_bucket, Key=src_key)
+        dest_head = s3_client.head_object(Bucket=dest_bucket, Key=dest_key)
+    except s3_client.exceptions.ClientError:
+        return False
+    if src_head['ContentLength'] != dest_head['ContentLength']:
+        return False
+    if is_md5_etag(src_head) and is_md5_etag(dest_head) and '-' not in src_head['ETag'] + dest_head['ETag']:
+        return src_head['ETag'] == dest_head['ETag']
+    return True
+
+# Runs transfer jobs (label, #of bytes, function) using a bounded pool of '--workers' threads, retrying failed jobs with backoff
+# Note: prints a line per finished file (with its throughput), errors for files that failed every attempt, then an aggregate summary
+def run_transfer_jobs(cmd, jobs, options):
+    workers = int(options.get('workers', DEFAULT_TRANSFER_WORKERS))
+    start_time = time.monotonic()
+    total_bytes = 0
+    done_count = 0
+    failed_count = 0
+
+    cancel_event = get_cancel_event()
+
+    with CommandThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_transfer_job, job, cancel_event): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            label, size, _ = futures[future]
+            try:
+                elapsed, attempts = future.result()
+            except Exception as e:
+                failed_count += 1
+                print_error(cmd, f"{label}: {e}")
+                continue
+
+            done_count += 1
+            total_bytes += size
+            retry_note = f", {attempts} attempts" if attempts > 1 else ""
+            print(f"{cmd}: {label} ({size / MB:.2f} MB, {size / MB / max(elapsed, 1e-6):.2f} MB/s{retry_note})")
+
+    elapsed = max(time.monotonic() - start_time, 1e-6)
+    print(f"{cmd}: Transferred {done_count} object(s), {total_bytes / MB:.2f} MB in {elapsed:.2f} seconds ({total_bytes / MB / elapsed:.2f} MB/s), {failed_count} failed.")
+
+# Runs a single transfer job, retrying up to MAX_TRANSFER_RETRIES times (with exponential backoff), returns (seconds taken, #of attempts)
+# Note: raises the last error if every attempt failed (and never starts or retries a transfer once its background job was killed)
+def run_transfer_job(job, cancel_event=None):
+    _, _, transfer = job
+    attempt = 0
+    while True:
+        check_cancelled(cancel_event)
+        attempt += 1
+        start_time = time.monotonic()
+        try:
+            transfer()
+            return time.monotonic() - start_time, attempt
+        except Exception as e:
+            if attempt > MAX_TRANSFER_RETRIES or isinstance(e, JobCancelledError):
+                raise
+            time.sleep(TRANSFER_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
 # ========== LS ==========
 # Prints the buckets if 'ls' is called from root dir
 # Note: if long_flag was set (defaults to False), print the long form with more info (creation date)
@@ -760,9 +2571,8 @@ def print_buckets(long_flag=False):
         if long_flag:
             # Accumulate size of each object in bucket to get bucket size
             size = 0
-            curr_bucket = s3_resource.Bucket(bucket['Name'])
-            for obj in curr_bucket.objects.all():
-                size += obj.size
+            for obj in list_prefix_objects(bucket['Name'], ""):
+                size += obj['Size']
             bucket_sizes.append(f"{size}")
             # Track biggest bucket size to use for output string padding
             if len(f"{size}") > len(biggest_bucket):
@@ -840,7 +2650,7 @@ def print_bucket_objects(long_flag=False):
                     continue
 
             # Always create a row for each object
-            ct = str(s3_client.get_object(Bucket=bucket, Key=obj_key)['ContentType'])
+            ct = str(s3_client.head_object(Bucket=bucket, Key=obj_key)['ContentType'])
             content_types.append(ct)
             s = str(obj["Size"])
             sizes.append(s)
@@ -882,7 +2692,7 @@ def convert_path_list(path):
     list_path = []
     # Set list path we start with to relative if not an absolute path
     if not is_abs_path(path):
-        list_path = curr_wd.copy()
+        list_path = get_wd().copy()
     
     # Split given path by '/' and filter out empty strings
     split_path = path.split('/')
@@ -920,7 +2730,7 @@ def is_abs_path(path):
 # Note: By default, looks at PWD if no path given
 def get_bucket_name(list_path=None):
     if list_path is None:
-        list_path = curr_wd
+        list_path = get_wd()
 
     if is_root_dir(list_path):
         return None
@@ -928,23 +2738,11 @@ def get_bucket_name(list_path=None):
         return list_path[1]
     #return None if is_root_dir(list_path) else list_path[1]
 
-# Returns true if the given key exists as an object in the given bucket
-# Note: determine if key exists for bucket by successful call for get_object()
-def key_exists(bucket, key):
-    try:
-        s3_client.get_object(
-            Bucket=bucket,
-            Key=key
-        )
-        return True
-    except:
-        return False
-
 # Retrieves the key of the object from a given path (or None if path is not long enough)
 # Note: By default, looks at PWD if no path given
 def get_obj_key(list_path=None):
     if list_path is None:
-        list_path = curr_wd
+        list_path = get_wd()
     if len(list_path) < 3:
         return None
 
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Shared AWS request instrumentation ; used through awsClients.py by awsS3Shell.py, loadTable.py, loadEncodingsTable.py, and queryOECD.py
+
+@note :
+    Description: Hooks into botocore's events on every client awsClients.py creates (once stats are enabled), and records per operation (eg. 'dynamodb.BatchWriteItem'):
+        - #of calls and failed calls, and #of retries (attempts after the first, including throttling)
+        - latency histogram (LATENCY_BUCKETS_MS, each call's total time including retries) and total latency
+        - request and response payload sizes (bytes, from the body or Content-Length)
+        - DynamoDB consumed capacity (read, write, and total capacity units) - every DynamoDB call that supports it is sent with ReturnConsumedCapacity=TOTAL
+
+        NOTE: every script accepts '--stats' (display the stats at exit) and '--stats-json <file>' (save them as JSON at exit, eg. for tracking trends),
+            and the shell also has a 'stats [reset]' command
+        NOTE: stats are only recorded once enabled (by either flag, or enable()), so otherwise clients are left as they are (eg. no ReturnConsumedCapacity is added)
+        NOTE: AWS_STATS_JSON=<file> in the environment does the same as '--stats-json <file>' (used by benchmarkSuite.py, without changing the scripts' args)
+        NOTE: thread-safe (the shell and loaders make calls from many threads at once)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+############################################ CONSTANTS ############################################
+
+STATS_FLAG = "--stats"
+STATS_JSON_FLAG = "--stats-json"
+STATS_JSON_ENV = "AWS_STATS_JSON"
+HANDLER_ID = "aws-stats"
+
+# Upper bounds (ms) of the latency histogram buckets (the last bucket is everything slower)
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+STATS_FORMAT = "{:<36}{:>8}{:>7}{:>8}{:>10}{:>10}{:>10}{:>12}{:>12}{:>10}"
+
+############################################## STATE ##############################################
+
+# Stats per operation name (see new_operation_stats())
+operation_stats = {}
+stats_lock = threading.Lock()
+enabled_flag = False #see enable()
+
+############################################ FUNCTIONS ############################################
+
+# Enables recording stats on the clients created from now on (see instrument())
+def enable():
+    global enabled_flag
+    enabled_flag = True
+
+# Registers the stats event handlers on the client, if stats are enabled (called by awsClients.py for every client it creates)
+def instrument(client):
+    if not enabled_flag:
+        return
+    events = client.meta.events
+    events.register("provide-client-params.dynamodb", request_consumed_capacity, unique_id=HANDLER_ID + "-capacity")
+    events.register("before-call", start_call, unique_id=HANDLER_ID + "-start")
+    events.register("request-created", record_request_size, unique_id=HANDLER_ID + "-request")
+    events.register("after-call", record_call, unique_id=HANDLER_ID + "-end")
+    events.register("after-call-error", record_call_error, unique_id=HANDLER_ID + "-error")
+
+# Removes the stats flags from the args (eg. sys.argv, before the script checks its args), and if either was given enables stats, displaying/saving them at exit
+# Returns the remaining args, or None (after displaying why) if '--stats-json' has no file name
+# Note: also enables them (saved at exit) if AWS_STATS_JSON is set
+# Note: must be called before the script creates its clients, since only clients created after enabling are instrumented
+def setup(argv):
+    argv = list(argv)
+    print_flag = False
+    json_filename = os.environ.get(STATS_JSON_ENV)
+    if STATS_FLAG in argv:
+        argv.remove(STATS_FLAG)
+        print_flag = True
+    if STATS_JSON_FLAG in argv:
+        i = argv.index(STATS_JSON_FLAG)
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{STATS_JSON_FLAG}'.")
+            return None
+        json_filename = argv[i + 1]
+        del argv[i:i + 2]
+
+    if print_flag or json_filename is not None:
+        enable()
+        atexit.register(report_at_exit, print_flag, json_filename)
+    return argv
+
+# Displays and/or saves the stats (registered by setup() to run at exit)
+def report_at_exit(print_flag, json_filename):
+    if print_flag:
+        print_stats(sys.stderr)
+    if json_filename is not None:
+        dump_stats(json_filename)
+
+# ========== EVENT HANDLERS ==========
+# Asks DynamoDB to return the consumed capacity of the call (if the operation supports it and the caller did not ask already)
+def request_consumed_capacity(params, model, **kwargs):
+    if model.input_shape is not None and 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+# Remembers the operation and when the call started (in the call's own context)
+def start_call(model, context, **kwargs):
+    context['stats_operation'] = f"{model.service_model.service_name}.{model.name}"
+    context['stats_start'] = time.perf_counter()
+    context['stats_request_bytes'] = 0
+
+# Adds up the size of the request body (once per attempt, so retried requests count every time they are sent)
+def record_request_size(request, **kwargs):
+    from botocore.utils import determine_content_length
+    size = determine_content_length(request.body) if request.body is not None else 0
+    if size is None:
+        size = int(request.headers.get('Content-Length', 0))
+    if request.context is not None:
+        request.context['stats_request_bytes'] = request.context.get('stats_request_bytes', 0) + size
+
+# Records a finished call (including calls that failed with an error response)
+def record_call(http_response, parsed, model, context, **kwargs):
+    metadata = parsed.get('ResponseMetadata', {})
+    # Note: HEAD responses have the object's Content-Length, but no body
+    response_bytes = 0 if model.http.get('method') == "HEAD" else int(http_response.headers.get('Content-Length', 0) or 0)
+    record(
+        context,
+        failed_flag='Error' in parsed,
+        retries=metadata.get('RetryAttempts', 0),
+        response_bytes=response_bytes,
+        consumed_capacity=parsed.get('ConsumedCapacity')
+    )
+
+# Records a call that failed without a response (eg. connection errors, after all retries)
+def record_call_error(context, **kwargs):
+    retries = max(context.get('retries', {}).get('attempt', 1) - 1, 0)
+    record(context, failed_flag=True, retries=retries, response_bytes=0, consumed_capacity=None)
+
+# Adds a finished call to its operation's stats
+def record(context, failed_flag, retries, response_bytes, consumed_capacity):
+    latency_ms = (time.perf_counter() - context.get('stats_start', time.perf_counter())) * 1000
+    operation = context.get('stats_operation', "unknown")
+
+    # ConsumedCapacity is a dict for single-table calls, or a list (one per table) for batch calls
+    if isinstance(consumed_capacity, dict):
+        consumed_capacity = [consumed_capacity]
+
+    with stats_lock:
+        stats = operation_stats.setdefault(operation, new_operation_stats())
+        stats['calls'] += 1
+        stats['failed'] += 1 if failed_flag else 0
+        stats['retries'] += retries
+        stats['latency_ms'] += latency_ms
+        stats['latency_buckets'][latency_bucket(latency_ms)] += 1
+        stats['request_bytes'] += context.get('stats_request_bytes', 0)
+        stats['response_bytes'] += response_bytes
+        for capacity in consumed_capacity or []:
+            stats['read_capacity'] += capacity.get('ReadCapacityUnits', 0)
+            stats['write_capacity'] += capacity.get('WriteCapacityUnits', 0)
+            stats['capacity'] += capacity.get('CapacityUnits', 0)
+
+# Returns empty stats for an operation
+def new_operation_stats():
+    return {
+        'calls': 0,
+        'failed': 0,
+        'retries': 0,
+        'latency_ms': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        'request_bytes': 0,
+        'response_bytes': 0,
+        'read_capacity': 0.0,
+        'write_capacity': 0.0,
+        'capacity': 0.0
+    }
+
+# Returns the index of the histogram bucket for the latency
+def latency_bucket(latency_ms):
+    for i, bound_ms in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound_ms:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+# ========== REPORTING ==========
+# Returns a copy of the stats of every operation ({operation: stats}, sorted by operation)
+def get_stats():
+    with stats_lock:
+        return {operation: json.loads(json.dumps(stats)) for operation, stats in sorted(operation_stats.items())}
+
+# Clears all stats
+def reset_stats():
+    with stats_lock:
+        operation_stats.clear()
+
+# Returns the p-th percentile latency (ms) from a histogram - the upper bound of the bucket it falls in (or None if it is in the last, unbounded bucket)
+def histogram_percentile(buckets, p):
+    total = sum(buckets)
+    if total == 0:
+        return 0
+    rank = max(1, -(-p * total // 100))
+    seen = 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+
+# Displays a table of the stats per operation (and the totals)
+def print_stats(stream=None):
+    stream = stream or sys.stdout
+    stats = get_stats()
+    if len(stats) == 0:
+        stream.write("No AWS requests were made.\n")
+        return
+
+    stream.write(STATS_FORMAT.format("Operation", "Calls", "Failed", "Retries", "Avg ms", "p50 ms", "p99 ms", "Sent KB", "Recv KB", "Capacity") + "\n")
+    totals = new_operation_stats()
+    for operation, op_stats in stats.items():
+        stream.write(format_stats_row(operation, op_stats) + "\n")
+        for key, value in op_stats.items():
+            if key == 'latency_buckets':
+                totals[key] = [a + b for a, b in zip(totals[key], value)]
+            else:
+                totals[key] += value
+    stream.write(format_stats_row("Total", totals) + "\n")
+
+# Formats one row of the stats table
+def format_stats_row(name, stats):
+    percentiles = [histogram_percentile(stats['latency_buckets'], p) for p in [50, 99]]
+    capacity = stats['capacity'] or stats['read_capacity'] + stats['write_capacity']
+    return STATS_FORMAT.format(
+        name, stats['calls'], stats['failed'], stats['retries'],
+        f"{stats['latency_ms'] / stats['calls']:.1f}" if stats['calls'] > 0 else "0.0",
+        *[f"<={p}" if p is not None else f">{LATENCY_BUCKETS_MS[-1]}" for p in percentiles],
+        f"{stats['request_bytes'] / 1024:.1f}", f"{stats['response_bytes'] / 1024:.1f}",
+        f"{capacity:g}"
+    )
+
+# Saves the stats (with the histogram bucket bounds) as JSON
+def dump_stats(json_filename):
+    with open(json_filename, "w") as json_file:
+        json.dump({'time': time.time(), 'latency_buckets_ms': LATENCY_BUCKETS_MS, 'operations': get_stats()}, json_file, indent=2)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Shared S3 streams ; used by generateOECD.py, backupTable.py, and loadBundle.py
+
+@note :
+    Description: Streams data to and from S3 objects without holding a whole object in memory (or on disk):
+        - S3UploadStream is a binary stream that uploads what is written as a multipart upload, one S3_PART_SIZE part at a time
+        - S3TextWriter is a text stream that writes into an S3UploadStream, and S3GzipWriter one that gzips what is written into it
+        - open_s3_read() returns the object's body as a binary stream
+        - paths are written as 's3://<bucket>/<prefix>', split by parse_s3_path() and joined with object names by join_s3_key()
+
+        NOTE: an upload is aborted if it fails, so no incomplete parts are left behind
+        NOTE: closing an upload completes (publishes) it, so writers abort() it instead on failure - leaving a 'with' block because of an exception does this
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import gzip
+import io
+
+############################################ CONSTANTS ############################################
+
+S3_PREFIX = "s3://"
+S3_PART_SIZE = 8 * 1024 * 1024
+
+############################################ FUNCTIONS ############################################
+
+# Checks if a path is an S3 path ('s3://<bucket>/<prefix>'), returns true if it is
+def is_s3_path(path):
+    return path.startswith(S3_PREFIX)
+
+# Splits an S3 path into (bucket, prefix)
+def parse_s3_path(path):
+    bucket, _, prefix = path[len(S3_PREFIX):].partition("/")
+    return bucket, prefix.strip("/")
+
+# Returns the key of the named object under the prefix
+def join_s3_key(prefix, name):
+    return f"{prefix}/{name}" if prefix != "" else name
+
+# Returns a binary stream of the S3 object's body
+def open_s3_read(s3_client, bucket, key):
+    return s3_client.get_object(Bucket=bucket, Key=key)['Body']
+
+# Binary stream that uploads what is written to an S3 object as a multipart upload, one part at a time (so memory use stays at one part)
+# Note: close() completes the upload, unless abort() discarded it first (so nothing is published); it is also aborted if completing it fails
+class S3UploadStream(io.RawIOBase):
+    def __init__(self, s3_client, bucket, key):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.buffer = bytearray()
+        self.parts = []
+        self.aborted = False
+        self.upload_id = self.s3_client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # Anything written after aborting (eg. while closing the streams over this one) is dropped
+        if self.aborted:
+            return len(data)
+        self.buffer.extend(data)
+        if len(self.buffer) >= S3_PART_SIZE:
+            self.upload_part()
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self.aborted:
+                # Last part (S3 needs at least one part, even if it's empty)
+                if len(self.buffer) > 0 or len(self.parts) == 0:
+                    self.upload_part()
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={'Parts': self.parts}
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            super().close()
+
+    # Aborts the upload, so no object (or incomplete parts) is left behind (closing the stream afterwards only closes it)
+    def abort(self):
+        if self.aborted:
+            return
+        self.aborted = True
+        self.buffer = bytearray()
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    # Aborts instead of completing when leaving a 'with' block because of an exception
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is not None:
+                self.abort()
+        finally:
+            self.close()
+
+    def upload_part(self):
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=bytes(self.buffer)
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.buffer = bytearray()
+
+# Text stream that writes into an S3 upload stream, completing the upload when it is closed, or discarding it with abort()
+# Note: leaving a 'with' block because of an exception aborts the upload, so a truncated object is never published
+class S3TextWriter(io.TextIOWrapper):
+    def __init__(self, s3_stream, newline=None):
+        self.s3_stream = s3_stream
+        super().__init__(self.open_buffer(s3_stream), encoding="utf-8", newline=newline)
+
+    # Returns the binary stream the text is encoded into (the upload stream itself)
+    def open_buffer(self, s3_stream):
+        return s3_stream
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super().close()
+        finally:
+            self.s3_stream.close()
+
+    # Aborts the upload, then closes the stream (anything still buffered is dropped)
+    def abort(self):
+        try:
+            self.s3_stream.abort()
+        finally:
+            self.close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+# Text stream that gzips what is written into an S3 upload stream (completed when closed, or discarded with abort(), as for S3TextWriter)
+# Note: closing a gzip stream does not close the stream under it, so this closes both together
+class S3GzipWriter(S3TextWriter):
+    def __init__(self, s3_stream, compresslevel):
+        self.compresslevel = compresslevel
+        super().__init__(s3_stream)
+
+    def open_buffer(self, s3_stream):
+        return gzip.GzipFile(fileobj=s3_stream, mode="wb", compresslevel=self.compresslevel)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - DynamoDB table export and restore (backups, and cloning tables between environments without reloading the CSVs)
+
+@note :
+    Description: Exports a table to a backup, and restores a backup into a new table:
+        - export: parallel scan ('--segments <n>' segments at once, default 8), each segment streamed to its own compressed part file
+        - restore: creates the table with the backup's key schema, then loads the part files with concurrent writers ('--writers <n>', default 8)
+        --> a backup is a local dir or 's3://<bucket>/<prefix>' holding:
+            - part-<segment>.jsonl.gz - one item per line, in DynamoDB JSON (eg. {"year": {"N": "2010"}}), so every type is kept exactly
+            - manifest.json - table name, key schema, attribute definitions, and #of items/bytes/write units per part (written last, so only complete backups have one)
+        --> items are never converted to Python types and back: the low-level client's scan output is written as-is,
+            and restored with batch_write_item (25 items per call, retrying unprocessed items, see awsBatch.py)
+
+        NOTE: restore takes the same '--capacity-mode <on-demand|provisioned>' and '--target-seconds <n>' flags as the loaders (see awsCapacity.py),
+            the write boost is sized from the manifest's exact write units (counted from each item's attribute names and values as it is exported),
+            and for at most one writer per part
+        NOTE: only the table's keys are copied, not its indexes, streams, TTL, or tags
+        NOTE: export exits with error if the backup already exists, and restore if the table already exists (never overwrites either)
+        NOTE: restore writes whole part files per writer, so more writers than parts (export '--segments') do not speed it up
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import awsBatch
+import awsCapacity
+import awsClients
+import awsStats
+import awsStreams
+import base64
+import concurrent.futures
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = (
+    "Usage: py backupTable.py export <table-name> <dir|s3://bucket/prefix> [--segments <n>] [--stats] [--stats-json <file>]\n"
+    f"       py backupTable.py restore <dir|s3://bucket/prefix> <table-name> [--writers <n>] {awsCapacity.CAPACITY_USAGE} [--stats] [--stats-json <file>]"
+)
+EXPORT_CMD = "export"
+RESTORE_CMD = "restore"
+
+# BACKUP CONSTANTS
+MANIFEST_NAME = "manifest.json"
+PART_NAME_FORMAT = "part-{:05d}.jsonl.gz"
+BACKUP_FORMAT_VERSION = 1
+GZIP_LEVEL = 6 #default zlib level, good compression without slowing the scan down
+
+# CONCURRENCY CONSTANTS
+DEFAULT_SEGMENTS = 8
+MAX_SEGMENTS = 1000000 #DynamoDB's limit on TotalSegments
+DEFAULT_WRITERS = 8
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Declares global vars and state here, then exports or restores the table after validating arguments and checking for errors
+def main():
+    #globals
+    global dynamodb_client
+    global s3_client
+
+    # Remove the optional '--stats'/'--stats-json <file>' and capacity flags before checking the other args (see awsStats.py and awsCapacity.py)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(USAGE_STATEMENT)
+    capacity_args = awsCapacity.setup(argv)
+    if capacity_args is None:
+        sys.exit(USAGE_STATEMENT)
+    argv, capacity_options = capacity_args
+
+    options = parse_args(argv[1:])
+    if options is None:
+        sys.exit(USAGE_STATEMENT)
+
+    # ========== AWS CLIENTS ==========
+    # Note: one pooled connection per segment/writer (see awsClients.py), S3 is only used for 's3://' backups
+    pool_connections = options['segments'] if options['cmd'] == EXPORT_CMD else options['writers']
+    dynamodb_client = awsClients.get_client("dynamodb", max_pool_connections=pool_connections)
+    s3_client = awsClients.get_client("s3", max_pool_connections=pool_connections) if awsStreams.is_s3_path(options['path']) else None
+
+    # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works)
+    try:
+        dynamodb_client.list_tables()
+    except Exception as e:
+        print("Error: Invalid or expired credentials (or insufficient permissions to call 'list_tables()')")
+        sys.exit(f"[ERROR] {e}")
+
+    if options['cmd'] == EXPORT_CMD:
+        export_table(options['table'], options['path'], options['segments'])
+    else:
+        restore_table(options['path'], options['table'], options['writers'], capacity_options)
+
+############################################ FUNCTIONS ############################################
+
+# Parses the command line args (without the script name) into a dict of options, returns None (after displaying why) if they are invalid
+def parse_args(argv):
+    if len(argv) < 3 or argv[0] not in [EXPORT_CMD, RESTORE_CMD]:
+        print(f"Error: Missing or invalid command - must be '{EXPORT_CMD} <table-name> <backup>' or '{RESTORE_CMD} <backup> <table-name>'.")
+        return None
+
+    options = {
+        'cmd': argv[0],
+        'table': argv[1] if argv[0] == EXPORT_CMD else argv[2],
+        'path': argv[2] if argv[0] == EXPORT_CMD else argv[1],
+        'segments': DEFAULT_SEGMENTS,
+        'writers': DEFAULT_WRITERS
+    }
+    flags = {EXPORT_CMD: {"--segments": 'segments'}, RESTORE_CMD: {"--writers": 'writers'}}[options['cmd']]
+    i = 3
+    while i < len(argv):
+        arg = argv[i]
+        if arg not in flags:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{arg}'.")
+            return None
+        value = argv[i + 1]
+        if not value.isdigit() or int(value) < 1:
+            print(f"Error: Invalid value '{value}' for '{arg}' - must be a whole number greater than 0.")
+            return None
+        options[flags[arg]] = int(value)
+        i += 2
+
+    if options['segments'] > MAX_SEGMENTS:
+        print(f"Error: Invalid value '{options['segments']}' for '--segments' - must be at most {MAX_SEGMENTS}.")
+        return None
+    if awsStreams.is_s3_path(options['path']) and awsStreams.parse_s3_path(options['path'])[0] == "":
+        print(f"Error: Invalid backup '{options['path']}' - missing bucket name.")
+        return None
+    return options
+
+# ========== EXPORT ==========
+# Exports the table to the backup with a parallel scan (one part file per segment), then writes the manifest
+def export_table(table_name, path, segments):
+    try:
+        description = dynamodb_client.describe_table(TableName=table_name)['Table']
+    except Exception as e:
+        print(f"Error: Invalid table name '{table_name}' - table does not exist (or cannot be described).")
+        sys.exit(f"[ERROR] {e}")
+    try:
+        if backup_file_exists(path, MANIFEST_NAME):
+            sys.exit(f"ERROR: Terminating program because backup '{path}' already exists (will not overwrite it).")
+        if not awsStreams.is_s3_path(path):
+            os.makedirs(path, exist_ok=True)
+    except Exception as e:
+        print(f"Error: Invalid backup '{path}' - unable to write to it (eg. bucket does not exist).")
+        sys.exit(f"[ERROR] {e}")
+
+    # Scan every segment at once, each into its own part file
+    print(f"--Exporting table '{table_name}' ({segments} segments)... please wait...")
+    start_time = time.time()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=segments) as executor:
+            parts = list(executor.map(lambda segment: export_segment(table_name, path, segment, segments), range(segments)))
+    except Exception as e:
+        sys.exit(f"[ERROR] While exporting table: {e}")
+
+    # The manifest is written last, so a backup without one is known to be incomplete
+    manifest = {
+        'version': BACKUP_FORMAT_VERSION,
+        'table': table_name,
+        'time': time.time(),
+        'key_schema': description['KeySchema'],
+        'attribute_definitions': description['AttributeDefinitions'],
+        'items': sum(part['items'] for part in parts),
+        'bytes': sum(part['bytes'] for part in parts),
+        'units': sum(part['units'] for part in parts),
+        'parts': parts
+    }
+    try:
+        with open_backup_file(path, MANIFEST_NAME, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+    except Exception as e:
+        sys.exit(f"[ERROR] While writing backup manifest: {e}")
+
+    elapsed_time = time.time() - start_time
+    print(f"...finished exporting {manifest['items']} items ({len(parts)} parts) in {elapsed_time} seconds--")
+
+# Scans one segment of the table into its part file, returns the part's manifest entry (file, #of items, #of bytes before compression, #of write units)
+def export_segment(table_name, path, segment, segments):
+    part = {'file': PART_NAME_FORMAT.format(segment), 'items': 0, 'bytes': 0, 'units': 0}
+    scan_kwargs = {'TableName': table_name, 'Segment': segment, 'TotalSegments': segments}
+    with open_backup_file(path, part['file'], "w", compressed_flag=True) as part_file:
+        while True:
+            response = dynamodb_client.scan(**scan_kwargs)
+            for item in response['Items']:
+                line = json.dumps(encode_item(item), separators=(',', ':')) + "\n"
+                part_file.write(line)
+                part['items'] += 1
+                part['bytes'] += len(line)
+                part['units'] += awsCapacity.item_write_units(item)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return part
+
+# ========== RESTORE ==========
+# Restores the backup into a new table (same key schema), loading its part files with concurrent writers
+def restore_table(path, table_name, writers, capacity_options):
+    try:
+        with open_backup_file(path, MANIFEST_NAME, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except Exception as e:
+        print(f"Error: Invalid backup '{path}' - missing or unreadable '{MANIFEST_NAME}' (the export may not have finished).")
+        sys.exit(f"[ERROR] {e}")
+    if manifest.get('version') != BACKUP_FORMAT_VERSION:
+        sys.exit(f"ERROR: Terminating program because backup '{path}' has unsupported format version '{manifest.get('version')}'.")
+
+    # Check if table already exists before attempting to create a new one, display err msg and exit if it does
+    if table_name in list_all_tables():
+        print(f"Error: Invalid table name '{table_name}' - table already exists.")
+        sys.exit("ERROR: Terminating program because unable to create table with same name as an already existing table.")
+
+    # Create the table with the backup's keys, and capacity planned from the backup's exact write units (each part is loaded by one writer)
+    capacity_plan = awsCapacity.plan_item_capacity(capacity_options, manifest['items'], manifest['units'], min(writers, len(manifest['parts'])))
+    print(f"--Creating table '{table_name}' from backup of '{manifest['table']}' ({capacity_plan['description']})... please wait...")
+    try:
+        dynamodb_client.create_table(
+            TableName=table_name,
+            KeySchema=manifest['key_schema'],
+            AttributeDefinitions=manifest['attribute_definitions'],
+            **capacity_plan['create_args']
+        )
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+    except Exception as e:
+        sys.exit(f"[ERROR] While creating table: {e}")
+    print("...Table created successfully--")
+
+    # Load every part at once (up to #of writers)
+    # Note: the write boost is dialed back down whether or not the restore succeeds
+    print(f"--Restoring {manifest['items']} items ({len(manifest['parts'])} parts, {writers} writers)... please wait...")
+    start_time = time.time()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=writers) as executor:
+            item_count = sum(executor.map(lambda part: restore_part(path, part, table_name), manifest['parts']))
+        if item_count != manifest['items']:
+            raise ValueError(f"restored {item_count} items, but the manifest lists {manifest['items']}")
+    except Exception as e:
+        awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan)
+        sys.exit(f"[ERROR] While restoring items to table: {e}")
+    elapsed_time = time.time() - start_time
+    print(f"...finished restoring {item_count} items in {elapsed_time} seconds--")
+
+    if capacity_plan['boosted']:
+        print(f"--Dialing write capacity back down to {awsCapacity.STEADY_WRITE_CAPACITY} WCU... please wait...")
+        if awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan):
+            print("...Write capacity dialed down--")
+
+# Writes the items of one part file into the table in batches, returns #of items written
+def restore_part(path, part, table_name):
+    item_count = 0
+    batch = []
+    with open_backup_file(path, part['file'], "r", compressed_flag=True) as part_file:
+        for line in part_file:
+            batch.append({'PutRequest': {'Item': decode_item(json.loads(line))}})
+            if len(batch) == awsBatch.BATCH_WRITE_SIZE:
+                awsBatch.write_batch(dynamodb_client, table_name, batch)
+                item_count += len(batch)
+                batch = []
+    if len(batch) > 0:
+        awsBatch.write_batch(dynamodb_client, table_name, batch)
+        item_count += len(batch)
+    return item_count
+
+# Returns the names of all tables (every page)
+def list_all_tables():
+    table_names = []
+    list_kwargs = {}
+    while True:
+        response = dynamodb_client.list_tables(**list_kwargs)
+        table_names.extend(response['TableNames'])
+        if 'LastEvaluatedTableName' not in response:
+            return table_names
+        list_kwargs['ExclusiveStartTableName'] = response['LastEvaluatedTableName']
+
+# ========== ITEM ENCODING ==========
+# Converts an item from the low-level client into JSON-serializable DynamoDB JSON (binary values as base64)
+def encode_item(item):
+    return {name: encode_value(value) for name, value in item.items()}
+
+# Converts one AttributeValue (eg. {'N': '2010'}) for JSON, recursing into maps and lists
+def encode_value(value):
+    (value_type, data), = value.items()
+    if value_type == 'B':
+        return {'B': base64.b64encode(data).decode('ascii')}
+    if value_type == 'BS':
+        return {'BS': [base64.b64encode(element).decode('ascii') for element in data]}
+    if value_type == 'M':
+        return {'M': encode_item(data)}
+    if value_type == 'L':
+        return {'L': [encode_value(element) for element in data]}
+    return value
+
+# Converts an item read from a part file back into the low-level client's format (the reverse of encode_item())
+def decode_item(item):
+    return {name: decode_value(value) for name, value in item.items()}
+
+# Converts one AttributeValue read from a part file back (the reverse of encode_value())
+def decode_value(value):
+    (value_type, data), = value.items()
+    if value_type == 'B':
+        return {'B': base64.b64decode(data)}
+    if value_type == 'BS':
+        return {'BS': [base64.b64decode(element) for element in data]}
+    if value_type == 'M':
+        return {'M': decode_item(data)}
+    if value_type == 'L':
+        return {'L': [decode_value(element) for element in data]}
+    return value
+
+# ========== BACKUP FILES ==========
+# Opens a text stream for the named file of the backup (in the local dir, or in S3 if the backup is 's3://<bucket>/<prefix>'), gzipped if compressed
+def open_backup_file(path, name, mode, compressed_flag=False):
+    if not awsStreams.is_s3_path(path):
+        if compressed_flag:
+            return gzip.open(os.path.join(path, name), mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL)
+        return open(os.path.join(path, name), mode, encoding="utf-8")
+
+    bucket, prefix = awsStreams.parse_s3_path(path)
+    key = awsStreams.join_s3_key(prefix, name)
+    if mode == "w":
+        stream = awsStreams.S3UploadStream(s3_client, bucket, key)
+        if compressed_flag:
+            return awsStreams.S3GzipWriter(stream, GZIP_LEVEL)
+        return awsStreams.S3TextWriter(stream)
+    stream = awsStreams.open_s3_read(s3_client, bucket, key)
+    if compressed_flag:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+# Checks if the named file of the backup exists, returns true if it does
+def backup_file_exists(path, name):
+    if not awsStreams.is_s3_path(path):
+        return os.path.isfile(os.path.join(path, name))
+    bucket, prefix = awsStreams.parse_s3_path(path)
+    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=awsStreams.join_s3_key(prefix, name), MaxKeys=1)
+    return response.get('KeyCount', 0) > 0
+
+###################################################################################################
+
+main()
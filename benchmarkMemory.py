@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Memory benchmark of queryOECD.py's report data, as a record store (recordStore.py) vs boto3 dicts
+
+@note :
+    Description: Builds the report data of the same synthetic OECD records both ways, as queryOECD.py's report path holds it, measuring each with tracemalloc:
+        - dicts: each item deserialized by boto3's TypeDeserializer (what the boto3 resource gives, eg. {'year': Decimal('2010'), ...}),
+            then grouped into {commodity: {variable: {year: value with its mfactor applied}}} (what the report used to hold)
+        - store: each item decoded straight into a RecordStore, then grouped into its series indexes (what the report holds now),
+            whose values are only made as each series is read (see RecordStore.series())
+        --> reports memory per row and per million rows (held after building, and peak while building), and build time for each
+            (build time includes making the pages, which is the same for both)
+
+        NOTE: items are made in pages of PAGE_ITEMS (like scan pages), each parsed from JSON text so its strings are new objects (like botocore's),
+            and each page is dropped once decoded, so only what is kept is measured
+        NOTE: records are rows layout items (see loadTable.py), with a fixed seed so every run measures the same data
+        NOTE: checks both give the same total of values (exactly, reading every series through the store after measuring), and exits with 1 if they don't
+        NOTE: needs boto3 (for its TypeDeserializer) but no AWS access
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import json
+import random
+import recordStore
+import sys
+import time
+import tracemalloc
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = "Usage: py benchmarkMemory.py [--rows <n>]"
+
+DEFAULT_ROWS = 100000
+PAGE_ITEMS = 1000
+SEED = 4010
+YEARS = range(2010, 2030)
+VARIABLES = ["AH", "CI", "EX", "FE", "IM", "OU", "PR", "QC", "QP", "ST", "YLD"]
+UNITS = ["HA", "KT", "T_HA", "KG_CAP", "NATCUR"]
+MFACTORS = [0, 0, 3, 6]
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Builds the report data as dicts and as a record store, displays how much memory and time each takes
+def main():
+    rows = parse_args(sys.argv[1:])
+
+    print(f"--Benchmarking memory of {rows} records (pages of {PAGE_ITEMS} items)...")
+    dicts_result, data = measure(rows, build_dicts)
+    store_result, store = measure(rows, build_store)
+    results = {"dicts": dicts_result, "store": store_result}
+
+    for name, result in results.items():
+        print(f"{name:<8}held {result['held'] / rows:>8.1f} B/row ({result['held'] / rows:>8.1f} MB per million rows)    "
+            f"peak {result['peak'] / rows:>8.1f} B/row    build {result['seconds']:>6.2f} s")
+    print(f"--The record store holds {results['dicts']['held'] / results['store']['held']:.1f}x less memory than the dicts")
+
+    dicts_total = sum(value for variables in data.values() for values in variables.values() for value in values.values())
+    store_total = sum(value for commodity, variable in store.series_indexes() for value in store.series(commodity, variable).values())
+    if dicts_total != store_total:
+        sys.exit(f"ERROR: Totals differ (dicts {dicts_total}, store {store_total}).")
+    print(f"...Both hold the same records (total of values {store_total})--")
+
+############################################ FUNCTIONS ############################################
+
+# Parses the args, returns #of rows (or exits with the usage statement if they are invalid)
+def parse_args(args):
+    if len(args) == 0:
+        return DEFAULT_ROWS
+    if len(args) != 2 or args[0] != "--rows":
+        print("Error: Invalid arguments.")
+        sys.exit(USAGE_STATEMENT)
+    if not args[1].isdigit() or int(args[1]) < 1:
+        print(f"Error: Invalid value '{args[1]}' for '--rows' - must be a whole number greater than 0.")
+        sys.exit(USAGE_STATEMENT)
+    return int(args[1])
+
+# Yields pages of synthetic rows layout items from the low-level client (eg. {'year': {'N': '2010'}}), each parsed from JSON text
+def generate_pages(rows):
+    rng = random.Random(SEED)
+    page = []
+    for row_id in range(rows):
+        series_num, year_index = divmod(row_id, len(YEARS))
+        if year_index == 0:
+            commodity = f"WT{series_num // len(VARIABLES)}"
+            variable = VARIABLES[series_num % len(VARIABLES)]
+            units = rng.choice(UNITS)
+            mfactor = rng.choice(MFACTORS)
+        page.append({
+            'id': {'N': str(row_id)},
+            'commodity': {'S': commodity},
+            'variable': {'S': variable},
+            'year': {'N': str(YEARS[year_index])},
+            'units': {'S': units},
+            'mfactor': {'N': str(mfactor)},
+            'value': {'N': f"{rng.uniform(0, 100000):.3f}"}
+        })
+        if len(page) == PAGE_ITEMS or row_id == rows - 1:
+            yield json.loads(json.dumps(page))
+            page = []
+
+# Builds the report data as dicts (items as the boto3 resource gives them, then grouped like the report used to)
+def build_dicts(rows):
+    from boto3.dynamodb.types import TypeDeserializer
+    deserializer = TypeDeserializer()
+    items = []
+    for page in generate_pages(rows):
+        for item in page:
+            items.append({name: deserializer.deserialize(value) for name, value in item.items()})
+
+    data = {}
+    for item in items:
+        data.setdefault(item['commodity'], {}).setdefault(item['variable'], {})[int(item['year'])] = item['value'] * (10**item['mfactor'])
+    return data
+
+# Builds the report data as a record store with its series indexes (as queryOECD.py does)
+def build_store(rows):
+    store = recordStore.RecordStore()
+    for page in generate_pages(rows):
+        for item in page:
+            store.add_item(item)
+    store.series_indexes()
+    return store
+
+# Runs a build, returns ({held (bytes kept by what was built), peak (bytes), seconds (to build)}, what was built)
+# Note: the build is timed on its own first, since tracing every allocation slows it down several times over
+def measure(rows, build):
+    # Import boto3 first, so its modules don't count towards the dicts
+    from boto3.dynamodb.types import TypeDeserializer
+
+    start_time = time.perf_counter()
+    build(rows)
+    seconds = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    built = build(rows)
+    held_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'held': held_bytes - start_bytes,
+        'peak': peak_bytes - start_bytes,
+        'seconds': seconds
+    }, built
+
+###################################################################################################
+
+main()
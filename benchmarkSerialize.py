@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Micro-benchmark of item serialization for the loaders (CSV rows -> DynamoDB AttributeValues)
+
+@note :
+    Description: Times turning CSV rows into batch_write_item AttributeValues (eg. {'year': {'N': '2010'}}) both ways, for both layouts of loadTable.py:
+        - generic: Python types first (int/Decimal, as the boto3 resource took them), then boto3's TypeSerializer (what Table.batch_writer() did for each item)
+        - direct: AttributeValues built straight from the CSV fields (what the loaders do now, see oecdItems.py)
+        --> reports items/sec (and microseconds per item) for each, and how many times faster the direct way is
+
+        NOTE: rows are read from the CSVs into memory first, so only building/serializing is timed (no file reading, no network)
+            - each CSV is serialized on its own, like a load of it would be (row IDs from 1, and series packed per CSV)
+        NOTE: each way is run RUNS times ('--runs <n>') and the fastest run is reported
+        NOTE: checks both ways give the same items (numbers compared by value, as DynamoDB stores them), and exits with 1 if they don't
+        NOTE: needs boto3 (for its TypeSerializer) but no AWS access
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import csv
+import oecdItems
+import os
+import sys
+import time
+from decimal import *
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = "Usage: py benchmarkSerialize.py [--runs <n>] [<file-name.csv> ...]"
+REGION_CSVS = ["canada.csv", "usa.csv", "mexico.csv", "northamerica.csv"] #default CSVs (next to this script)
+RUNS = 5
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Reads the CSV rows, times serializing them both ways for each layout, displays the results, and exits with 1 if the ways disagree
+def main():
+    runs, csv_filenames = parse_args(sys.argv[1:])
+    row_lists = []
+    for csv_filename in csv_filenames:
+        with open(csv_filename, "r", newline='') as csv_file:
+            row_lists.append(list(csv.reader(csv_file, delimiter=',')))
+
+    print(f"--Benchmarking serialization of {sum(len(rows) for rows in row_lists)} rows from {len(csv_filenames)} CSVs (fastest of {runs} runs)...")
+    mismatch_flag = False
+    for layout, serialize_ways in [(oecdItems.ROWS_LAYOUT, (serialize_rows_generic, serialize_rows_direct)), (oecdItems.PACKED_LAYOUT, (serialize_packed_generic, serialize_packed_direct))]:
+        results = {}
+        for way, serialize_rows in zip(["generic", "direct"], serialize_ways):
+            seconds, items = time_serialize(serialize_rows, row_lists, runs)
+            results[way] = {'seconds': seconds, 'items': items}
+            print(f"{layout:<8}{way:<9}{len(items) / seconds:>12.0f} items/s    {seconds / len(items) * 1000000:>8.2f} us/item")
+        print(f"        --direct is {results['generic']['seconds'] / results['direct']['seconds']:.1f}x faster")
+
+        if not are_items_equal(results['generic']['items'], results['direct']['items']):
+            mismatch_flag = True
+            print(f"        Error: the {layout} layout's items differ between the two ways.")
+
+    if mismatch_flag:
+        sys.exit("ERROR: Both ways must give the same items.")
+    print("...Both ways give the same items--")
+
+############################################ FUNCTIONS ############################################
+
+# Parses the args, returns (#of runs, CSV file names) (or exits with the usage statement if they are invalid)
+def parse_args(args):
+    runs = RUNS
+    if len(args) >= 1 and args[0] == "--runs":
+        if len(args) < 2 or not args[1].isdigit() or int(args[1]) < 1:
+            print("Error: Invalid value for '--runs' - must be a whole number greater than 0.")
+            sys.exit(USAGE_STATEMENT)
+        runs = int(args[1])
+        args = args[2:]
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_filenames = args if len(args) > 0 else [os.path.join(script_dir, name) for name in REGION_CSVS]
+    for csv_filename in csv_filenames:
+        if not os.path.isfile(csv_filename):
+            print(f"Error: Invalid CSV file name '{csv_filename}' - file does not exist.")
+            sys.exit(USAGE_STATEMENT)
+    return runs, csv_filenames
+
+# Serializes each CSV's rows as rows layout items the generic way (Python types, then TypeSerializer), returns the items
+def serialize_rows_generic(row_lists):
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return [
+        {name: serializer.serialize(value) for name, value in oecdItems.build_row_item(row_id, row).items()}
+        for rows in row_lists for row_id, row in enumerate(rows, 1)
+    ]
+
+# Serializes each CSV's rows as rows layout items the direct way (straight from the CSV fields), returns the items
+def serialize_rows_direct(row_lists):
+    return [oecdItems.build_row_attribute_item(row_id, row) for rows in row_lists for row_id, row in enumerate(rows, 1)]
+
+# Serializes each CSV's rows as packed layout items the generic way (Python types, then TypeSerializer), returns the items
+def serialize_packed_generic(row_lists):
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return [
+        {name: serializer.serialize(value) for name, value in item.items()}
+        for rows in row_lists for item in oecdItems.build_packed_items(rows)[0]
+    ]
+
+# Serializes each CSV's rows as packed layout items the direct way (straight from the CSV fields), returns the items
+def serialize_packed_direct(row_lists):
+    return [item for rows in row_lists for item in oecdItems.build_packed_attribute_items(rows)[0]]
+
+# Runs a serialization RUNS times, returns (fastest time in seconds, items of the last run)
+def time_serialize(serialize_rows, row_lists, runs):
+    # Import boto3 first, so the import doesn't count towards the generic way
+    from boto3.dynamodb.types import TypeSerializer
+
+    best_seconds = None
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        items = serialize_rows(row_lists)
+        seconds = time.perf_counter() - start_time
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+    return best_seconds, items
+
+# Checks two lists of items are the same (numbers compared by value), returns true if they are
+def are_items_equal(items, other_items):
+    return len(items) == len(other_items) and all(normalize_value({'M': item}) == normalize_value({'M': other}) for item, other in zip(items, other_items))
+
+# Returns an AttributeValue with its numbers as Decimals (so they compare by value, eg. '2010' and '2010.0')
+def normalize_value(value):
+    if 'N' in value:
+        return Decimal(value['N'])
+    if 'M' in value:
+        return {name: normalize_value(member) for name, member in value['M'].items()}
+    return value
+
+###################################################################################################
+
+main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Startup benchmark for the 4 entry points (awsS3Shell.py, loadTable.py, loadEncodingsTable.py, queryOECD.py)
+
+@note :
+    Description: Runs each entry point with 'python -X importtime' on a path that exits before any AWS call (a usage error),
+        then reports its wall time, total import time, and slowest top-level imports, and checks them against a budget:
+        - total import time must be within IMPORT_TIME_BUDGET_MS
+        - none of HEAVY_MODULES (boto3 and botocore, even just botocore.exceptions) may be imported, they must be deferred until a client is needed
+
+        NOTE: each entry point is run RUNS times and the fastest run is reported (the first run also pays for compiling/caching bytecode)
+        NOTE: exits with 1 if any entry point is over budget (so it can be used as a check), 0 otherwise
+        NOTE: also reports the cost of 'import boto3' on its own for comparison (skipped if boto3 is not installed)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import os
+import re
+import subprocess
+import sys
+import time
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = "Usage: py benchmarkStartup.py <optional-budget-ms>"
+
+# Entry points and args that make each one exit with a usage error before it needs AWS
+ENTRY_POINTS = {
+    "awsS3Shell.py": ["--startup-benchmark"],
+    "loadTable.py": ["startup-benchmark.csv", "startup-benchmark", "extra"],
+    "loadEncodingsTable.py": ["extra"],
+    "queryOECD.py": ["startup", "benchmark"]
+}
+HEAVY_MODULES = ["boto3", "botocore"] #botocore itself, so even a light import of it (eg. botocore.exceptions) is caught
+IMPORT_TIME_BUDGET_MS = 100
+RUNS = 5
+SLOWEST_IMPORTS_SHOWN = 3
+
+# Matches a '-X importtime' line: "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Benchmarks the startup of each entry point, displays the results, and exits with 1 if any is over budget
+def main():
+    argc = len(sys.argv)
+    budget_ms = IMPORT_TIME_BUDGET_MS
+    if argc > 2:
+        print("Error: Too many arguments.")
+        sys.exit(USAGE_STATEMENT)
+    elif argc == 2:
+        if not sys.argv[1].isdigit():
+            print(f"Error: Invalid budget '{sys.argv[1]}' - must be a whole number of milliseconds.")
+            sys.exit(USAGE_STATEMENT)
+        budget_ms = int(sys.argv[1])
+
+    # Run from the scripts' directory (they read config/CSV files relative to it)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    print(f"--Benchmarking startup (fastest of {RUNS} runs, import time budget {budget_ms} ms)...")
+    over_budget_flag = False
+    for script, args in ENTRY_POINTS.items():
+        result = measure_startup([os.path.join(script_dir, script)] + args, script_dir)
+        heavy_modules = [name for name in HEAVY_MODULES if name in result['modules']]
+        ok_flag = result['import_ms'] <= budget_ms and len(heavy_modules) == 0
+        over_budget_flag = over_budget_flag or not ok_flag
+
+        print(f"{'OK  ' if ok_flag else 'FAIL'} {script:<24}wall {result['wall_ms']:>8.1f} ms    imports {result['import_ms']:>8.1f} ms")
+        for name, cumulative_ms in result['slowest']:
+            print(f"        {name:<32}{cumulative_ms:>8.1f} ms")
+        if len(heavy_modules) > 0:
+            print(f"        Error: imports {', '.join(heavy_modules)} before it is needed.")
+
+    # For comparison, what every entry point used to pay up front
+    result = measure_startup(["-c", "import boto3"], script_dir)
+    if result['returncode'] == 0:
+        print(f"--For comparison, 'import boto3' alone: imports {result['import_ms']:.1f} ms")
+
+    if over_budget_flag:
+        sys.exit("ERROR: At least one entry point is over its startup budget.")
+    print("...All entry points are within budget--")
+
+############################################ FUNCTIONS ############################################
+
+# Runs python with '-X importtime' and the given args RUNS times, returning the fastest run's results:
+#   wall_ms, import_ms (sum of top-level cumulative import times), modules (set of imported names), slowest (top-level imports), returncode
+def measure_startup(args, cwd):
+    best = None
+    for _ in range(RUNS):
+        start_time = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime"] + args,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        wall_ms = (time.perf_counter() - start_time) * 1000
+
+        # Only top-level (unindented) imports count towards the total, since their cumulative time includes their children
+        modules = set()
+        top_level = []
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME_PATTERN.match(line)
+            if match is None:
+                continue
+            modules.add(match.group(4))
+            if len(match.group(3)) <= 1:
+                top_level.append((match.group(4), int(match.group(2)) / 1000))
+
+        import_ms = sum(cumulative_ms for _, cumulative_ms in top_level)
+        if best is None or import_ms < best['import_ms']:
+            best = {
+                'wall_ms': wall_ms,
+                'import_ms': import_ms,
+                'modules': modules,
+                'slowest': sorted(top_level, key=lambda item: item[1], reverse=True)[:SLOWEST_IMPORTS_SHOWN],
+                'returncode': process.returncode
+            }
+    return best
+
+###################################################################################################
+
+main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - End-to-end benchmark suite (run against local AWS stand-ins, never real AWS)
+
+@note :
+    Description: Runs the real scripts end-to-end against local stand-ins for DynamoDB and S3, and reports how fast they are:
+        1) loadEncodingsTable.py
+        2) loadTable.py for each region CSV (northamerica, canada, usa, mexico), scaled up by '--scale'
+        3) queryOECD.py for a commodity (on the tables loaded by 2)
+        4) awsS3Shell.py script mode - upload -r, ls -l, du -s, find, download -r, rm -r of the scaled CSVs
+        --> each benchmark is run '--runs' times, reporting throughput (items or files per second), latency percentiles (per run, or per shell command),
+            and the AWS requests made (count per operation and request latency percentiles, recorded by awsStats.py into an AWS_STATS_JSON file)
+
+        NOTE: requires '--endpoint <url>' (eg. moto server 'moto_server -p 5000', or DynamoDB Local 'docker run -p 8000:8000 amazon/dynamodb-local'),
+            and '--s3-endpoint <url>' if S3 is served somewhere else (eg. MinIO), so it can never touch real AWS resources
+        NOTE: uses dummy credentials ('testing') unless AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY are already set (MinIO needs its own)
+        NOTE: scaled datasets repeat the bundled CSVs '--scale' times, renaming the commodity codes of each copy (eg. WT -> WT1),
+            so the tables grow while every commodity still has exactly one value per variable and year (queryOECD still works)
+        NOTE: '--rows <n>' uses synthetic datasets from generateOECD.py instead (n rows per region, always the same seed)
+        NOTE: '--layout <rows|packed>' is passed to loadTable.py (the tables queryOECD.py then reads), benchmarks are named after it if not 'rows'
+        NOTE: deletes and re-creates the benchmark tables (encodings, northamerica, canada, usa, mexico) on the stand-in before each run
+        NOTE: '--json <file>' saves the results, and '--baseline <file>' compares against saved results,
+            exiting with 1 if any benchmark's median time is more than REGRESSION_TOLERANCE (and REGRESSION_MIN_SECONDS) slower
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import awsClients
+import awsStats
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = "Usage: py benchmarkSuite.py --endpoint <url> [--s3-endpoint <url>] [--scale <n> | --rows <rows-per-region>] [--runs <n>] [--commodity <code>] [--layout <rows|packed>] [--json <results-file>] [--baseline <results-file>]"
+
+# DATASET CONSTANTS
+REGION_CSV_LIST = ["northamerica.csv", "canada.csv", "usa.csv", "mexico.csv"]
+ENCODINGS_CSV = "encodings.csv"
+ENCODINGS_TABLE_NAME = "encodings"
+DEFAULT_SCALE = 1
+DEFAULT_RUNS = 3
+DEFAULT_COMMODITY = "WT"
+DEFAULT_LAYOUT = "rows"
+LAYOUT_LIST = ["rows", "packed"]
+GENERATOR_SEED = 4010
+
+# SHELL CONSTANTS
+SHELL_PROFILE = "benchmark"
+SHELL_DATA_DIR = "data"
+SHELL_DOWNLOAD_DIR = "downloaded"
+SHELL_BUCKET_PREFIX = "oecd-benchmark"
+
+# OTHER CONSTANTS
+DUMMY_CREDENTIAL = "testing"
+DEFAULT_REGION = "us-east-1"
+PERCENTILES = [50, 90, 99]
+REGRESSION_TOLERANCE = 0.2 #20% slower than the baseline
+REGRESSION_MIN_SECONDS = 0.05 #ignore differences smaller than this (timer noise on very fast commands)
+RESULT_FORMAT = "{:<36}{:>6}{:>12}{:>14}{:>10}{:>10}{:>10}{:>10}{:>12}"
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Validates arguments, builds the scaled datasets, runs every benchmark against the stand-ins, then displays (and saves/compares) the results
+def main():
+    options = parse_args(sys.argv[1:])
+    if options is None:
+        sys.exit(USAGE_STATEMENT)
+
+    # Point every script (and this one) at the stand-ins, never real AWS
+    os.environ[awsClients.ENDPOINT_URL_ENV] = options['endpoint']
+    os.environ[f"{awsClients.ENDPOINT_URL_ENV}_S3"] = options['s3_endpoint'] or options['endpoint']
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", DUMMY_CREDENTIAL)
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", DUMMY_CREDENTIAL)
+    os.environ.setdefault("AWS_DEFAULT_REGION", DEFAULT_REGION)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    work_dir = tempfile.mkdtemp(prefix="oecd-benchmark-")
+    try:
+        if options['rows'] is None:
+            print(f"--Building datasets (scale {options['scale']}) in '{work_dir}'...")
+        else:
+            print(f"--Generating datasets ({options['rows']} rows per region) in '{work_dir}'...")
+        row_counts = build_datasets(script_dir, work_dir, options)
+        print(f"...{sum(row_counts.values())} rows in {len(row_counts)} region CSVs--")
+
+        dynamodb_client = awsClients.get_client("dynamodb")
+        results = []
+        results.append(benchmark_load_encodings(script_dir, work_dir, options, dynamodb_client))
+        results.extend(benchmark_load_tables(script_dir, work_dir, options, dynamodb_client, row_counts))
+        results.append(benchmark_query(script_dir, work_dir, options))
+        results.extend(benchmark_shell(script_dir, work_dir, options, row_counts))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+
+    if options['json'] is not None:
+        with open(options['json'], "w") as json_file:
+            json.dump({'scale': options['scale'], 'runs': options['runs'], 'results': results}, json_file, indent=2)
+        print(f"--Results saved to '{options['json']}'--")
+
+    if options['baseline'] is not None and not compare_to_baseline(results, options['baseline']):
+        sys.exit("ERROR: Performance regression detected (see above).")
+
+############################################ FUNCTIONS ############################################
+
+# Parses the command line args into a dict of options, returns None (after displaying why) if they are invalid
+def parse_args(argv):
+    options = {
+        'endpoint': None,
+        's3_endpoint': None,
+        'scale': DEFAULT_SCALE,
+        'rows': None,
+        'runs': DEFAULT_RUNS,
+        'commodity': DEFAULT_COMMODITY,
+        'layout': DEFAULT_LAYOUT,
+        'json': None,
+        'baseline': None
+    }
+    flags = {
+        "--endpoint": 'endpoint',
+        "--s3-endpoint": 's3_endpoint',
+        "--scale": 'scale',
+        "--rows": 'rows',
+        "--runs": 'runs',
+        "--commodity": 'commodity',
+        "--layout": 'layout',
+        "--json": 'json',
+        "--baseline": 'baseline'
+    }
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg not in flags:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{arg}'.")
+            return None
+        value = argv[i + 1]
+        if flags[arg] in ['scale', 'rows', 'runs']:
+            if not value.isdigit() or int(value) < 1:
+                print(f"Error: Invalid value '{value}' for '{arg}' - must be a whole number greater than 0.")
+                return None
+            value = int(value)
+        elif flags[arg] == 'layout' and value not in LAYOUT_LIST:
+            print(f"Error: Invalid layout '{value}' - must be one of: {', '.join(LAYOUT_LIST)}.")
+            return None
+        options[flags[arg]] = value
+        i += 2
+
+    if options['endpoint'] is None:
+        print("Error: Missing '--endpoint' - benchmarks only run against local stand-ins, never real AWS.")
+        return None
+    return options
+
+# ========== DATASETS ==========
+# Writes each region CSV (scaled up, or generated by generateOECD.py if '--rows' is given), the encodings CSV, and a shell config into the work dir
+# Returns {csv name: #of rows}
+def build_datasets(script_dir, work_dir, options):
+    row_counts = {}
+    if options['rows'] is not None:
+        # Same seed every time, so results stay comparable between runs of the suite
+        subprocess.run(
+            [sys.executable, os.path.join(script_dir, "generateOECD.py"), "--rows", str(options['rows']), "--out", work_dir, "--seed", str(GENERATOR_SEED)],
+            stdout=subprocess.DEVNULL,
+            check=True
+        )
+    for csv_name in REGION_CSV_LIST:
+        if options['rows'] is None:
+            row_counts[csv_name] = scale_csv(os.path.join(script_dir, csv_name), os.path.join(work_dir, csv_name), options['scale'])
+        else:
+            with open(os.path.join(work_dir, csv_name), "r", newline='') as csv_file:
+                row_counts[csv_name] = sum(1 for _ in csv_file)
+    # Generated datasets come with their own encodings (including their numbered commodity codes)
+    if options['rows'] is None:
+        shutil.copy(os.path.join(script_dir, ENCODINGS_CSV), os.path.join(work_dir, ENCODINGS_CSV))
+
+    # Shell profile (the shell reads 'config.ini' from its working dir)
+    with open(os.path.join(work_dir, "config.ini"), "w") as config_file:
+        config_file.write(f"[{SHELL_PROFILE}]\n")
+        config_file.write(f"AccessKey={os.environ['AWS_ACCESS_KEY_ID']}\n")
+        config_file.write(f"SecretKey={os.environ['AWS_SECRET_ACCESS_KEY']}\n")
+        config_file.write(f"Region={os.environ['AWS_DEFAULT_REGION']}\n")
+    return row_counts
+
+# Writes the source CSV 'scale' times into the destination CSV, renaming the commodity code of every copy after the first (eg. WT -> WT1), returns #of rows written
+def scale_csv(src_filename, dest_filename, scale):
+    with open(src_filename, "r", newline='') as src_file:
+        rows = list(csv.reader(src_file, delimiter=','))
+
+    with open(dest_filename, "w", newline='') as dest_file:
+        writer = csv.writer(dest_file, delimiter=',')
+        for copy_num in range(scale):
+            suffix = "" if copy_num == 0 else str(copy_num)
+            for row in rows:
+                writer.writerow([row[0] + suffix] + row[1:])
+    return len(rows) * scale
+
+# ========== BENCHMARKS ==========
+# Benchmarks loadEncodingsTable.py (re-creating the encodings table each run)
+def benchmark_load_encodings(script_dir, work_dir, options, dynamodb_client):
+    with open(os.path.join(work_dir, ENCODINGS_CSV), "r", newline='') as csv_file:
+        item_count = sum(1 for _ in csv_file)
+
+    runs = []
+    for _ in range(options['runs']):
+        delete_table(dynamodb_client, ENCODINGS_TABLE_NAME)
+        runs.append(run_script(script_dir, work_dir, "loadEncodingsTable.py", []))
+    return summarize("loadEncodingsTable", runs, item_count)
+
+# Benchmarks loadTable.py for each region CSV (re-creating its table each run), leaving the tables loaded for queryOECD.py
+def benchmark_load_tables(script_dir, work_dir, options, dynamodb_client, row_counts):
+    results = []
+    for csv_name, row_count in row_counts.items():
+        table_name = os.path.splitext(csv_name)[0]
+        runs = []
+        for _ in range(options['runs']):
+            delete_table(dynamodb_client, table_name)
+            runs.append(run_script(script_dir, work_dir, "loadTable.py", [csv_name, table_name, "--layout", options['layout']]))
+        results.append(summarize(f"loadTable {table_name}{layout_suffix(options)}", runs, row_count))
+    return results
+
+# Benchmarks queryOECD.py for the commodity (items = #of items in the 4 tables, since every query scans them all)
+def benchmark_query(script_dir, work_dir, options):
+    item_count = 0
+    for csv_name in REGION_CSV_LIST:
+        with open(os.path.join(work_dir, csv_name), "r", newline='') as csv_file:
+            item_count += sum(1 for _ in csv_file)
+
+    runs = []
+    for _ in range(options['runs']):
+        runs.append(run_script(script_dir, work_dir, "queryOECD.py", [options['commodity']]))
+    return summarize(f"queryOECD {options['commodity']}{layout_suffix(options)}", runs, item_count)
+
+# Returns the suffix for benchmark names of a non-default layout (so results of different layouts are never compared as the same benchmark)
+def layout_suffix(options):
+    return "" if options['layout'] == DEFAULT_LAYOUT else f" ({options['layout']})"
+
+# Benchmarks awsS3Shell.py commands in script mode, returning one result for the whole script then one per command (items = #of files)
+# Note: the bucket is created by the first run and emptied by every run
+def benchmark_shell(script_dir, work_dir, options, row_counts):
+    bucket = f"{SHELL_BUCKET_PREFIX}-{os.getpid()}-{SHELL_DATA_DIR}" #the shell only accepts bucket names ending in a letter
+    data_dir = os.path.join(work_dir, SHELL_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    for csv_name in row_counts.keys():
+        shutil.copy(os.path.join(work_dir, csv_name), os.path.join(data_dir, csv_name))
+    file_count = len(row_counts)
+
+    commands = [
+        f"upload -r {SHELL_DATA_DIR} {SHELL_DATA_DIR}",
+        "ls -l",
+        f"du -s {SHELL_DATA_DIR}",
+        f"find {SHELL_DATA_DIR} -name *.csv",
+        f"download -r {SHELL_DATA_DIR} {SHELL_DOWNLOAD_DIR}",
+        f"rm -r {SHELL_DATA_DIR}"
+    ]
+    script_runs = []
+    command_runs = {command.split()[0]: [] for command in commands}
+    for run_num in range(options['runs']):
+        shutil.rmtree(os.path.join(work_dir, SHELL_DOWNLOAD_DIR), ignore_errors=True)
+        setup = [f"login {SHELL_PROFILE}"] + ([f"mkbucket {bucket}"] if run_num == 0 else []) + [f"cd {bucket}"]
+        run = run_script(script_dir, work_dir, "awsS3Shell.py", ["--json", "-c", "; ".join(setup + commands)])
+        script_runs.append(run)
+
+        # Split the run into the commands' own results (script mode prints one JSON line per command)
+        for line in run['stdout'].splitlines():
+            try:
+                command_result = json.loads(line)
+            except ValueError:
+                continue
+            name = command_result['command'].split()[0]
+            if name in command_runs:
+                command_runs[name].append({'seconds': command_result['seconds'], 'ok': command_result['ok'], 'requests': {}})
+
+    # Note: requests are recorded for the whole script (login and setup included), so they are reported with the script instead of each command
+    results = [summarize("awsS3Shell script", script_runs, file_count)]
+    results.extend(summarize(f"awsS3Shell {name}", runs, file_count) for name, runs in command_runs.items())
+    return results
+
+# Deletes the table from the stand-in if it exists, waiting until it is gone
+def delete_table(dynamodb_client, table_name):
+    if table_name not in dynamodb_client.list_tables()['TableNames']:
+        return
+    dynamodb_client.delete_table(TableName=table_name)
+    dynamodb_client.get_waiter('table_not_exists').wait(TableName=table_name)
+
+# Runs a script (from the work dir, so it finds the datasets) and returns {seconds, ok, requests, stdout} for the run
+# Note: the script saves its own request stats (awsStats.py) into a temporary AWS_STATS_JSON file, which become the run's requests ({operation: stats})
+def run_script(script_dir, work_dir, script, args):
+    log_fd, log_filename = tempfile.mkstemp(suffix=".json", dir=work_dir)
+    os.close(log_fd)
+    env = dict(os.environ)
+    env[awsStats.STATS_JSON_ENV] = log_filename
+
+    start_time = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.join(script_dir, script)] + args,
+        cwd=work_dir,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    seconds = time.perf_counter() - start_time
+
+    try:
+        with open(log_filename, "r") as log_file:
+            requests = json.load(log_file)['operations']
+    except ValueError:
+        requests = {}
+    os.remove(log_filename)
+
+    if process.returncode != 0:
+        print(f"Error: '{script} {' '.join(args)}' exited with {process.returncode}: {process.stderr.strip()[-200:]}")
+    return {'seconds': seconds, 'ok': process.returncode == 0, 'requests': requests, 'stdout': process.stdout}
+
+# ========== RESULTS ==========
+# Summarizes the runs of a benchmark: median/percentile seconds, throughput (items per second), and requests per run by operation
+def summarize(name, runs, item_count):
+    seconds = [run['seconds'] for run in runs]
+    median_seconds = percentile(seconds, 50)
+
+    # Add up every run's requests per operation, and their latency histograms
+    request_counts = {}
+    latency_buckets = [0] * (len(awsStats.LATENCY_BUCKETS_MS) + 1)
+    for run in runs:
+        for operation, stats in run['requests'].items():
+            request_counts[operation] = request_counts.get(operation, 0) + stats['calls']
+            latency_buckets = [a + b for a, b in zip(latency_buckets, stats['latency_buckets'])]
+
+    return {
+        'name': name,
+        'runs': len(runs),
+        'failed_runs': sum(1 for run in runs if not run['ok']),
+        'items': item_count,
+        'throughput': item_count / median_seconds if median_seconds > 0 else 0,
+        'seconds': {f"p{p}": percentile(seconds, p) for p in PERCENTILES},
+        'requests_per_run': {operation: count / len(runs) for operation, count in sorted(request_counts.items())},
+        'request_latency_ms': {f"p{p}": awsStats.histogram_percentile(latency_buckets, p) for p in PERCENTILES}
+    }
+
+# Returns the p-th percentile (nearest rank) of the values, or 0 if there are none
+def percentile(values, p):
+    if len(values) == 0:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+# Displays a table of the results, followed by the requests per run of each benchmark
+def print_results(results):
+    print()
+    print(RESULT_FORMAT.format("Benchmark", "Runs", "Items", "Items/s", "p50 s", "p90 s", "p99 s", "Req/run", "Req p99 ms"))
+    for result in results:
+        name = result['name'] + (f" ({result['failed_runs']} failed)" if result['failed_runs'] > 0 else "")
+        print(RESULT_FORMAT.format(
+            name, result['runs'], result['items'], f"{result['throughput']:.1f}",
+            f"{result['seconds']['p50']:.3f}", f"{result['seconds']['p90']:.3f}", f"{result['seconds']['p99']:.3f}",
+            f"{sum(result['requests_per_run'].values()):.0f}", format_latency(result['request_latency_ms']['p99'])
+        ))
+
+    print("\nRequests per run:")
+    for result in results:
+        if len(result['requests_per_run']) > 0:
+            counts = ", ".join(f"{operation} {count:g}" for operation, count in result['requests_per_run'].items())
+            print(f"  {result['name']}: {counts}")
+    print()
+
+# Formats a histogram latency percentile (the upper bound of its bucket, None if slower than the last bound)
+def format_latency(latency_ms):
+    if latency_ms == 0:
+        return "-"
+    return f"<={latency_ms}" if latency_ms is not None else f">{awsStats.LATENCY_BUCKETS_MS[-1]}"
+
+# Compares the median times to a saved results file, displays every regression, returns true if there are none
+def compare_to_baseline(results, baseline_filename):
+    with open(baseline_filename, "r") as baseline_file:
+        baseline = {result['name']: result for result in json.load(baseline_file)['results']}
+
+    ok_flag = True
+    for result in results:
+        # Only compare benchmarks where every run succeeded, both now and in the baseline
+        if result['name'] not in baseline or result['failed_runs'] > 0 or baseline[result['name']]['failed_runs'] > 0:
+            continue
+        baseline_seconds = baseline[result['name']]['seconds']['p50']
+        slower_seconds = result['seconds']['p50'] - baseline_seconds
+        if slower_seconds > REGRESSION_MIN_SECONDS and slower_seconds > baseline_seconds * REGRESSION_TOLERANCE:
+            ok_flag = False
+            print(f"Error: '{result['name']}' regressed - median {result['seconds']['p50']:.3f}s vs baseline {baseline_seconds:.3f}s.")
+    return ok_flag
+
+###################################################################################################
+
+main()
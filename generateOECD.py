@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Synthetic OECD dataset generator (for load and query benchmarks at scale)
+
+@note :
+    Description: Generates region CSVs in the same format as the bundled ones (commodity, variable, year, units, mfactor, value - no header),
+        with any number of rows per region and any number of regions, that are statistically similar to the bundled data:
+        - every series (commodity + variable) is modelled on a real series that canada.csv, usa.csv, and mexico.csv all have,
+            so the commodity/variable codes (checked against encodings.csv), their pairings, and the units/mfactor distribution match
+        - one row per year in the year range (default 2010 to 2029, like queryOECD.py expects), values follow the real series' trend,
+            scaled by a random factor per series and region, with a little noise per year (zeros stay zero)
+        - once every real series is used, they repeat with a numbered commodity code (eg. WT1, WT2), so row counts are unlimited
+            --> the output gets its own encodings.csv (the bundled codes, plus each numbered code labelled like 'Wheat (1)'),
+                so loadEncodingsTable.py and queryOECD.py (run from the output dir) accept the numbered codes too
+        - member regions are CAN, USA, MEX, then more countries from encodings.csv ('--regions <n>'), each written to its own CSV
+        - northamerica.csv is written if CAN, USA, and MEX all are (ie. 3 or more regions), consistent with its members like the real data:
+            --> quantities (eg. TONNE, HA, LT) are exactly CAN+USA, or CAN+USA+MEX for a '--mex-share' fraction of the series (default 0, as in the real data)
+            --> ratios (eg. TONNE_HA, KG_HAB) are averages, so queryOECD.py finds 'Neither' for them, and prices in national currency are left out
+
+        NOTE: output is streamed (rows are never all held in memory), to a local dir or to 's3://<bucket>/<prefix>' (multipart upload, using awsStreams.py)
+        NOTE: '--seed <n>' makes the output reproducible
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import awsClients
+import awsStreams
+import csv
+import os
+import random
+import sys
+from decimal import *
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = "Usage: py generateOECD.py --rows <rows-per-region> --out <dir|s3://bucket/prefix> [--regions <n>] [--years <first>-<last>] [--mex-share <0-1>] [--seed <n>]"
+
+# SOURCE CONSTANTS
+ENCODINGS_CSV = "encodings.csv"
+MEMBER_CSV_NAMES = {"CAN": "canada.csv", "USA": "usa.csv", "MEX": "mexico.csv"}
+AGGREGATE_CSV_NAME = "northamerica.csv"
+AGGREGATE_MEMBERS = ["CAN", "USA"] #plus MEX for the '--mex-share' fraction of the series
+ADDITIVE_UNITS = ["TONNE", "HA", "LT", "NBR", "NONE"]
+EXCLUDED_AGGREGATE_UNIT_PREFIX = "NATCUR" #national currencies cannot be added up
+
+# GENERATION CONSTANTS
+DEFAULT_REGIONS = 3
+DEFAULT_YEARS = (2010, 2029)
+DEFAULT_MEX_SHARE = 0.0
+SERIES_SCALE_SIGMA = 0.5 #log-normal spread of the scale factor of each generated series (per region)
+YEAR_NOISE = 0.02 #relative noise added to each year's value
+VALUE_PRECISION = Decimal("0.001") #same as the bundled data
+
+# OUTPUT CONSTANTS
+S3_POOL_CONNECTIONS = 1 #parts are uploaded one at a time, as they are generated
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Validates arguments, models the series on the bundled CSVs, then streams every region CSV to the output
+def main():
+    options = parse_args(sys.argv[1:])
+    if options is None:
+        sys.exit(USAGE_STATEMENT)
+    rng = random.Random(options['seed'])
+
+    # Load the real series and the region codes to model the generated data on
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    encodings = read_encodings(os.path.join(script_dir, ENCODINGS_CSV))
+    profiles = read_series_profiles(script_dir, encodings)
+    regions = choose_regions(encodings, options['regions'])
+    years = range(options['years'][0], options['years'][1] + 1)
+    series_count = -(-options['rows'] // len(years))
+
+    print(f"--Generating {series_count * len(years)} rows for each of {len(regions)} regions, modelled on {len(profiles)} real series...")
+    writers = {region: open_output(options['out'], region_csv_name(region)) for region in regions}
+    if all(member in regions for member in MEMBER_CSV_NAMES):
+        writers[None] = open_output(options['out'], AGGREGATE_CSV_NAME)
+    csv_writers = {region: csv.writer(writer, delimiter=',', quoting=csv.QUOTE_NONNUMERIC) for region, writer in writers.items()}
+    try:
+        for series_num in range(series_count):
+            rows = generate_series(rng, profiles, series_num, regions, years, options['mex_share'])
+            for region, region_rows in rows.items():
+                if region in csv_writers:
+                    csv_writers[region].writerows(region_rows)
+    except BaseException:
+        # Abort the S3 uploads, so no truncated CSVs are published (local CSVs are just closed)
+        for writer in writers.values():
+            abort_output(writer)
+        raise
+    for writer in writers.values():
+        writer.close()
+
+    # Write the encodings of the output (the bundled ones, plus every numbered commodity code used)
+    with open_output(options['out'], ENCODINGS_CSV) as encodings_file:
+        write_encodings(encodings_file, os.path.join(script_dir, ENCODINGS_CSV), build_copy_encodings(encodings, profiles, series_count))
+    print(f"...Generated {len(writers)} CSVs and their {ENCODINGS_CSV} in '{options['out']}'--")
+
+############################################ FUNCTIONS ############################################
+
+# Parses the command line args into a dict of options, returns None (after displaying why) if they are invalid
+def parse_args(argv):
+    options = {
+        'rows': None,
+        'out': None,
+        'regions': DEFAULT_REGIONS,
+        'years': DEFAULT_YEARS,
+        'mex_share': DEFAULT_MEX_SHARE,
+        'seed': None
+    }
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg not in ["--rows", "--out", "--regions", "--years", "--mex-share", "--seed"]:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{arg}'.")
+            return None
+        value = argv[i + 1]
+        i += 2
+
+        try:
+            if arg == "--out":
+                options['out'] = value
+            elif arg == "--years":
+                first_year, last_year = (int(year) for year in value.split("-"))
+                if first_year > last_year:
+                    raise ValueError
+                options['years'] = (first_year, last_year)
+            elif arg == "--mex-share":
+                options['mex_share'] = float(value)
+                if options['mex_share'] < 0 or options['mex_share'] > 1:
+                    raise ValueError
+            else:
+                options[arg[2:]] = int(value)
+                if options[arg[2:]] < (0 if arg == "--seed" else 1):
+                    raise ValueError
+        except ValueError:
+            print(f"Error: Invalid value '{value}' for '{arg}'.")
+            return None
+
+    if options['rows'] is None or options['out'] is None:
+        print("Error: Missing '--rows' or '--out'.")
+        return None
+    return options
+
+# ========== MODEL ==========
+# Reads the encodings CSV into {field: {code: label}}
+def read_encodings(encodings_filename):
+    encodings = {}
+    with open(encodings_filename, "r", newline='') as csv_file:
+        for row in csv.reader(csv_file, delimiter=','):
+            encodings.setdefault(row[2], {})[row[0]] = row[1]
+    return encodings
+
+# Reads the real series every member CSV has, returns a list of profiles:
+#   {commodity, variable, units, mfactor, values: {region code: [Decimal value per year, in file order]}}
+# Note: only keeps series whose commodity/variable codes are in the encodings
+def read_series_profiles(script_dir, encodings):
+    region_series = {}
+    for region, csv_name in MEMBER_CSV_NAMES.items():
+        series = {}
+        with open(os.path.join(script_dir, csv_name), "r", newline='') as csv_file:
+            for row in csv.reader(csv_file, delimiter=','):
+                series.setdefault((row[0], row[1]), []).append(row)
+        region_series[region] = series
+
+    profiles = []
+    canada_series = region_series["CAN"]
+    for key, rows in canada_series.items():
+        if not all(key in series for series in region_series.values()):
+            continue
+        if key[0] not in encodings["commodity"] or key[1] not in encodings["variable"]:
+            continue
+        profiles.append({
+            'commodity': key[0],
+            'variable': key[1],
+            'units': rows[0][3],
+            'mfactor': int(rows[0][4]),
+            'values': {region: [Decimal(row[5]) for row in series[key]] for region, series in region_series.items()}
+        })
+    return profiles
+
+# Chooses the member region codes: CAN, USA, MEX, then other countries from the encodings (not aggregates like 'ASIA'), numbered once they run out
+def choose_regions(encodings, region_count):
+    countries = list(MEMBER_CSV_NAMES.keys())
+    countries += sorted(code for code, label in encodings["region"].items() if code not in countries and not label.isupper())
+    regions = countries[:region_count]
+    copy_num = 1
+    while len(regions) < region_count:
+        regions.extend(f"{code}{copy_num}" for code in countries[:region_count - len(regions)])
+        copy_num += 1
+    return regions
+
+# Returns the CSV file name of a member region (bundled names for CAN, USA, MEX, otherwise the lowercase code)
+def region_csv_name(region):
+    return MEMBER_CSV_NAMES.get(region, f"{region.lower()}.csv")
+
+# Returns the commodity code of a series (numbered after the real one's code for every copy after the first, eg. WT1)
+def series_commodity(profile, copy_num):
+    return profile['commodity'] + (str(copy_num) if copy_num > 0 else "")
+
+# Returns the encodings rows [code, label, 'commodity'] of the numbered commodity codes the series use (labelled after the real ones, eg. 'Wheat (1)')
+def build_copy_encodings(encodings, profiles, series_count):
+    copy_encodings = {}
+    for series_num in range(len(profiles), series_count):
+        profile = profiles[series_num % len(profiles)]
+        copy_num = series_num // len(profiles)
+        commodity = series_commodity(profile, copy_num)
+        copy_encodings[commodity] = [commodity, f"{encodings['commodity'][profile['commodity']]} ({copy_num})", "commodity"]
+    return list(copy_encodings.values())
+
+# Generates the rows of one series for every region, returns {region code (None for North America, if it has this series): [rows]}
+def generate_series(rng, profiles, series_num, regions, years, mex_share):
+    profile = profiles[series_num % len(profiles)]
+    copy_num = series_num // len(profiles)
+    commodity = series_commodity(profile, copy_num)
+
+    # Each region follows a real region's trend (its own if it has one), scaled by its own factor
+    region_values = {}
+    for region in regions:
+        source_values = profile['values'].get(region) or profile['values'][rng.choice(list(MEMBER_CSV_NAMES.keys()))]
+        scale = 1.0 if copy_num == 0 and region in MEMBER_CSV_NAMES else rng.lognormvariate(0, SERIES_SCALE_SIGMA)
+        region_values[region] = [
+            generate_value(rng, source_values[i % len(source_values)], scale)
+            for i in range(len(years))
+        ]
+
+    rows = {region: build_rows(commodity, profile, years, values) for region, values in region_values.items()}
+
+    # North America: sum (or average) of its members, leaving out what cannot be aggregated
+    if not profile['units'].startswith(EXCLUDED_AGGREGATE_UNIT_PREFIX) and all(member in region_values for member in MEMBER_CSV_NAMES):
+        members = AGGREGATE_MEMBERS + (["MEX"] if rng.random() < mex_share else [])
+        member_values = [region_values[member] for member in members]
+        if profile['units'] in ADDITIVE_UNITS:
+            aggregate_values = [sum(values) for values in zip(*member_values)]
+        else:
+            aggregate_values = [(sum(values) / len(values)).quantize(VALUE_PRECISION) for values in zip(*member_values)]
+        rows[None] = build_rows(commodity, profile, years, aggregate_values)
+    return rows
+
+# Returns the source value scaled (with a little noise), rounded like the bundled data
+def generate_value(rng, source_value, scale):
+    if source_value == 0:
+        return source_value
+    noise = 1 + rng.uniform(-YEAR_NOISE, YEAR_NOISE)
+    return Decimal(float(source_value) * scale * noise).quantize(VALUE_PRECISION)
+
+# Builds the CSV rows of a series (one per year)
+def build_rows(commodity, profile, years, values):
+    return [[commodity, profile['variable'], str(year), profile['units'], str(profile['mfactor']), value] for year, value in zip(years, values)]
+
+# ========== OUTPUT ==========
+# Opens a text stream for the named CSV in the output dir, or in S3 if the output is 's3://<bucket>/<prefix>' (see awsStreams.py)
+def open_output(out, csv_name):
+    if awsStreams.is_s3_path(out):
+        bucket, prefix = awsStreams.parse_s3_path(out)
+        s3_client = awsClients.get_client("s3", max_pool_connections=S3_POOL_CONNECTIONS)
+        return awsStreams.S3TextWriter(awsStreams.S3UploadStream(s3_client, bucket, awsStreams.join_s3_key(prefix, csv_name)), newline='')
+    os.makedirs(out, exist_ok=True)
+    return open(os.path.join(out, csv_name), "w", newline='')
+
+# Writes the bundled encodings (as they are), then the extra encodings rows, in the bundled format (every field quoted)
+def write_encodings(encodings_file, encodings_filename, extra_rows):
+    writer = csv.writer(encodings_file, delimiter=',', quoting=csv.QUOTE_ALL, lineterminator="\n")
+    with open(encodings_filename, "r", newline='') as csv_file:
+        writer.writerows(csv.reader(csv_file, delimiter=','))
+    writer.writerows(extra_rows)
+
+# Closes an output stream without publishing it if it is an S3 upload (see awsStreams.py)
+def abort_output(writer):
+    if isinstance(writer, awsStreams.S3TextWriter):
+        writer.abort()
+    else:
+        writer.close()
+
+###################################################################################################
+
+main()
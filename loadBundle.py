@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Precompiled load bundles (load the same region CSV into several environments without redoing the CSV work)
+
+@note :
+    Description: Compiles a region CSV into a load bundle once, then replays the bundle into a new table as many times as needed:
+        - compile: reads the CSV into items of either layout of loadTable.py ('--layout <rows|packed>', default rows, see oecdItems.py),
+            as the low-level client's AttributeValues (eg. {"year": {"N": "2010"}}, exactly what loadTable.py writes), and groups them into batch_write_item payloads
+        - replay: creates the table with the bundle's key schema, then sends the payloads as they are with concurrent writers ('--writers <n>', default 8)
+        --> a bundle is one gzipped file (local or 's3://<bucket>/<key>') of JSON lines:
+            - the first line is the header - version, source CSV, layout, key schema, attribute definitions, and #of items/batches/bytes/write units
+            - every other line is one payload: the put requests of up to 25 items (DynamoDB's limit per batch_write_item call)
+        --> replay does no CSV parsing or Decimal conversion, and does not parse or serialize the payloads either:
+            each payload line is sent as the batch_write_item request body as it is (see awsBatch.write_stored_batch()),
+            so botocore only builds a placeholder request around it (and parses the small responses), retrying unprocessed items the usual way
+
+        NOTE: replay takes the same '--capacity-mode <on-demand|provisioned>' and '--target-seconds <n>' flags as the loaders (see awsCapacity.py),
+            the write boost is sized from the header's exact write units (counted from each item's attribute names and values as it is compiled)
+        NOTE: compile reads the CSV twice (once to count for the header, once to write), so the header can come first and replay can plan capacity before reading on
+        NOTE: replay checks it sent as many items/batches as the header lists (a truncated bundle is an error, after what it held is written)
+        NOTE: compile exits with error if the bundle already exists, and replay if the table already exists (never overwrites either)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import awsBatch
+import awsCapacity
+import awsClients
+import awsStats
+import awsStreams
+import concurrent.futures
+import gzip
+import io
+import json
+import oecdItems
+import os
+import sys
+import time
+
+############################################ CONSTANTS ############################################
+
+USAGE_STATEMENT = (
+    "Usage: py loadBundle.py compile <file-name.csv> <bundle.jsonl.gz|s3://bucket/key> [--layout <rows|packed>] [--stats] [--stats-json <file>]\n"
+    f"       py loadBundle.py replay <bundle.jsonl.gz|s3://bucket/key> <table-name> [--writers <n>] {awsCapacity.CAPACITY_USAGE} [--stats] [--stats-json <file>]"
+)
+COMPILE_CMD = "compile"
+REPLAY_CMD = "replay"
+
+# BUNDLE CONSTANTS
+BUNDLE_FORMAT_VERSION = 1
+GZIP_LEVEL = 6 #default zlib level, compiling is done once so good compression is worth it
+PUT_REQUEST_TEXT = '{"PutRequest":' #starts every put request in a payload line (compact JSON, see format_line())
+
+# CONCURRENCY CONSTANTS
+DEFAULT_WRITERS = 8
+PENDING_BATCHES_PER_WRITER = 2 #payloads read ahead of the writers, so they never wait on the bundle (without reading it all into memory)
+
+############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
+
+# MAIN - Declares global vars and state here, then compiles the CSV or replays the bundle after validating arguments and checking for errors
+def main():
+    #globals
+    global dynamodb_client
+    global s3_client
+
+    # Remove the optional '--stats'/'--stats-json <file>' and capacity flags before checking the other args (see awsStats.py and awsCapacity.py)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(USAGE_STATEMENT)
+    capacity_args = awsCapacity.setup(argv)
+    if capacity_args is None:
+        sys.exit(USAGE_STATEMENT)
+    argv, capacity_options = capacity_args
+
+    options = parse_args(argv[1:])
+    if options is None:
+        sys.exit(USAGE_STATEMENT)
+
+    # ========== AWS CLIENTS ==========
+    # Note: compiling only needs S3 (for 's3://' bundles), replaying needs one pooled connection per writer (see awsClients.py)
+    s3_client = awsClients.get_client("s3") if awsStreams.is_s3_path(options['bundle']) else None
+    if options['cmd'] == COMPILE_CMD:
+        compile_bundle(options['csv'], options['bundle'], options['layout'])
+        return
+
+    dynamodb_client = awsClients.get_client("dynamodb", max_pool_connections=options['writers'])
+
+    # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works)
+    try:
+        dynamodb_client.list_tables()
+    except Exception as e:
+        print("Error: Invalid or expired credentials (or insufficient permissions to call 'list_tables()')")
+        sys.exit(f"[ERROR] {e}")
+
+    replay_bundle(options['bundle'], options['table'], options['writers'], capacity_options)
+
+############################################ FUNCTIONS ############################################
+
+# Parses the command line args (without the script name) into a dict of options, returns None (after displaying why) if they are invalid
+def parse_args(argv):
+    if len(argv) < 3 or argv[0] not in [COMPILE_CMD, REPLAY_CMD]:
+        print(f"Error: Missing or invalid command - must be '{COMPILE_CMD} <file-name.csv> <bundle>' or '{REPLAY_CMD} <bundle> <table-name>'.")
+        return None
+
+    options = {
+        'cmd': argv[0],
+        'csv': argv[1] if argv[0] == COMPILE_CMD else None,
+        'bundle': argv[2] if argv[0] == COMPILE_CMD else argv[1],
+        'table': argv[2] if argv[0] == REPLAY_CMD else None,
+        'layout': oecdItems.ROWS_LAYOUT,
+        'writers': DEFAULT_WRITERS
+    }
+    flag = {COMPILE_CMD: "--layout", REPLAY_CMD: "--writers"}[options['cmd']]
+    i = 3
+    while i < len(argv):
+        arg = argv[i]
+        if arg != flag:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{arg}'.")
+            return None
+        value = argv[i + 1]
+        if arg == "--layout":
+            if value not in oecdItems.LAYOUT_LIST:
+                print(f"Error: Invalid layout '{value}' - must be one of: {', '.join(oecdItems.LAYOUT_LIST)}.")
+                return None
+            options['layout'] = value
+        elif not value.isdigit() or int(value) < 1:
+            print(f"Error: Invalid value '{value}' for '{arg}' - must be a whole number greater than 0.")
+            return None
+        else:
+            options['writers'] = int(value)
+        i += 2
+
+    if options['cmd'] == COMPILE_CMD and not os.path.isfile(options['csv']):
+        print(f"Error: Invalid CSV file name '{options['csv']}' - file does not exist.")
+        return None
+    if awsStreams.is_s3_path(options['bundle']):
+        bucket, key = awsStreams.parse_s3_path(options['bundle'])
+        if bucket == "" or key == "":
+            print(f"Error: Invalid bundle '{options['bundle']}' - must be 's3://<bucket>/<key>'.")
+            return None
+    return options
+
+# ========== COMPILE ==========
+# Compiles the CSV into the bundle: counts its items and payloads for the header first, then writes the header and every payload
+def compile_bundle(csv_filename, path, layout):
+    try:
+        if bundle_exists(path):
+            sys.exit(f"ERROR: Terminating program because bundle '{path}' already exists (will not overwrite it).")
+    except Exception as e:
+        print(f"Error: Invalid bundle '{path}' - unable to check it (eg. bucket does not exist).")
+        sys.exit(f"[ERROR] {e}")
+
+    print(f"--Compiling '{csv_filename}' ({layout} layout)... please wait...")
+    start_time = time.time()
+    header = {
+        'version': BUNDLE_FORMAT_VERSION,
+        'source': os.path.basename(csv_filename),
+        'layout': layout,
+        'key_schema': oecdItems.KEY_SCHEMAS[layout],
+        'attribute_definitions': oecdItems.ATTRIBUTE_DEFINITIONS[layout],
+        'items': 0,
+        'batches': 0,
+        'bytes': 0,
+        'units': 0
+    }
+    try:
+        for batch in read_batches(csv_filename, layout):
+            header['items'] += len(batch)
+            header['batches'] += 1
+            header['bytes'] += len(format_line(batch))
+            header['units'] += sum(awsCapacity.item_write_units(request['PutRequest']['Item']) for request in batch)
+
+        with open_bundle(path, "w") as bundle_file:
+            bundle_file.write(format_line(header))
+            for batch in read_batches(csv_filename, layout):
+                bundle_file.write(format_line(batch))
+    except Exception as e:
+        # Remove a partly written local bundle (it did not exist before), so it can be compiled again (a partly written S3 one was aborted on leaving the 'with' block)
+        if not awsStreams.is_s3_path(path) and os.path.isfile(path):
+            os.remove(path)
+        sys.exit(f"[ERROR] While compiling bundle: {e}")
+
+    elapsed_time = time.time() - start_time
+    print(f"...finished compiling {header['items']} items ({header['batches']} batches) in {elapsed_time} seconds--")
+
+# Yields the CSV's items (for the layout) as payloads, ie. lists of up to 25 put requests of AttributeValue items
+def read_batches(csv_filename, layout):
+    batch = []
+    for item in oecdItems.read_attribute_items(csv_filename, layout):
+        batch.append({'PutRequest': {'Item': item}})
+        if len(batch) == awsBatch.BATCH_WRITE_SIZE:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+# Returns a bundle line (compact JSON)
+def format_line(value):
+    return json.dumps(value, separators=(',', ':')) + "\n"
+
+# ========== REPLAY ==========
+# Replays the bundle into a new table (the bundle's key schema), sending its payloads with concurrent writers
+def replay_bundle(path, table_name, writers, capacity_options):
+    try:
+        bundle_file = open_bundle(path, "r")
+        header = json.loads(bundle_file.readline())
+    except Exception as e:
+        print(f"Error: Invalid bundle '{path}' - missing or unreadable (or not a bundle).")
+        sys.exit(f"[ERROR] {e}")
+    if header.get('version') != BUNDLE_FORMAT_VERSION:
+        sys.exit(f"ERROR: Terminating program because bundle '{path}' has unsupported format version '{header.get('version')}'.")
+
+    with bundle_file:
+        # Check if table already exists before attempting to create a new one, display err msg and exit if it does
+        if table_name in list_all_tables():
+            print(f"Error: Invalid table name '{table_name}' - table already exists.")
+            sys.exit("ERROR: Terminating program because unable to create table with same name as an already existing table.")
+
+        # Create the table with the bundle's keys, and capacity planned from the bundle's exact write units (each payload is sent by one writer)
+        capacity_plan = awsCapacity.plan_item_capacity(capacity_options, header['items'], header['units'], min(writers, header['batches']))
+        print(f"--Creating table '{table_name}' from bundle of '{header['source']}' ({header['layout']} layout, {capacity_plan['description']})... please wait...")
+        try:
+            dynamodb_client.create_table(
+                TableName=table_name,
+                KeySchema=header['key_schema'],
+                AttributeDefinitions=header['attribute_definitions'],
+                **capacity_plan['create_args']
+            )
+            dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+        except Exception as e:
+            sys.exit(f"[ERROR] While creating table: {e}")
+        print("...Table created successfully--")
+
+        # Send every payload, up to #of writers at once
+        # Note: the write boost is dialed back down whether or not the replay succeeds
+        print(f"--Replaying {header['items']} items ({header['batches']} batches, {writers} writers)... please wait...")
+        start_time = time.time()
+        try:
+            item_count, batch_count = send_batches(bundle_file, table_name, writers)
+            if item_count != header['items'] or batch_count != header['batches']:
+                raise ValueError(f"replayed {item_count} items ({batch_count} batches), but the header lists {header['items']} ({header['batches']} batches)")
+        except Exception as e:
+            awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan)
+            sys.exit(f"[ERROR] While replaying bundle to table: {e}")
+    elapsed_time = time.time() - start_time
+    print(f"...finished replaying {item_count} items in {elapsed_time} seconds--")
+
+    if capacity_plan['boosted']:
+        print(f"--Dialing write capacity back down to {awsCapacity.STEADY_WRITE_CAPACITY} WCU... please wait...")
+        if awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan):
+            print("...Write capacity dialed down--")
+
+# Sends each payload of the bundle (after its header) with concurrent writers, returns (#of items, #of batches) sent
+# Note: only a few payloads per writer are read ahead, and the first failed payload stops the replay
+def send_batches(bundle_file, table_name, writers):
+    item_count = 0
+    batch_count = 0
+    pending = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=writers) as executor:
+        for line in bundle_file:
+            if len(pending) >= writers * PENDING_BATCHES_PER_WRITER:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                item_count += sum(future.result() for future in done)
+            pending.add(executor.submit(send_batch, table_name, line))
+            batch_count += 1
+        item_count += sum(future.result() for future in concurrent.futures.as_completed(pending))
+    return item_count, batch_count
+
+# Sends one payload line as it is stored (see awsBatch.write_stored_batch()), returns #of items in it
+# Note: items are counted by their put requests in the compact JSON (a '{"PutRequest":' inside a string value would have its quotes escaped)
+def send_batch(table_name, line):
+    awsBatch.write_stored_batch(dynamodb_client, table_name, line)
+    return line.count(PUT_REQUEST_TEXT)
+
+# Returns the names of all tables (every page)
+def list_all_tables():
+    table_names = []
+    list_kwargs = {}
+    while True:
+        response = dynamodb_client.list_tables(**list_kwargs)
+        table_names.extend(response['TableNames'])
+        if 'LastEvaluatedTableName' not in response:
+            return table_names
+        list_kwargs['ExclusiveStartTableName'] = response['LastEvaluatedTableName']
+
+# ========== BUNDLE FILES ==========
+# Opens a gzipped text stream of the bundle (a local file, or an S3 object if the bundle is 's3://<bucket>/<key>')
+def open_bundle(path, mode):
+    if not awsStreams.is_s3_path(path):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL)
+
+    bucket, key = awsStreams.parse_s3_path(path)
+    if mode == "w":
+        return awsStreams.S3GzipWriter(awsStreams.S3UploadStream(s3_client, bucket, key), GZIP_LEVEL)
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=awsStreams.open_s3_read(s3_client, bucket, key), mode="rb"), encoding="utf-8")
+
+# Checks if the bundle exists, returns true if it does
+def bundle_exists(path):
+    if not awsStreams.is_s3_path(path):
+        return os.path.exists(path)
+    bucket, key = awsStreams.parse_s3_path(path)
+    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=key, MaxKeys=1)
+    return any(obj['Key'] == key for obj in response.get('Contents', []))
+
+###################################################################################################
+
+main()
@@ -16,24 +16,30 @@
             - of course, different structure to table (only has HASH partition key using 'code')
 
         NOTE: this file may not be used because I didn't know until it was too late to switch it...
+        NOTE: takes the same '--capacity-mode <on-demand|provisioned>' and '--target-seconds <n>' flags as loadTable.py (see awsCapacity.py)
+        NOTE: writes items like loadTable.py, with the low-level client's batch_write_item (see awsBatch.py), as AttributeValues built straight from the CSV fields
 '''
 
 ############################################# IMPORTS #############################################
 
 # IMPORTS - 'pip install <import-package>'
-import boto3
+import awsBatch
+import awsCapacity
+import awsClients
+import awsStats
 import csv
 import os
 import re
 import sys
 import time
-from decimal import *
 
 ############################################ CONSTANTS ############################################
 
-USAGE_STATEMENT = "Usage: py loadEncodingsTable.py"
+USAGE_STATEMENT = f"Usage: py loadEncodingsTable.py {awsCapacity.CAPACITY_USAGE} [--stats] [--stats-json <file>]"
 CSV_FILENAME = "encodings.csv"
 TABLE_NAME = "encodings"
+DYNAMODB_POOL_CONNECTIONS = 1 #items are written one batch at a time
+ITEM_ATTRIBUTE_NAMES = ['code', 'label', 'field']
 
 ############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
 
@@ -41,7 +47,16 @@ TABLE_NAME = "encodings"
 def main():
     #globals
     global dynamodb_client
-    global dynamodb_resource
+
+    # Remove the optional '--stats'/'--stats-json <file>' flags before checking the other args (see awsStats.py)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(USAGE_STATEMENT)
+    # Remove the optional '--capacity-mode <mode>'/'--target-seconds <n>' flags too (see awsCapacity.py)
+    capacity_args = awsCapacity.setup(argv)
+    if capacity_args is None:
+        sys.exit(USAGE_STATEMENT)
+    sys.argv, capacity_options = capacity_args
 
     # ========== ARGUMENTS ==========
 
@@ -72,8 +87,8 @@ def main():
         sys.exit(USAGE_STATEMENT)
 
     # ========== AWS DYNAMO DB ==========
-    dynamodb_client = boto3.client("dynamodb")
-    dynamodb_resource = boto3.resource("dynamodb")
+    # Note: only the low-level client (not the resource), since items are written as AttributeValues built straight from the CSV
+    dynamodb_client = awsClients.get_client("dynamodb", max_pool_connections=DYNAMODB_POOL_CONNECTIONS)
 
     # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works)
     try:
@@ -87,27 +102,35 @@ def main():
         print(f"Error: Invalid table name '{table_name}' - table already exists.")
         sys.exit("ERROR: Terminating program because unable to create table with same name as an already existing table.")
 
-    # Attempt to create the encodings table using given table name
-    print("--Creating table... please wait...")
+    # Attempt to create the encodings table using given table name, with capacity planned for loading the CSV
+    capacity_plan = awsCapacity.plan_capacity(capacity_options, csv_filename, ITEM_ATTRIBUTE_NAMES, writers=DYNAMODB_POOL_CONNECTIONS)
+    print(f"--Creating table ({capacity_plan['description']})... please wait...")
     try:
-        table = create_dynamodb_encodings_table(table_name)
+        create_dynamodb_encodings_table(table_name, capacity_plan)
     except Exception as e:
         sys.exit(f"[ERROR] While creating table: {e}")
     # Attempt to wait for the table to finish creating and reach a successful state
     try:
-        table.wait_until_exists()
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
     except Exception as e:
         sys.exit(f"[ERROR] While waiting for table to finish creating: {e}")
     print("...Table created successfully--")
     
     # Attempt to open the CSV file and read its contents, putting each row into the encodings table in batches of items
+    # Note: the write boost is dialed back down whether or not the load succeeds
     print("--Populating table... please wait...")
     try:
-        load_csv_into_encodings_table(csv_filename, table)
+        load_csv_into_encodings_table(csv_filename, table_name)
     except Exception as e:
+        awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan)
         sys.exit(f"[ERROR] While loading CSV contents to table: {e}")
     print ("...Table populated--")
 
+    if capacity_plan['boosted']:
+        print(f"--Dialing write capacity back down to {awsCapacity.STEADY_WRITE_CAPACITY} WCU... please wait...")
+        if awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan):
+            print("...Write capacity dialed down--")
+
 ############################################ FUNCTIONS ############################################
 
 # Checks CSV file name - returns true if valid, false otherwise, and prints info about why file name is invalid
@@ -138,12 +161,12 @@ def table_exists(table_name):
     tables = dynamodb_client.list_tables()['TableNames']
     return (table_name in tables)
 
-# Creates the encodings table using given table name, returns the result
+# Creates the encodings table using given table name and capacity plan (see awsCapacity.py), returns the result (table description)
 # Notice, HASH partition key = 'code' of encoding
 # Notice, no RANGE sort key
-# Notice, safeguard provisioning and billing
-def create_dynamodb_encodings_table(table_name):
-    table = dynamodb_resource.create_table(
+# Notice, billing mode and provisioning come from the capacity plan
+def create_dynamodb_encodings_table(table_name, capacity_plan):
+    response = dynamodb_client.create_table(
         TableName=table_name,
         KeySchema=[
             {
@@ -159,16 +182,13 @@ def create_dynamodb_encodings_table(table_name):
             }
             # no sort key
         ],
-        BillingMode='PROVISIONED',
-        ProvisionedThroughput={
-            'ReadCapacityUnits': 5,
-            'WriteCapacityUnits': 5
-        }
+        **capacity_plan['create_args']
     )
-    return table
+    return response['TableDescription']
 
 # Loads given CSV contents and puts each row contents into the created encodings table in batches of items
-def load_csv_into_encodings_table(csv_filename, table):
+# Note: each item is built as AttributeValues straight from the row (all strings), and written with batch_write_item
+def load_csv_into_encodings_table(csv_filename, table_name):
     # Also track time elapsed
     start_time = time.time()
 
@@ -177,20 +197,27 @@ def load_csv_into_encodings_table(csv_filename, table):
         csv_content = csv.reader(csv_file, delimiter=',')
         
         # Put each row from CSV file into the table as an item (in batches)
-        with table.batch_writer() as batch:
-            # Track row ID#
-            row_id = 0
-            for row in csv_content:
-                row_id += 1
-                print(f"-adding row item: {row_id} {row[0]} {row[1]} {row[2]}")
-                
-                batch.put_item(
-                    Item={
-                        'code': row[0],
-                        'label': row[1],
-                        'field': row[2]
+        # Track row ID#
+        row_id = 0
+        batch = []
+        for row in csv_content:
+            row_id += 1
+            print(f"-adding row item: {row_id} {row[0]} {row[1]} {row[2]}")
+
+            batch.append({
+                'PutRequest': {
+                    'Item': {
+                        'code': {'S': row[0]},
+                        'label': {'S': row[1]},
+                        'field': {'S': row[2]}
                     }
-                )
+                }
+            })
+            if len(batch) == awsBatch.BATCH_WRITE_SIZE:
+                awsBatch.write_batch(dynamodb_client, table_name, batch)
+                batch = []
+        if len(batch) > 0:
+            awsBatch.write_batch(dynamodb_client, table_name, batch)
 
         # # # NOTE: left for testing purposes (comment out above batch version if using this)
         # # Put each row from CSV file into the table as an item (one at a time)
@@ -200,11 +227,12 @@ def load_csv_into_encodings_table(csv_filename, table):
         #     row_id += 1
         #     print(f"-adding row item: {row_id} {row[0]} {row[1]} {int(row[2])}")
 
-        #     table.put_item(
+        #     dynamodb_client.put_item(
+        #         TableName=table_name,
         #         Item={
-        #             'code': row[0],
-        #             'label': row[1],
-        #             'field': row[2]
+        #             'code': {'S': row[0]},
+        #             'label': {'S': row[1]},
+        #             'field': {'S': row[2]}
         #         }
         #     )
     csv_file.close()
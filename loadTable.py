@@ -42,22 +42,39 @@
 
         NOTE: Exits with error message if table creation fails
         NOTE: Exits with error if waiting on table creating fails (or timeout)
+        NOTE: '--capacity-mode <on-demand|provisioned>' and '--target-seconds <n>' choose how the table is billed while loading (see awsCapacity.py),
+            by default it is provisioned with a temporary write boost (sized to load the CSV in ~60s, but no more than its one serial writer can use) that is dialed back down to 5 WCU after
+        NOTE: '--layout packed' stores each (commodity, variable) series as a single item instead of one item per CSV row:
+            - Partition (HASH) key = commodity, Sort (RANGE) key = variable
+            - 'units' and 'mfactor' once per series, and 'values' = map of year (string) -> value
+            --> ~20x fewer items (and write/read units), and a whole series is a single GetItem (queryOECD.py detects the layout from the key schema)
+            - exits with error if a series mixes units/mfactor or repeats a year (it could not be packed without losing data)
+        NOTE: items are written with the low-level client's batch_write_item (25 per call, retrying unprocessed items, see awsBatch.py),
+            as AttributeValues built straight from the CSV fields (see oecdItems.py) - numbers are sent as the CSV's own strings,
+            skipping the Decimal conversion and boto3's generic TypeSerializer (see benchmarkSerialize.py for how much faster that is)
+            - exits with error if a year/mfactor/value field is not a number
 '''
 
 ############################################# IMPORTS #############################################
 
 # IMPORTS - 'pip install <import-package>'
-import boto3
-import csv
+import awsBatch
+import awsCapacity
+import awsClients
+import awsStats
+import oecdItems
 import os
 import re
 import sys
 import time
-from decimal import *
 
 ############################################ CONSTANTS ############################################
 
-USAGE_STATEMENT = "Usage: py loadTable.py <file-name.csv> <table-name>"
+USAGE_STATEMENT = f"Usage: py loadTable.py <file-name.csv> <table-name> [--layout <rows|packed>] {awsCapacity.CAPACITY_USAGE} [--stats] [--stats-json <file>]"
+DYNAMODB_POOL_CONNECTIONS = 1 #items are written one batch at a time
+
+# LAYOUT CONSTANTS (layouts and their items are shared with loadBundle.py, see oecdItems.py)
+LAYOUT_FLAG = "--layout"
 
 ############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
 
@@ -65,10 +82,32 @@ USAGE_STATEMENT = "Usage: py loadTable.py <file-name.csv> <table-name>"
 def main():
     #globals
     global dynamodb_client
-    global dynamodb_resource
+
+    # Remove the optional '--stats'/'--stats-json <file>' flags before checking the other args (see awsStats.py)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(USAGE_STATEMENT)
+    # Remove the optional '--capacity-mode <mode>'/'--target-seconds <n>' flags too (see awsCapacity.py)
+    capacity_args = awsCapacity.setup(argv)
+    if capacity_args is None:
+        sys.exit(USAGE_STATEMENT)
+    sys.argv, capacity_options = capacity_args
 
     # ========== ARGUMENTS ==========
 
+    # Remove the optional '--layout <rows|packed>' flag before counting the other args
+    layout = oecdItems.ROWS_LAYOUT
+    if LAYOUT_FLAG in sys.argv:
+        i = sys.argv.index(LAYOUT_FLAG)
+        if i + 1 >= len(sys.argv):
+            print(f"Error: Missing value for '{LAYOUT_FLAG}'.")
+            sys.exit(USAGE_STATEMENT)
+        layout = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+        if layout not in oecdItems.LAYOUT_LIST:
+            print(f"Error: Invalid layout '{layout}' - must be one of: {', '.join(oecdItems.LAYOUT_LIST)}.")
+            sys.exit(USAGE_STATEMENT)
+
     # Collect command line arguments when executing this python script
     argc = len(sys.argv)
     bad_usage_flag = False
@@ -107,8 +146,8 @@ def main():
             sys.exit(USAGE_STATEMENT)
 
     # ========== AWS DYNAMO DB ==========
-    dynamodb_client = boto3.client("dynamodb")
-    dynamodb_resource = boto3.resource("dynamodb")
+    # Note: only the low-level client (not the resource), since items are written as AttributeValues built straight from the CSV (see oecdItems.py)
+    dynamodb_client = awsClients.get_client("dynamodb", max_pool_connections=DYNAMODB_POOL_CONNECTIONS)
 
     # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works)
     try:
@@ -122,27 +161,41 @@ def main():
         print(f"Error: Invalid table name '{table_name}' - table already exists.")
         sys.exit("ERROR: Terminating program because unable to create table with same name as an already existing table.")
 
-    # Attempt to create the table using given table name
-    print("--Creating table... please wait...")
+    # Attempt to create the table using given table name, with capacity planned for loading the CSV
+    capacity_plan = awsCapacity.plan_capacity(capacity_options, csv_filename, oecdItems.ITEM_ATTRIBUTE_NAMES[layout], oecdItems.ROWS_PER_ITEM[layout], DYNAMODB_POOL_CONNECTIONS)
+    print(f"--Creating table ({layout} layout, {capacity_plan['description']})... please wait...")
     try:
-        table = create_dynamodb_table(table_name)
+        if layout == oecdItems.PACKED_LAYOUT:
+            create_dynamodb_packed_table(table_name, capacity_plan)
+        else:
+            create_dynamodb_table(table_name, capacity_plan)
     except Exception as e:
         sys.exit(f"[ERROR] While creating table: {e}")
     # Attempt to wait for the table to finish creating and reach a successful state
     try:
-        table.wait_until_exists()
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
     except Exception as e:
         sys.exit(f"[ERROR] While waiting for table to finish creating: {e}")
     print("...Table created successfully--")
     
     # Attempt to open the CSV file and read its contents, putting each row into the table in batches of items
+    # Note: the write boost is dialed back down whether or not the load succeeds
     print("--Populating table... please wait...")
     try:
-        load_csv_into_table(csv_filename, table)
+        if layout == oecdItems.PACKED_LAYOUT:
+            load_csv_into_packed_table(csv_filename, table_name)
+        else:
+            load_csv_into_table(csv_filename, table_name)
     except Exception as e:
+        awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan)
         sys.exit(f"[ERROR] While loading CSV contents to table: {e}")
     print ("...Table populated--")
 
+    if capacity_plan['boosted']:
+        print(f"--Dialing write capacity back down to {awsCapacity.STEADY_WRITE_CAPACITY} WCU... please wait...")
+        if awsCapacity.dial_down(dynamodb_client, table_name, capacity_plan):
+            print("...Write capacity dialed down--")
+
 ############################################ FUNCTIONS ############################################
 
 # Checks CSV file name - returns true if valid, false otherwise, and prints info about why file name is invalid
@@ -173,12 +226,12 @@ def table_exists(table_name):
     tables = dynamodb_client.list_tables()['TableNames']
     return (table_name in tables)
 
-# Creates a table using given table name, returns the result
+# Creates a table using given table name and capacity plan (see awsCapacity.py), returns the result (table description)
 # Notice, HASH partition key = id (row ID of CSV) of number type
 # Notice, RANGE sort key = commodity of string type (to mimic CSV file sort order)
-# Notice, safeguard provisioning and billing
-def create_dynamodb_table(table_name):
-    table = dynamodb_resource.create_table(
+# Notice, billing mode and provisioning come from the capacity plan
+def create_dynamodb_table(table_name, capacity_plan):
+    response = dynamodb_client.create_table(
         TableName=table_name,
         KeySchema=[
             {
@@ -200,69 +253,89 @@ def create_dynamodb_table(table_name):
                 'AttributeType': 'S'    #String
             }
         ],
-        BillingMode='PROVISIONED',
-        ProvisionedThroughput={
-            'ReadCapacityUnits': 5,
-            'WriteCapacityUnits': 5
-        }
+        **capacity_plan['create_args']
+    )
+    return response['TableDescription']
+
+# Creates a table for the packed layout using given table name and capacity plan (see awsCapacity.py), returns the result (table description)
+# Notice, HASH partition key = commodity of string type
+# Notice, RANGE sort key = variable of string type (so a commodity's series are one query, and a single series is one GetItem)
+def create_dynamodb_packed_table(table_name, capacity_plan):
+    response = dynamodb_client.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'commodity',
+                'KeyType': 'HASH'   #Partition key
+            },
+            {
+                'AttributeName': 'variable',
+                'KeyType': 'RANGE'  #Sort key
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'commodity',
+                'AttributeType': 'S'    #String
+            },
+            {
+                'AttributeName': 'variable',
+                'AttributeType': 'S'    #String
+            }
+        ],
+        **capacity_plan['create_args']
     )
-    return table
+    return response['TableDescription']
 
 # Loads given CSV contents and puts each row contents into the created table in batches of items
-def load_csv_into_table(csv_filename, table):
+# Note: the CSV is read (and each row turned into AttributeValues, straight from its fields) by oecdItems.py, as it's written with batch_write_item
+def load_csv_into_table(csv_filename, table_name):
     # Also track time elapsed
     start_time = time.time()
 
-    # Open the CSV file and read its contents
-    with open(csv_filename, "r", newline='') as csv_file:
-        csv_content = csv.reader(csv_file, delimiter=',')
-        
-        # Put each row from CSV file into the table as an item (in batches)
-        with table.batch_writer() as batch:
-            # Track row ID#
-            row_id = 0
-            for row in csv_content:
-                row_id += 1
-                print(f"-adding row item: {row_id} {row[0]} {row[1]} {int(row[2])} {row[3]} {int(row[4])} {Decimal(row[5])}")
-                
-                batch.put_item(
-                    Item={
-                        'id': int(row_id),
-                        'commodity': row[0],
-                        'variable': row[1],
-                        'year': int(row[2]),
-                        'units': row[3],
-                        'mfactor': int(row[4]),
-                        'value': Decimal(row[5])
-                    }
-                )
-
-        # # # NOTE: left for testing purposes (comment out above batch version if using this)
-        # # Put each row from CSV file into the table as an item (one at a time)
-        # # Track row ID#
-        # row_id = 0
-        # for row in csv_content:
-        #     row_id += 1
-        #     print(f"-adding row item: {row_id} {row[0]} {row[1]} {int(row[2])} {row[3]} {int(row[4])} {Decimal(row[5])}")
-
-        #     table.put_item(
-        #         Item={
-        #             'id': int(row_id),
-        #             'commodity': row[0],
-        #             'variable': row[1],
-        #             'year': int(row[2]),
-        #             'units': row[3],
-        #             'mfactor': int(row[4]),
-        #             'value': Decimal(row[5])
-        #         }
-        #     )
-    csv_file.close()
+    # Put each row from CSV file into the table as an item (in batches)
+    row_id = 0
+    batch = []
+    for item in oecdItems.read_attribute_items(csv_filename, oecdItems.ROWS_LAYOUT):
+        row_id += 1
+        print(f"-adding row item: {row_id} {item['commodity']['S']} {item['variable']['S']} {item['year']['N']} {item['units']['S']} {item['mfactor']['N']} {item['value']['N']}")
+        batch.append({'PutRequest': {'Item': item}})
+        if len(batch) == awsBatch.BATCH_WRITE_SIZE:
+            awsBatch.write_batch(dynamodb_client, table_name, batch)
+            batch = []
+    if len(batch) > 0:
+        awsBatch.write_batch(dynamodb_client, table_name, batch)
+
+    # # # NOTE: left for testing purposes (comment out above batch version if using this)
+    # # Put each row from CSV file into the table as an item (one at a time)
+    # for item in oecdItems.read_attribute_items(csv_filename, oecdItems.ROWS_LAYOUT):
+    #     dynamodb_client.put_item(TableName=table_name, Item=item)
 
     # Display total number of items added and time elapsed
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"...finished adding {row_id} items in {elapsed_time} seconds...")
 
+# Loads given CSV contents into the created packed table, one item per (commodity, variable) series, in batches of items
+# Note: the CSV is grouped by series first (by oecdItems.py, which raises ValueError if a series can't be packed without losing data)
+def load_csv_into_packed_table(csv_filename, table_name):
+    # Also track time elapsed
+    start_time = time.time()
+    series_list, row_count = oecdItems.read_packed_attribute_items(csv_filename)
+
+    # Put each series into the table as an item (in batches)
+    for i in range(0, len(series_list), awsBatch.BATCH_WRITE_SIZE):
+        batch = []
+        for series in series_list[i:i + awsBatch.BATCH_WRITE_SIZE]:
+            print(f"-adding series item: {series['commodity']['S']} {series['variable']['S']} {series['units']['S']} {series['mfactor']['N']} ({len(series['values']['M'])} years)")
+            batch.append({'PutRequest': {'Item': series}})
+        awsBatch.write_batch(dynamodb_client, table_name, batch)
+
+    # Display total number of items added (and rows packed into them) and time elapsed
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"...finished adding {len(series_list)} items ({row_count} rows) in {elapsed_time} seconds...")
+
 ###################################################################################################
 
 main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Shared OECD table items ; used by loadTable.py, loadBundle.py, and benchmarkSerialize.py
+
+@note :
+    Description: Builds the table items of a region CSV (commodity, variable, year, units, mfactor, value rows), for either layout of loadTable.py:
+        - rows layout: one item per CSV row, with its row ID (from 1, in CSV order) as 'id'
+        - packed layout: one item per (commodity, variable) series, with 'units' and 'mfactor' once and 'values' = map of year (string) -> value
+        --> read_attribute_items() builds the low-level client's AttributeValues straight from the CSV fields (eg. {'year': {'N': '2010'}}),
+            for batch_write_item: strings as they are, and numbers as the CSV's own number strings (no int/Decimal round-trip, no TypeSerializer)
+        --> read_items() builds Python types instead (eg. {'year': 2010, 'value': Decimal('345.639')}), as the boto3 resource takes them,
+            and serialize_item() turns one into AttributeValues the generic way (boto3's TypeSerializer) - the slow path benchmarkSerialize.py compares against
+        --> KEY_SCHEMAS and ATTRIBUTE_DEFINITIONS are each layout's table keys (the same as loadTable.py creates)
+
+        NOTE: the number strings are checked first (NUMBER_PATTERN), so a bad field is still a ValueError naming its row (DynamoDB would reject the whole batch)
+            - the table gets the same numbers either way, since DynamoDB stores a number the same however it is written (eg. '2010' and '2010.0')
+        NOTE: packing raises ValueError if a series mixes units/mfactor or repeats a year (it could not be packed without losing data)
+        NOTE: boto3 is only imported when an item is first serialized the generic way, so importing this module stays cheap (see benchmarkStartup.py)
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import csv
+import re
+from decimal import *
+
+############################################ CONSTANTS ############################################
+
+ROWS_LAYOUT = "rows" #one item per CSV row
+PACKED_LAYOUT = "packed" #one item per (commodity, variable) series
+LAYOUT_LIST = [ROWS_LAYOUT, PACKED_LAYOUT]
+ITEM_ATTRIBUTE_NAMES = {
+    ROWS_LAYOUT: ['id', 'commodity', 'variable', 'year', 'units', 'mfactor', 'value'],
+    PACKED_LAYOUT: ['commodity', 'variable', 'units', 'mfactor', 'values']
+}
+ROWS_PER_ITEM = {
+    ROWS_LAYOUT: 1,
+    PACKED_LAYOUT: 20 #one row per year, 2010 to 2029 (inclusive)
+}
+KEY_SCHEMAS = {
+    ROWS_LAYOUT: [{'AttributeName': 'id', 'KeyType': 'HASH'}, {'AttributeName': 'commodity', 'KeyType': 'RANGE'}],
+    PACKED_LAYOUT: [{'AttributeName': 'commodity', 'KeyType': 'HASH'}, {'AttributeName': 'variable', 'KeyType': 'RANGE'}]
+}
+ATTRIBUTE_DEFINITIONS = {
+    ROWS_LAYOUT: [{'AttributeName': 'id', 'AttributeType': 'N'}, {'AttributeName': 'commodity', 'AttributeType': 'S'}],
+    PACKED_LAYOUT: [{'AttributeName': 'commodity', 'AttributeType': 'S'}, {'AttributeName': 'variable', 'AttributeType': 'S'}]
+}
+
+# Numbers DynamoDB takes as they are written (eg. '345.639', '-2', '1.5E3'), and whole numbers (year and mfactor)
+NUMBER_PATTERN = re.compile(r"-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+WHOLE_NUMBER_PATTERN = re.compile(r"-?[0-9]+")
+
+############################################ FUNCTIONS ############################################
+
+# ========== ATTRIBUTE VALUES (low-level client) ==========
+# Yields the items of the CSV for the layout as AttributeValues (rows layout items as they are read, packed layout items once the whole CSV is grouped)
+def read_attribute_items(csv_filename, layout):
+    with open(csv_filename, "r", newline='') as csv_file:
+        csv_content = csv.reader(csv_file, delimiter=',')
+        if layout == PACKED_LAYOUT:
+            yield from build_packed_attribute_items(csv_content)[0]
+        else:
+            # Track row ID#
+            row_id = 0
+            for row in csv_content:
+                row_id += 1
+                yield build_row_attribute_item(row_id, row)
+
+# Reads the CSV into packed layout items as AttributeValues, returns (list of items in order of each series' first row, #of rows)
+def read_packed_attribute_items(csv_filename):
+    with open(csv_filename, "r", newline='') as csv_file:
+        return build_packed_attribute_items(csv.reader(csv_file, delimiter=','))
+
+# Returns the rows layout item of a CSV row as AttributeValues, built straight from its fields
+def build_row_attribute_item(row_id, row):
+    check_numbers(row_id, row)
+    return {
+        'id': {'N': str(row_id)},
+        'commodity': {'S': row[0]},
+        'variable': {'S': row[1]},
+        'year': {'N': row[2]},
+        'units': {'S': row[3]},
+        'mfactor': {'N': row[4]},
+        'value': {'N': row[5]}
+    }
+
+# Groups the CSV rows into packed layout items as AttributeValues, returns (list of items in order of each series' first row, #of rows)
+def build_packed_attribute_items(rows):
+    series_list, row_count = group_series(rows, check_numbers)
+    items = [
+        {
+            'commodity': {'S': first_row[0]},
+            'variable': {'S': first_row[1]},
+            'units': {'S': first_row[3]},
+            'mfactor': {'N': first_row[4]},
+            'values': {'M': {year: {'N': value} for year, value in values.items()}}
+        }
+        for first_row, values in series_list
+    ]
+    return items, row_count
+
+# Checks the row's number fields are numbers DynamoDB takes as they are written, raises ValueError (naming the row) if not
+def check_numbers(row_num, row):
+    if WHOLE_NUMBER_PATTERN.fullmatch(row[2]) is None or WHOLE_NUMBER_PATTERN.fullmatch(row[4]) is None or NUMBER_PATTERN.fullmatch(row[5]) is None:
+        raise ValueError(f"row {row_num} - invalid number in year/mfactor/value ({row[2]} {row[4]} {row[5]})")
+
+# ========== PYTHON TYPES (boto3 resource) ==========
+# Yields the items of the CSV for the layout as Python types (rows layout items as they are read, packed layout items once the whole CSV is grouped)
+def read_items(csv_filename, layout):
+    with open(csv_filename, "r", newline='') as csv_file:
+        csv_content = csv.reader(csv_file, delimiter=',')
+        if layout == PACKED_LAYOUT:
+            yield from build_packed_items(csv_content)[0]
+        else:
+            # Track row ID#
+            row_id = 0
+            for row in csv_content:
+                row_id += 1
+                yield build_row_item(row_id, row)
+
+# Returns the rows layout item of a CSV row as Python types
+def build_row_item(row_id, row):
+    return {
+        'id': row_id,
+        'commodity': row[0],
+        'variable': row[1],
+        'year': int(row[2]),
+        'units': row[3],
+        'mfactor': int(row[4]),
+        'value': Decimal(row[5])
+    }
+
+# Groups the CSV rows into packed layout items as Python types, returns (list of items in order of each series' first row, #of rows)
+def build_packed_items(rows):
+    series_list, row_count = group_series(rows)
+    items = [
+        {
+            'commodity': first_row[0],
+            'variable': first_row[1],
+            'units': first_row[3],
+            'mfactor': int(first_row[4]),
+            'values': {year: Decimal(value) for year, value in values.items()}
+        }
+        for first_row, values in series_list
+    ]
+    return items, row_count
+
+# Returns the item in AttributeValues, exactly as the boto3 resource would send it
+def serialize_item(item):
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return {name: serializer.serialize(value) for name, value in item.items()}
+
+# ========== SERIES ==========
+# Groups the CSV rows by (commodity, variable) series, returns (list of (series' first row, {year string: value string}), #of rows)
+# Note: rows are grouped by series first, since a series' rows do not have to be next to each other in the CSV
+# Note: check_row(row_num, row) is called on each row first, if given
+def group_series(rows, check_row=None):
+    series_dict = {}
+    row_count = 0
+    for row in rows:
+        row_count += 1
+        if check_row is not None:
+            check_row(row_count, row)
+        key = (row[0], row[1])
+        if key not in series_dict:
+            series_dict[key] = (row, {})
+        first_row, values = series_dict[key]
+
+        # Check the row can be packed without losing data (mfactors are only converted to compare them if they are written differently)
+        if first_row[3] != row[3] or (first_row[4] != row[4] and int(first_row[4]) != int(row[4])):
+            raise ValueError(f"row {row_count} - series {row[0]} {row[1]} mixes units/mfactor ({first_row[3]} {int(first_row[4])} and {row[3]} {int(row[4])})")
+        year = str(int(row[2]))
+        if year in values:
+            raise ValueError(f"row {row_count} - series {row[0]} {row[1]} has more than one value for year {year}")
+        values[year] = row[5]
+    return list(series_dict.values()), row_count
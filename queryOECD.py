@@ -21,6 +21,20 @@
         NOTE: assume perfect user input for commodity and variables
             - however, if input commodity that's not a valid commodity code or label, exits program with error message
         NOTE: NA definition hit refers to if the calculated sum from different tables of CAN, USA, MEX are equal to that of NA (CAN+USA, CAN+USA+MEX, or Neither)
+        NOTE: reads tables of either layout from loadTable.py (detected from each table's key schema):
+            - rows layout (one item per year) is scanned for the commodity
+            - packed layout (one item per commodity + variable series, see loadTable.py '--layout packed') is queried for the commodity (its partition key)
+        NOTE: '--regions <file.json>' checks any aggregate regions instead of just North America (see DEFAULT_REGION_HIERARCHY for the format):
+            - each aggregate has its own table, member tables (any number), and candidate member sets (eg. CAN+USA) its values may be the sum of
+            - every table is read once for the commodity (all tables at once), then every aggregate is checked from that cached data
+            - items are decoded straight into a compact record store (see recordStore.py), and the report reads each series from it (never dicts of Decimals)
+            --> the default hierarchy is North America with CAN+USA and CAN+USA+MEX, giving the original report
+        NOTE: 'query' runs an ad-hoc query instead of the report, eg. 'query --region canada --commodity WT --variable IM --years 2015' (a single record),
+            or 'query --region canada --variable IM --years 2020-' (a group of records), see QUERY_USAGE:
+            - filters by region (table, default all 4), commodity and variable (code or label), and year range (first-last, either end may be left out)
+            - pushes filters down as a KeyConditionExpression where the table's key schema allows (eg. commodity + variable of a packed table),
+                otherwise scans with a FilterExpression (eg. the rows layout, whose partition key is the row ID)
+            - queries every table at once, streaming records as each page arrives, as a table, CSV, or JSON lines ('--format <table|csv|json>')
 '''
 
 '''
@@ -30,10 +44,17 @@
 ############################################# IMPORTS #############################################
 
 # IMPORTS - 'pip install <import-package>'
-import boto3
+import awsClients
+import awsStats
+import concurrent.futures
 import csv
+import json
+import os
+import queue
+import recordStore
 import sys
-from boto3.dynamodb.conditions import Key, Attr
+import threading
+import time
 
 ############################################ CONSTANTS ############################################
 
@@ -42,53 +63,104 @@ NORTH_AMERICA = "northamerica"
 CANADA = "canada"
 USA = "usa"
 MEXICO = "mexico"
-TABLE_LIST = [NORTH_AMERICA, CANADA, USA, MEXICO]
-YEAR_RANGE = range(2010, 2030)
+PACKED_KEY_SCHEMA = {'commodity', 'variable'} #key attributes of a packed layout table (see loadTable.py)
+MAX_CONCURRENT_TABLES = 16 #tables read at once (and pooled connections)
+
+# REGION HIERARCHY CONSTANTS
+# Aggregates to check, each with its table, member tables, and candidate member sets (by abbreviation, checked in order, then 'Neither')
+DEFAULT_REGION_HIERARCHY = [
+    {
+        'table': NORTH_AMERICA,
+        'label': "North America",
+        'abbreviation': "NA",
+        'members': [
+            {'table': CANADA, 'label': "Canada", 'abbreviation': "CAN"},
+            {'table': USA, 'label': "USA", 'abbreviation': "USA"},
+            {'table': MEXICO, 'label': "Mexico", 'abbreviation': "MEX"}
+        ],
+        'candidates': [["CAN", "USA"], ["CAN", "USA", "MEX"]]
+    }
+]
+REGIONS_FLAG = "--regions"
+NEITHER = "Neither"
+
+# QUERY CONSTANTS
+QUERY_CMD = "query"
+QUERY_FLAGS = {"--region": 'regions', "--commodity": 'commodity', "--variable": 'variable', "--years": 'years', "--format": 'format'}
+QUERY_FORMATS = ["table", "csv", "json"]
+QUERY_FIELDS = ['region', 'commodity', 'variable', 'year', 'units', 'mfactor', 'value']
+QUERY_OUTPUT_FORMAT = "{:<16}{:<12}{:<12}{:<8}{:<14}{:<10}{:<18}"
+QUERY_TABLE_LIST = [NORTH_AMERICA, CANADA, USA, MEXICO]
 
 # OTHER CONSTANTS
-OUTPUT_FORMAT = "{:<8}{:<18}{:<18}{:<18}{:<18}{:<18}{:<18}{:<10}"
+YEAR_COLUMN_FORMAT = "{:<8}"
+VALUE_COLUMN_FORMAT = "{:<18}"
+DEFN_COLUMN_FORMAT = "{:<10}"
 ENCODINGS_CSV = "encodings.csv"
 #ENCODINGS_TABLE_NAME = "encodings"
-USAGE_STATEMENT = "Usage: py queryOECD.py <commodity-code|commodity-label>"
+QUERY_USAGE = "py queryOECD.py query [--region <table>[,<table>...]] [--commodity <code|label>] [--variable <code|label>] [--years <first>-<last>] [--format <table|csv|json>]"
+USAGE_STATEMENT = f"Usage: py queryOECD.py <commodity-code|commodity-label> [--regions <file.json>] [--stats] [--stats-json <file>]\n       {QUERY_USAGE} [--stats] [--stats-json <file>]"
 
 ############################## STATE VARIABLES, INITIALIZATION, MAIN ##############################
 
 # MAIN - Declares global vars and state here, then ask for commodity (check both key/label),
-#           look for all common variables between CAN, USA, and MEX, outputting all results (for all years) in a table,
-#           then output the specific NA definition 'hit' results and probable conclusion for NA definition
+#           read every table's data for it, then for each aggregate look for all common variables between its members,
+#           outputting all results (for all years) in a table, then output the specific aggregate definition 'hit' results and probable conclusion
 def main():
     #globals
     global dynamodb_client
-    global dynamodb_resource
-    global na_table
-    global canada_table
-    global usa_table
-    global mexico_table
-    global total_can_usa
-    global total_can_usa_mex
-    global total_neither
+
+    # Remove the optional '--stats'/'--stats-json <file>' flags before checking the other args (see awsStats.py)
+    argv = awsStats.setup(sys.argv)
+    if argv is None:
+        sys.exit(USAGE_STATEMENT)
+    sys.argv = argv
 
     # ========== ARGUMENTS ==========
 
+    # 'query' runs an ad-hoc query instead of the report
+    if len(sys.argv) > 1 and sys.argv[1] == QUERY_CMD:
+        run_query(sys.argv[2:])
+        return
+
+    # Remove the optional '--regions <file.json>' flag and load the region hierarchy (otherwise use the default)
+    region_hierarchy = DEFAULT_REGION_HIERARCHY
+    if REGIONS_FLAG in sys.argv:
+        i = sys.argv.index(REGIONS_FLAG)
+        if i + 1 >= len(sys.argv):
+            print(f"Error: Missing value for '{REGIONS_FLAG}'.")
+            sys.exit(USAGE_STATEMENT)
+        region_hierarchy = load_region_hierarchy(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+        if region_hierarchy is None:
+            sys.exit(USAGE_STATEMENT)
+
     # Collect command line arguments when executing this python script
     argc = len(sys.argv)
     bad_usage_flag = False
-    
+
     # Check #of args (deal with it later tho)
     # 1 optional arg for commodity, otherwise prompt user for it
     if argc > 2:
         bad_usage_flag = True
         print("Error: Too many arguments.")
-    
+
     # Exit with usage statement if flag has been triggered for any reason
     if bad_usage_flag:
         sys.exit(USAGE_STATEMENT)
 
+    # Every table of the hierarchy (each only once, in order)
+    table_names = []
+    for aggregate in region_hierarchy:
+        for t in [aggregate['table']] + [member['table'] for member in aggregate['members']]:
+            if t not in table_names:
+                table_names.append(t)
+
     # ========== AWS DYNAMO DB ==========
 
-    # Init AWS DynamoDB client and resource (NOTE: these are global)
-    dynamodb_client = boto3.client("dynamodb")
-    dynamodb_resource = boto3.resource("dynamodb")
+    # Init AWS DynamoDB low-level client (NOTE: this is global), one pooled connection per table read at once
+    # Note: not the resource's client, since the resource converts every call's AttributeValues to/from Python types (see awsClients.py)
+    dynamodb_client = awsClients.get_client("dynamodb", max_pool_connections=min(len(table_names), MAX_CONCURRENT_TABLES))
 
     # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works)
     try:
@@ -97,40 +169,23 @@ def main():
         print("Error: Invalid or expired credentials (or insufficient permissions to call 'list_tables()')")
         sys.exit(f"[ERROR] {e}")
 
-    # Check the 4 tables exist, then get them all
+    # Check all tables exist
     err_output = ""
     table_list = dynamodb_client.list_tables()['TableNames']
 
     print(f"Existing Tables: {table_list}")
 
-    for t in TABLE_LIST:
+    for t in table_names:
         if t not in table_list:
             err_output += f"Error: Invalid table name '{t}' - table does not exist.\n"
-    
+
     # Print all tables that did not exist, then exit
     if err_output != "":
         print(err_output.strip("\n"))
         sys.exit("ERROR: Terminating program because unable to get table that does not exist.")
 
-    # Get all tables (after checking they exist) (NOTE: these are global)
-    na_table = dynamodb_resource.Table(NORTH_AMERICA)
-    canada_table = dynamodb_resource.Table(CANADA)
-    usa_table = dynamodb_resource.Table(USA)
-    mexico_table = dynamodb_resource.Table(MEXICO)
-
     # Open the encodings CSV file and read its contents
-    commodity_encodings_dict = {}
-    variable_encodings_dict = {}
-    with open(ENCODINGS_CSV, "r", newline='') as csv_file:
-        csv_content = csv.reader(csv_file, delimiter=',')
-
-        # if field is var or commodity, set a key-value pair between code and label (in the respective map)
-        for row in csv_content:
-            if row[2] == "variable":
-                variable_encodings_dict[row[0]] = row[1]
-            elif row[2] == "commodity":
-                commodity_encodings_dict[row[0]] = row[1]
-    csv_file.close()
+    commodity_encodings_dict, variable_encodings_dict = read_encodings()
 
     # Check args for commodity now, otherwise prompt user
     if argc == 2:
@@ -138,7 +193,7 @@ def main():
     else:
         # Ask user for commodity
         commodity_input = input("Commodity: ").strip()
-    
+
     # Check if input exists as code key, otherwise try to convert assumed label to code key (if not a label, code will be None after)
     if commodity_input.upper() in commodity_encodings_dict:
         commodity_code = commodity_input.upper()
@@ -151,30 +206,37 @@ def main():
         print(f"Error: Commodity '{commodity_input}' was not found.")
         sys.exit("ERROR: Terminating program because input does not exist as an encoding commodity code or label.")
 
-    # Init total accumulators for each category
-    total_can_usa = 0
-    total_can_usa_mex = 0
-    total_neither = 0
-
-    # iterate through each variable and analyze data (if applicable)
-    for var in variable_encodings_dict.keys():
-        if is_common_variable(commodity_code, var):
-            output_table(commodity_code, var, variable_encodings_dict, commodity_encodings_dict)
-
-    # Determine the NA definition for this variable based on #of 'hits' per year
-    max_hits = max(total_can_usa, total_can_usa_mex, total_neither)
-    if total_can_usa == max_hits:
-        na_defn = "CAN+USA"
-    elif total_can_usa_mex == max_hits:
-        na_defn = "CAN+USA+MEX"
-    else:
-        na_defn = "Neither"
+    # Read every table's records of the commodity once (all tables at once), so every aggregate is checked from the same cached stores
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(table_names), MAX_CONCURRENT_TABLES)) as executor:
+            table_data = dict(zip(table_names, executor.map(lambda t: load_commodity_store(t, commodity_code), table_names)))
+    except Exception as e:
+        sys.exit(f"[ERROR] While reading tables: {e}")
 
-    print(f"Overall North America Definition Results: {total_can_usa} CAN+USA, {total_can_usa_mex} CAN+USA+MEX, {total_neither} Neither")
-    print(f"Conclusion for all {commodity_encodings_dict[commodity_code]} variables = {na_defn}\n")
+    # Check each aggregate (with a heading if there are several)
+    for aggregate in region_hierarchy:
+        if len(region_hierarchy) > 1:
+            print(f"========== Aggregate: {aggregate['label']} ('{aggregate['table']}') ==========\n")
+        output_aggregate(aggregate, table_data, commodity_code, variable_encodings_dict, commodity_encodings_dict)
 
 ############################################ FUNCTIONS ############################################
 
+# Reads the encodings CSV file, returns (commodity encodings dict, variable encodings dict), each mapping code -> label
+def read_encodings():
+    commodity_encodings_dict = {}
+    variable_encodings_dict = {}
+    with open(ENCODINGS_CSV, "r", newline='') as csv_file:
+        csv_content = csv.reader(csv_file, delimiter=',')
+
+        # if field is var or commodity, set a key-value pair between code and label (in the respective map)
+        for row in csv_content:
+            if row[2] == "variable":
+                variable_encodings_dict[row[0]] = row[1]
+            elif row[2] == "commodity":
+                commodity_encodings_dict[row[0]] = row[1]
+    csv_file.close()
+    return commodity_encodings_dict, variable_encodings_dict
+
 # Converts the label of a dict into its code key, returns None if not a label
 def convert_dict_label_to_code_key(label, encodings_dict):
     # Get the key of the label if the label exists in the dict as a value
@@ -183,104 +245,362 @@ def convert_dict_label_to_code_key(label, encodings_dict):
     else:
         return None
 
-# Check if a commodity code + variable is common across all 4 tables, return true if it is
-def is_common_variable(commodity_code, variable):
-    return (has_commodity_and_variable(na_table, commodity_code, variable) and
-        has_commodity_and_variable(canada_table, commodity_code, variable) and
-        has_commodity_and_variable(usa_table, commodity_code, variable) and
-        has_commodity_and_variable(mexico_table, commodity_code, variable))
-
-# Check if a table has data for commodity code + variable (ie. scan table), returns true if at least 1 item is found
-def has_commodity_and_variable(table, commodity_code, variable):
-    response = table.scan(
-        FilterExpression = Attr('commodity').eq(commodity_code) & Attr('variable').eq(variable)
-    )
-    return response['Count'] > 0
-
-# Retrieves and outputs table data based on commodity and variable and analyze for NA definition
-def output_table(commodity_code, variable, variable_encodings_dict, commodity_encodings_dict):
-    # Bring in globals to modify
-    global total_can_usa
-    global total_can_usa_mex
-    global total_neither
-
-    # Init local accumulators
-    temp_can_usa = 0
-    temp_can_usa_mex = 0
-    temp_neither = 0
-
-    # Print table headers: common variable (for commodity code) across all 4 tables, and table column names
+# ========== REGION HIERARCHY ==========
+# Loads a region hierarchy from a JSON file (same format as DEFAULT_REGION_HIERARCHY), returns None (after displaying why) if it is invalid
+def load_region_hierarchy(filename):
+    try:
+        with open(filename, "r") as json_file:
+            region_hierarchy = json.load(json_file)
+    except Exception as e:
+        print(f"Error: Invalid region hierarchy file '{filename}' - unable to read it as JSON. [{e}]")
+        return None
+    if not is_region_hierarchy_valid(region_hierarchy):
+        print(f"Error: Invalid region hierarchy file '{filename}' (see above).")
+        return None
+    return region_hierarchy
+
+# Checks a region hierarchy - returns true if valid, false otherwise, and prints info about why it is invalid
+def is_region_hierarchy_valid(region_hierarchy):
+    if not isinstance(region_hierarchy, list) or len(region_hierarchy) == 0:
+        print("Error: A region hierarchy must be a list of at least 1 aggregate.")
+        return False
+
+    valid_flag = True
+    for i, aggregate in enumerate(region_hierarchy):
+        name = aggregate.get('label', f"#{i + 1}") if isinstance(aggregate, dict) else f"#{i + 1}"
+        if not isinstance(aggregate, dict) or not all(isinstance(aggregate.get(key), str) for key in ['table', 'label', 'abbreviation']):
+            print(f"Error: Aggregate {name} must have a 'table', 'label', and 'abbreviation' (strings).")
+            valid_flag = False
+            continue
+
+        members = aggregate.get('members')
+        if not isinstance(members, list) or len(members) == 0 or not all(
+                isinstance(member, dict) and all(isinstance(member.get(key), str) for key in ['table', 'label', 'abbreviation']) for member in members):
+            print(f"Error: Aggregate {name} must have a list of 'members', each with a 'table', 'label', and 'abbreviation' (strings).")
+            valid_flag = False
+            continue
+        abbreviations = [member['abbreviation'] for member in members]
+        if len(set(abbreviations)) != len(abbreviations):
+            print(f"Error: Aggregate {name} has members with the same abbreviation.")
+            valid_flag = False
+
+        candidates = aggregate.get('candidates')
+        if not isinstance(candidates, list) or len(candidates) == 0 or not all(isinstance(candidate, list) and len(candidate) > 0 for candidate in candidates):
+            print(f"Error: Aggregate {name} must have a list of 'candidates', each a list of member abbreviations.")
+            valid_flag = False
+            continue
+        for candidate in candidates:
+            unknown = [abbreviation for abbreviation in candidate if abbreviation not in abbreviations]
+            if len(unknown) > 0:
+                print(f"Error: Aggregate {name} has a candidate with unknown members: {', '.join(map(str, unknown))}.")
+                valid_flag = False
+    return valid_flag
+
+# ========== TABLE DATA ==========
+# Checks if a table's key schema is the packed layout's (one item per series, see loadTable.py), returns true if it is
+def is_packed_key_schema(key_schema):
+    return {key['AttributeName'] for key in key_schema} == PACKED_KEY_SCHEMA
+
+# Reads the records (one per year) of the commodity from a table of either layout into a compact record store (see recordStore.py)
+# Note: uses the low-level client, so items are decoded straight into the store (never into dicts of Decimals first)
+# Note: a scan or query reads at most 1 MB per call, so bigger tables need several calls
+def load_commodity_store(table_name, commodity_code):
+    request_kwargs = {
+        'TableName': table_name,
+        'ExpressionAttributeValues': {':commodity': {'S': commodity_code}}
+    }
+    if is_packed_key_schema(dynamodb_client.describe_table(TableName=table_name)['Table']['KeySchema']):
+        # Packed layout: the commodity is the partition key, so query it (the store unpacks each series into one record per year)
+        request = dynamodb_client.query
+        request_kwargs['KeyConditionExpression'] = "commodity = :commodity"
+    else:
+        request = dynamodb_client.scan
+        request_kwargs['FilterExpression'] = "commodity = :commodity"
+
+    store = recordStore.RecordStore()
+    while True:
+        response = request(**request_kwargs)
+        for item in response['Items']:
+            store.add_item(item)
+        if 'LastEvaluatedKey' not in response:
+            return store
+        request_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+# ========== OUTPUT ==========
+# Outputs the tables of every variable common to the aggregate and all its members, then the overall definition results and conclusion
+# Note: table_data maps each table name to its record store of the commodity (see load_commodity_store())
+def output_aggregate(aggregate, table_data, commodity_code, variable_encodings_dict, commodity_encodings_dict):
+    # Init total accumulators for each category (each candidate, then 'Neither')
+    categories = ["+".join(candidate) for candidate in aggregate['candidates']] + [NEITHER]
+    total_hits = {category: 0 for category in categories}
+
+    # iterate through each variable and analyze data (if applicable)
+    tables = [aggregate['table']] + [member['table'] for member in aggregate['members']]
+    for var in variable_encodings_dict.keys():
+        if all(table_data[t].has_series(commodity_code, var) for t in tables):
+            hits = output_table(aggregate, commodity_code, var, table_data, variable_encodings_dict)
+            for category in categories:
+                total_hits[category] += hits[category]
+
+    # Determine the aggregate definition based on #of 'hits' for all variables
+    print(f"Overall {aggregate['label']} Definition Results: {format_hits(total_hits)}")
+    print(f"Conclusion for all {commodity_encodings_dict[commodity_code]} variables = {conclude_definition(total_hits)}\n")
+
+# Outputs the table of the aggregate and its members' values for the variable (every year all of them have), analyzing it for the aggregate definition
+# Returns #of 'hits' per category (each candidate, then 'Neither')
+# Note: values are read straight from each table's record store (as a series of year -> value with its mfactor applied, made as each value is used)
+def output_table(aggregate, commodity_code, variable, table_data, variable_encodings_dict):
+    members = aggregate['members']
+    candidates = aggregate['candidates']
+    categories = ["+".join(candidate) for candidate in candidates] + [NEITHER]
+    hits = {category: 0 for category in categories}
+    output_format = YEAR_COLUMN_FORMAT + VALUE_COLUMN_FORMAT * (1 + len(members) + len(candidates)) + DEFN_COLUMN_FORMAT
+
+    # Print table headers: common variable (for commodity code) across all tables, and table column names
     print(f"Variable: {variable_encodings_dict[variable]}")
-    print(OUTPUT_FORMAT.format("Year", "North America", "Canada", "USA", "Mexico", "CAN+USA", "CAN+USA+MEX", "NA Defn"))
-
-    # Retrieve all data, from all years (ie. the items from the scan)
-    na_scan_data = na_table.scan(
-        FilterExpression=Attr('commodity').eq(commodity_code) & Attr('variable').eq(variable)
-    )['Items']
-    can_scan_data = canada_table.scan(
-        FilterExpression=Attr('commodity').eq(commodity_code) & Attr('variable').eq(variable)
-    )['Items']
-    usa_scan_data = usa_table.scan(
-        FilterExpression=Attr('commodity').eq(commodity_code) & Attr('variable').eq(variable)
-    )['Items']
-    mex_scan_data = mexico_table.scan(
-        FilterExpression=Attr('commodity').eq(commodity_code) & Attr('variable').eq(variable)
-    )['Items']
-
-    # Sort each scan data by key
-    na_scan_data.sort(key=data_sort)
-    can_scan_data.sort(key=data_sort)
-    usa_scan_data.sort(key=data_sort)
-    mex_scan_data.sort(key=data_sort)
-
-    # Analyze data
-    for year in YEAR_RANGE:
-        # For each relevant year, calculate total value using multiplication factor
-        i = year - 2010
-        na_value = na_scan_data[i]['value'] * (10**na_scan_data[i]['mfactor'])
-        can_value = can_scan_data[i]['value'] * (10**can_scan_data[i]['mfactor'])
-        usa_value = usa_scan_data[i]['value'] * (10**usa_scan_data[i]['mfactor'])
-        mex_value = mex_scan_data[i]['value'] * (10**mex_scan_data[i]['mfactor'])
-
-        # Calc temp sums for the CAN+USA and CAN+USA+MEX columns
-        temp_can_usa_value = can_value + usa_value
-        temp_can_usa_mex_value = can_value + usa_value + mex_value
-
-        # Determine OECD def of NA, by checking if the temp calc sums from scan data calc values are equivalent to CAN+USA sum, CAN+USA+MEX sum, or Neither
-        # Note: accumulate the #of accurate NA def 'hits'
-        if temp_can_usa_value == na_value:
-            na_defn = 'CAN+USA'
-            temp_can_usa += 1
-        elif temp_can_usa_mex_value == na_value:
-            na_defn = 'CAN+USA+MEX'
-            temp_can_usa_mex += 1
-        else:
-            na_defn = 'Neither'
-            temp_neither += 1
+    print(output_format.format("Year", aggregate['label'], *[member['label'] for member in members], *categories[:-1], f"{aggregate['abbreviation']} Defn"))
+
+    # Analyze data, for every year the aggregate and all members have
+    aggregate_values = table_data[aggregate['table']].series(commodity_code, variable)
+    member_values = {member['abbreviation']: table_data[member['table']].series(commodity_code, variable) for member in members}
+    years = sorted(set(aggregate_values).intersection(*[values.keys() for values in member_values.values()]))
+    for year in years:
+        # Calc the sum of each candidate's members (in order, starting from the first member's value)
+        candidate_values = []
+        for candidate in candidates:
+            candidate_value = member_values[candidate[0]][year]
+            for abbreviation in candidate[1:]:
+                candidate_value = candidate_value + member_values[abbreviation][year]
+            candidate_values.append(candidate_value)
+
+        # Determine the aggregate definition, by checking which candidate sum (first in order) is equivalent to the aggregate value, or Neither
+        # Note: accumulate the #of accurate definition 'hits'
+        defn = NEITHER
+        for category, candidate_value in zip(categories, candidate_values):
+            if candidate_value == aggregate_values[year]:
+                defn = category
+                break
+        hits[defn] += 1
 
         # Print table row for current year
-        print(OUTPUT_FORMAT.format(year, na_value, can_value, usa_value, mex_value, temp_can_usa_value, temp_can_usa_mex_value, na_defn))
-
-    # Determine the NA definition for this variable based on #of 'hits' per year
-    max_hits = max(temp_can_usa, temp_can_usa_mex, temp_neither)
-    if temp_can_usa == max_hits:
-        na_defn = "CAN+USA"
-    elif temp_can_usa_mex == max_hits:
-        na_defn = "CAN+USA+MEX"
-    else:
-        na_defn = "Neither"
+        print(output_format.format(year, aggregate_values[year], *[member_values[member['abbreviation']][year] for member in members], *candidate_values, defn))
+
+    # Determine the aggregate definition for this variable based on #of 'hits' per year
+    print(f"{aggregate['label']} Definition Results: {format_hits(hits)}")
+    print(f"Therefore we can conclude {aggregate['label']} = {conclude_definition(hits)}\n")
+    return hits
 
-    print(f"North America Definition Results: {temp_can_usa} CAN+USA, {temp_can_usa_mex} CAN+USA+MEX, {temp_neither} Neither")
-    print(f"Therefore we can conclude North America = {na_defn}\n")
+# Formats #of 'hits' per category (eg. "20 CAN+USA, 0 CAN+USA+MEX, 0 Neither")
+def format_hits(hits):
+    return ", ".join(f"{count} {category}" for category, count in hits.items())
 
-    # Accumulate global totals using temp local accumulators for NA definition 'hits'
-    total_can_usa += temp_can_usa
-    total_can_usa_mex += temp_can_usa_mex
-    total_neither += temp_neither
+# Returns the category with the most 'hits' (the first in order if tied)
+def conclude_definition(hits):
+    max_hits = max(hits.values())
+    return next(category for category, count in hits.items() if count == max_hits)
 
-# Sorter Helper for queried data by year
-def data_sort(elem):
-    return elem['year']
+# ========== AD-HOC QUERY ==========
+# Runs an ad-hoc query (the args after 'query'): filters every requested table at once, streaming the matching records to STDOUT as they arrive
+def run_query(argv):
+    #globals
+    global dynamodb_client
+    global dynamodb_resource
+
+    query = parse_query_args(argv)
+    if query is None:
+        sys.exit(USAGE_STATEMENT)
+
+    # Convert commodity/variable labels into their codes (codes are also accepted as is)
+    commodity_encodings_dict, variable_encodings_dict = read_encodings()
+    for field, encodings_dict in [('commodity', commodity_encodings_dict), ('variable', variable_encodings_dict)]:
+        if query[field] is None:
+            continue
+        if query[field].upper() in encodings_dict:
+            query[field] = query[field].upper()
+        else:
+            code = convert_dict_label_to_code_key(query[field], encodings_dict)
+            if code is None:
+                print(f"Error: {field.capitalize()} '{query[field]}' was not found.")
+                sys.exit(f"ERROR: Terminating program because input does not exist as an encoding {field} code or label.")
+            query[field] = code
+
+    # Init AWS DynamoDB client and resource (NOTE: these are global), one pooled connection per table queried at once
+    dynamodb_client, dynamodb_resource = awsClients.get_clients("dynamodb", max_pool_connections=min(len(query['regions']), MAX_CONCURRENT_TABLES))
+
+    # Validate AWS DynamoDB credentials (by testing if 'list_tables()' works), and check all tables exist
+    try:
+        table_list = dynamodb_client.list_tables()['TableNames']
+    except Exception as e:
+        print("Error: Invalid or expired credentials (or insufficient permissions to call 'list_tables()')")
+        sys.exit(f"[ERROR] {e}")
+    missing_tables = [t for t in query['regions'] if t not in table_list]
+    if len(missing_tables) > 0:
+        print("\n".join(f"Error: Invalid table name '{t}' - table does not exist." for t in missing_tables))
+        sys.exit("ERROR: Terminating program because unable to get table that does not exist.")
+
+    # Query every table at once, each worker putting its records onto the queue one page at a time (then None when done),
+    # while the records are written out as they arrive
+    # Note: if STDOUT is closed early (eg. piped into 'head'), the workers are stopped after their current page
+    start_time = time.time()
+    record_count = 0
+    records_queue = queue.Queue()
+    stop_event = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(query['regions']), MAX_CONCURRENT_TABLES)) as executor:
+        futures = [executor.submit(query_table, t, query, records_queue, stop_event) for t in query['regions']]
+        try:
+            write_records = start_query_output(query['format'])
+            finished_count = 0
+            while finished_count < len(futures):
+                records = records_queue.get()
+                if records is None:
+                    finished_count += 1
+                    continue
+                write_records(records)
+                record_count += len(records)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            stop_event.set()
+            # Python would fail flushing STDOUT again at exit, so point it at devnull
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+
+    for table_name, future in zip(query['regions'], futures):
+        if future.exception() is not None:
+            sys.exit(f"[ERROR] While querying table '{table_name}': {future.exception()}")
+    elapsed_time = time.time() - start_time
+    print(f"...found {record_count} records in {len(query['regions'])} tables in {elapsed_time} seconds--", file=sys.stderr)
+
+# Parses the ad-hoc query args into a dict of filters, returns None (after displaying why) if they are invalid
+# Note: years are (first, last), where either may be None (no limit)
+def parse_query_args(argv):
+    query = {'regions': QUERY_TABLE_LIST, 'commodity': None, 'variable': None, 'years': (None, None), 'format': QUERY_FORMATS[0]}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg not in QUERY_FLAGS:
+            print(f"Error: Invalid argument '{arg}'.")
+            return None
+        if i + 1 >= len(argv):
+            print(f"Error: Missing value for '{arg}'.")
+            return None
+        value = argv[i + 1]
+        i += 2
+
+        if QUERY_FLAGS[arg] == 'regions':
+            query['regions'] = [t for t in value.split(",") if t != ""]
+            if len(query['regions']) == 0:
+                print(f"Error: Invalid value '{value}' for '{arg}' - must be at least 1 table name.")
+                return None
+        elif QUERY_FLAGS[arg] == 'years':
+            first, dash, last = value.partition("-")
+            if dash == "":
+                last = first
+            if not all(year == "" or year.isdigit() for year in [first, last]) or first == last == "":
+                print(f"Error: Invalid value '{value}' for '{arg}' - must be a year, or a range '<first>-<last>' (eg. '2020-' for 2020 onwards).")
+                return None
+            query['years'] = (int(first) if first != "" else None, int(last) if last != "" else None)
+            if None not in query['years'] and query['years'][0] > query['years'][1]:
+                print(f"Error: Invalid value '{value}' for '{arg}' - the first year must not be after the last.")
+                return None
+        elif QUERY_FLAGS[arg] == 'format' and value not in QUERY_FORMATS:
+            print(f"Error: Invalid format '{value}' - must be one of: {', '.join(QUERY_FORMATS)}.")
+            return None
+        else:
+            query[QUERY_FLAGS[arg]] = value
+    return query
+
+# Queries one table for the filtered records, putting each page's records onto the queue, then None when done (even if it failed or was stopped)
+# Note: uses a query (KeyConditionExpression) when the partition key has a filter, pushing down a sort key filter too, otherwise a scan,
+#       with every other filter as a FilterExpression (except years of a packed table, which are inside its items)
+def query_table(table_name, query, records_queue, stop_event):
+    from boto3.dynamodb.conditions import Attr, Key
+    try:
+        table = dynamodb_resource.Table(table_name)
+        packed_flag = is_packed_key_schema(table.key_schema)
+        key_names = {key['KeyType']: key['AttributeName'] for key in table.key_schema}
+
+        # Filters on attributes of the items
+        filters = {'commodity': query['commodity'], 'variable': query['variable']}
+        if not packed_flag:
+            filters['year'] = query['years']
+        filters = {name: value for name, value in filters.items() if value is not None and value != (None, None)}
+
+        request = table.scan
+        request_kwargs = {}
+        if key_names['HASH'] in filters and not isinstance(filters[key_names['HASH']], tuple):
+            request = table.query
+            key_condition = build_condition(Key(key_names['HASH']), filters.pop(key_names['HASH']))
+            if key_names.get('RANGE') in filters:
+                key_condition = key_condition & build_condition(Key(key_names['RANGE']), filters.pop(key_names['RANGE']))
+            request_kwargs['KeyConditionExpression'] = key_condition
+        filter_expression = None
+        for name, value in filters.items():
+            condition = build_condition(Attr(name), value)
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+        if filter_expression is not None:
+            request_kwargs['FilterExpression'] = filter_expression
+
+        # Every page, as records (unpacking packed series into one record per year, filtered by year)
+        while True:
+            response = request(**request_kwargs)
+            records = []
+            for item in response['Items']:
+                if packed_flag:
+                    records.extend(
+                        build_record(table_name, item, int(year), value)
+                        for year, value in sorted(item['values'].items())
+                        if is_year_in_range(int(year), query['years'])
+                    )
+                else:
+                    records.append(build_record(table_name, item, int(item['year']), item['value']))
+            if len(records) > 0:
+                records_queue.put(records)
+            if 'LastEvaluatedKey' not in response or stop_event.is_set():
+                break
+            request_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    finally:
+        records_queue.put(None)
+
+# Builds the condition of a filter on the attribute/key: equal to a value, or a (first, last) range where either may be None
+def build_condition(attribute, value):
+    if not isinstance(value, tuple):
+        return attribute.eq(value)
+    first, last = value
+    if first is not None and last is not None:
+        return attribute.between(first, last)
+    if first is not None:
+        return attribute.gte(first)
+    return attribute.lte(last)
+
+# Checks if the year is in the (first, last) range (either may be None), returns true if it is
+def is_year_in_range(year, years):
+    first, last = years
+    return (first is None or year >= first) and (last is None or year <= last)
+
+# Builds an output record of the item (the value of the given year)
+def build_record(table_name, item, year, value):
+    return {
+        'region': table_name,
+        'commodity': item['commodity'],
+        'variable': item['variable'],
+        'year': year,
+        'units': item['units'],
+        'mfactor': int(item['mfactor']),
+        'value': value
+    }
+
+# Starts the output of the ad-hoc query (eg. headers) in the format, returns the function that writes records in that format
+def start_query_output(output_format):
+    if output_format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(QUERY_FIELDS)
+        return lambda records: writer.writerows([record[field] for field in QUERY_FIELDS] for record in records)
+    if output_format == "json":
+        # JSON lines (one record per line), values as numbers
+        return lambda records: sys.stdout.write("".join(json.dumps({**record, 'value': float(record['value'])}) + "\n" for record in records))
+
+    print(QUERY_OUTPUT_FORMAT.format("Region", "Commodity", "Variable", "Year", "Units", "Mfactor", "Value"))
+    return lambda records: sys.stdout.write("".join(QUERY_OUTPUT_FORMAT.format(*[record[field] for field in QUERY_FIELDS]) + "\n" for record in records))
 
 ###################################################################################################
 
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+'''
+@author : Mitchell Van Braeckel
+@id : 1002297
+@date : 10/10/2020
+@version : python 3.8-32 / python 3.8.5
+@course : CIS*4010 Cloud Computing
+@brief : A1 - Compact in-memory store of OECD records ; used by queryOECD.py (and measured by benchmarkMemory.py)
+
+@note :
+    Description: Holds OECD records (commodity, variable, year, units, mfactor, value) in columns instead of one dict of Python objects per record:
+        - commodity, variable, and units codes are interned once, and each record stores their small index (array of 2-byte ints)
+        - year (2 bytes), mfactor (1 byte), and value (8-byte mantissa + 1-byte exponent) are stored in arrays
+        --> the columns take 18 bytes per record (plus 4 for the series indexes below), instead of a dict of str and Decimal objects (hundreds of bytes)
+            - benchmarkMemory.py measures about 33 bytes per record held in all, since arrays grow with spare room (like lists) and the codes are kept too
+        - values stay exact: a value is kept as the mantissa and exponent of its DynamoDB number string (eg. '345.639' -> 345639, -3),
+            and turned back into the same Decimal the boto3 resource would give (so sums and comparisons are unchanged)
+        - add_item() decodes items from the low-level client (eg. {'year': {'N': '2010'}}) straight into the columns, of either layout from loadTable.py
+        - series() reads one (commodity, variable) series as a mapping of year -> value with its mfactor applied (what queryOECD.py reports),
+            backed by the record indexes of each series (4 bytes per record, grouped once), so no dicts or Decimals are held for it
+
+        NOTE: values whose mantissa does not fit in 8 bytes (more than 18 digits) are kept as Decimals on the side, so nothing is ever rounded
+        NOTE: at most 65536 different codes (commodity, variable, and units codes together) per store
+'''
+
+############################################# IMPORTS #############################################
+
+# IMPORTS - 'pip install <import-package>'
+import bisect
+import collections
+from array import array
+from collections.abc import Mapping
+from decimal import *
+
+############################################ CONSTANTS ############################################
+
+MAX_MANTISSA = 2**63 - 1
+OVERFLOW_EXPONENT = -128 #marks a value kept in the overflow dict
+Record = collections.namedtuple('Record', ['commodity', 'variable', 'year', 'units', 'mfactor', 'value'])
+
+############################################ FUNCTIONS ############################################
+
+# Splits a DynamoDB number string into (mantissa, exponent), eg. '345.639' -> (345639, -3), exactly like Decimal() would read it
+def parse_number(text):
+    if "e" in text or "E" in text:
+        sign, digits, exponent = Decimal(text).as_tuple()
+        mantissa = int("".join(map(str, digits)))
+        return (-mantissa if sign else mantissa), exponent
+    whole, _, fraction = text.partition(".")
+    return int(whole + fraction), -len(fraction)
+
+# Compact column store of OECD records (see header)
+class RecordStore:
+    def __init__(self):
+        self.codes = []
+        self.code_ids = {}
+        self.commodities = array('H')
+        self.variables = array('H')
+        self.units = array('H')
+        self.years = array('H')
+        self.mfactors = array('b')
+        self.mantissas = array('q')
+        self.exponents = array('b')
+        self.overflow = {}
+        self.indexes = None #see series_indexes()
+
+    def __len__(self):
+        return len(self.years)
+
+    def __iter__(self):
+        for i in range(len(self.years)):
+            yield self.record(i)
+
+    # Returns the index of the code, interning it the first time it is seen
+    def intern_code(self, code):
+        code_id = self.code_ids.get(code)
+        if code_id is None:
+            code_id = len(self.codes)
+            self.codes.append(code)
+            self.code_ids[code] = code_id
+        return code_id
+
+    # Adds a record, with its value as a DynamoDB number string (eg. '345.639')
+    def append(self, commodity, variable, year, units, mfactor, value_text):
+        mantissa, exponent = parse_number(value_text)
+        if abs(mantissa) > MAX_MANTISSA or not -127 <= exponent <= 127:
+            self.overflow[len(self.years)] = Decimal(value_text)
+            mantissa, exponent = 0, OVERFLOW_EXPONENT
+        self.commodities.append(self.intern_code(commodity))
+        self.variables.append(self.intern_code(variable))
+        self.units.append(self.intern_code(units))
+        self.years.append(year)
+        self.mfactors.append(mfactor)
+        self.mantissas.append(mantissa)
+        self.exponents.append(exponent)
+        self.indexes = None
+
+    # Adds the record(s) of an item from the low-level client, of either layout from loadTable.py:
+    #   rows layout (one record), or packed layout (one record per year of the series)
+    def add_item(self, item):
+        commodity = item['commodity']['S']
+        variable = item['variable']['S']
+        units = item['units']['S']
+        mfactor = int(item['mfactor']['N'])
+        if 'values' in item:
+            for year, value in item['values']['M'].items():
+                self.append(commodity, variable, int(year), units, mfactor, value['N'])
+        else:
+            self.append(commodity, variable, int(item['year']['N']), units, mfactor, item['value']['N'])
+
+    # Returns the exact value of the i-th record (as a Decimal)
+    def value(self, i):
+        exponent = self.exponents[i]
+        if exponent == OVERFLOW_EXPONENT:
+            return self.overflow[i]
+        return Decimal((0 if self.mantissas[i] >= 0 else 1, tuple(map(int, str(abs(self.mantissas[i])))), exponent))
+
+    # Returns the i-th record
+    def record(self, i):
+        return Record(
+            self.codes[self.commodities[i]],
+            self.codes[self.variables[i]],
+            self.years[i],
+            self.codes[self.units[i]],
+            self.mfactors[i],
+            self.value(i)
+        )
+
+    # Returns the record indexes of each (commodity, variable) series, in order of year ({(commodity, variable): array of 4-byte indexes})
+    # Note: grouped once when first needed (and again only if more records were added since)
+    def series_indexes(self):
+        if self.indexes is None:
+            groups = {}
+            for i, (commodity_id, variable_id) in enumerate(zip(self.commodities, self.variables)):
+                groups.setdefault((commodity_id, variable_id), []).append(i)
+            self.indexes = {
+                (self.codes[commodity_id], self.codes[variable_id]): array('I', sorted(indexes, key=self.years.__getitem__))
+                for (commodity_id, variable_id), indexes in groups.items()
+            }
+        return self.indexes
+
+    # Checks if the store has any records of the series, returns true if it does
+    def has_series(self, commodity, variable):
+        return (commodity, variable) in self.series_indexes()
+
+    # Returns the series' records as a Series (year -> value with its mfactor applied), empty if the store has none
+    def series(self, commodity, variable):
+        return Series(self, self.series_indexes().get((commodity, variable), array('I')))
+
+# Read-only mapping of year -> value (with its multiplication factor applied, ie. value * 10**mfactor) of one series in a record store
+# Note: only holds the series' record indexes and years (to find a year by binary search), each Decimal is made when it is looked up
+# Note: if the series has a year more than once, the last record added for it is the one used (like assigning into a dict would)
+class Series(Mapping):
+    def __init__(self, store, indexes):
+        self.store = store
+        self.indexes = indexes
+        self.years = array('H', (store.years[i] for i in indexes))
+
+    def __len__(self):
+        return len(self.years)
+
+    def __iter__(self):
+        return iter(self.years)
+
+    def __getitem__(self, year):
+        position = bisect.bisect_right(self.years, year) - 1
+        if position < 0 or self.years[position] != year:
+            raise KeyError(year)
+        i = self.indexes[position]
+        return self.store.value(i) * (10**self.store.mfactors[i])